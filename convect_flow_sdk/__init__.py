@@ -1,3 +1,15 @@
 from .constants import RunStatus
 from .flow_algo import FlowAlgo
-__all__ = ["RunStatus", "FlowAlgo"]
+from .transport import FlowTransport
+from .async_flow import AsyncFlowAlgo, AsyncFlowApp
+from .instrumentation import MetricsAggregator, add_hook, remove_hook
+__all__ = [
+    "RunStatus",
+    "FlowAlgo",
+    "FlowTransport",
+    "AsyncFlowAlgo",
+    "AsyncFlowApp",
+    "MetricsAggregator",
+    "add_hook",
+    "remove_hook",
+]
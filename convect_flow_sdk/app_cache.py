@@ -0,0 +1,113 @@
+import threading
+import time
+
+from . import instrumentation
+
+DEFAULT_APP_MANIFEST_TTL = 300
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+class AppManifestCache:
+    """
+    Cache of the app list of a workspace (workspace/{id}/all_apps) with an app_id -> app index.
+    The list is downloaded again once it is older than ttl seconds, or after invalidate.
+    An app id missing from the list reloads it once, then the miss is cached until the list expires.
+    """
+
+    def __init__(self, ttl=DEFAULT_APP_MANIFEST_TTL):
+        """
+        :param ttl: seconds the app list stays valid, None to keep it until invalidate
+        """
+        self.ttl = ttl
+        self._index = {}
+        # app ids not found in the current list
+        self._missing = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        if self._loaded_at is None:
+            return False
+        return self.ttl is None or time.monotonic() - self._loaded_at < self.ttl
+
+    def _load(self, loader):
+        app_list = loader()
+        self._index = {app["id"]: app for app in app_list}
+        self._missing = set()
+        self._loaded_at = time.monotonic()
+
+    def get(self, app_id, loader):
+        """
+        Get the app object of an app id
+        :param app_id: app id
+        :param loader: function returning the app list of the workspace
+        :return: app object or None if the app is not in the workspace
+        """
+        with self._lock:
+            if not self._is_fresh():
+                instrumentation.emit_cache("app_manifest", False)
+                self._load(loader)
+            else:
+                app = self._index.get(app_id)
+                instrumentation.emit_cache("app_manifest", app is not None or app_id in self._missing)
+                if app is not None or app_id in self._missing:
+                    return app
+                # the app may have been created after the list was loaded
+                self._load(loader)
+            app = self._index.get(app_id)
+            if app is None:
+                self._missing.add(app_id)
+            return app
+
+    def lookup(self, app_id):
+        """
+        Get the app object of an app id without loading the app list
+        :return: app object or None if the list is expired or does not contain the app
+        """
+        with self._lock:
+            app = self._index.get(app_id) if self._is_fresh() else None
+            instrumentation.emit_cache("app_manifest", app is not None)
+            return app
+
+    def is_missing(self, app_id):
+        """
+        Whether the app id was not found in the list, which is not expired
+        """
+        with self._lock:
+            return self._is_fresh() and app_id in self._missing
+
+    def set_missing(self, app_id):
+        """
+        Cache the miss of an app id until the list expires, used by callers which load the list themselves
+        """
+        with self._lock:
+            self._missing.add(app_id)
+
+    def set_app_list(self, app_list):
+        """
+        Replace the cached app list, used by callers which load the list themselves, e.g. AsyncFlowApp
+        """
+        with self._lock:
+            self._load(lambda: app_list)
+
+    def invalidate(self):
+        with self._lock:
+            self._index = {}
+            self._missing = set()
+            self._loaded_at = None
+
+
+def get_shared_app_manifest_cache(flow_host_url, flow_api_token, flow_workspace_id, ttl=DEFAULT_APP_MANIFEST_TTL):
+    """
+    Get the process wide app manifest cache of a workspace, shared by all FlowApp objects of the workspace
+    :return: AppManifestCache
+    """
+    key = (flow_host_url, flow_api_token, flow_workspace_id)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = AppManifestCache(ttl)
+            _shared_caches[key] = cache
+        return cache
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+
+from . import instrumentation
+from .compression import get_archive_file_name
+
+DEFAULT_ARTIFACT_CACHE_MAX_BYTES = 2 * 1024**3
+
+
+class ArtifactCache:
+    """
+    Bounded on-disk cache of compressed input archives, keyed by the input fingerprint, the compression engine
+    and level, and the executable files of the input. The archives are reproducible (see write_tar_gz),
+    so a cached archive has the same bytes as a rebuilt one, and submitting the same input with another config
+    reuses it without compressing anything.
+    The least recently used archives are deleted once the cache is larger than max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_ARTIFACT_CACHE_MAX_BYTES):
+        """
+        :param cache_dir: cache folder
+        :param max_bytes: max total size of the archives, None for no limit
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(input_fingerprint, engine, level, executable_files=()):
+        """
+        :param input_fingerprint: content manifest hash of the input folder, see fingerprint_folder
+        :param engine: compression engine
+        :param level: compression level, None for the default level of the engine
+        :param executable_files: relative paths of the executable input files, see get_executable_files
+        :return: cache key
+        """
+        data = {
+            "input_fingerprint": input_fingerprint,
+            "engine": engine,
+            "level": level,
+            "executable_files": list(executable_files),
+        }
+        return hashlib.sha256(json.dumps(data).encode("utf-8")).hexdigest()
+
+    def get_path(self, key, engine):
+        return os.path.join(self.cache_dir, get_archive_file_name(engine, key))
+
+    def get(self, key, engine):
+        """
+        Get a cached archive, the access time used for the eviction is updated
+        :return: archive path or None
+        """
+        path = self.get_path(key, engine)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            instrumentation.emit_cache("artifact", False)
+            return None
+        instrumentation.emit_cache("artifact", True)
+        return path
+
+    def put(self, key, engine, build):
+        """
+        Build an archive into the cache
+        :param key: cache key
+        :param engine: compression engine
+        :param build: function writing the archive to the path it is given
+        :return: archive path
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key, engine)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            build(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """
+        Delete the least recently used archives until the cache fits in max_bytes
+        :param keep: archive path which is never deleted, e.g. the one just built
+        """
+        if self.max_bytes is None or not os.path.isdir(self.cache_dir):
+            return
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+
+    @property
+    def size(self):
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if not entry.name.endswith(".tmp"))
@@ -0,0 +1,590 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+
+import requests
+
+from . import instrumentation
+from .app_cache import DEFAULT_APP_MANIFEST_TTL, AppManifestCache, get_shared_app_manifest_cache
+from .constants import DataType, LangType, RunStatus
+from .artifact_cache import DEFAULT_ARTIFACT_CACHE_MAX_BYTES
+from .compression import COMPRESSION_GZIP, get_archive_content_type, get_archive_file_name
+from .flow_algo import (
+    _LocalStorageMixin,
+    check_input_folder,
+    extract_archive,
+    generate_run_hash,
+    get_run_process_log,
+    load_run_config,
+    to_run_status,
+)
+from .hashing import DEFAULT_HASH_NAME, fingerprint_folder
+from .output_store import DEFAULT_OUTPUT_STORE_MAX_BYTES
+from .pagination import MAX_PAGE_SIZE
+from .polling import PollingPolicy, get_run_started_at
+from .run_cache import RunCache
+from .transport import bind_transport_token
+
+DEFAULT_ASYNC_POOL_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 50
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class AsyncResponse:
+    """
+    Fully read response of AsyncFlowTransport, mirrors the parts of requests.Response used by the sdk
+    """
+
+    def __init__(self, method, url, status_code, reason, headers, content):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(
+                f"{self.status_code} Error: {self.reason} for url: {self.url}", response=self
+            )
+
+
+class AsyncFlowTransport:
+    """
+    Non-blocking http transport based on aiohttp.
+    It keeps one pooled aiohttp.ClientSession and limits the number of requests in flight.
+    The session is created lazily on the running event loop.
+    """
+
+    def __init__(
+        self,
+        flow_api_token=None,
+        pool_size=DEFAULT_ASYNC_POOL_SIZE,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        headers=None,
+    ):
+        """
+        :param flow_api_token: flow api token, set as CAuthorization header for every request
+        :param pool_size: max number of open connections
+        :param max_concurrency: max number of requests in flight
+        :param headers: extra headers sent with every request
+        """
+        self.flow_api_token = flow_api_token
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self._headers = dict(headers or {})
+        if flow_api_token is not None:
+            self._headers["CAuthorization"] = f"bearer {flow_api_token}"
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError(
+                    "aiohttp is required by the async clients, install it with `pip install convect-flow-sdk[async]`"
+                )
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self._headers)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def set_flow_api_token(self, flow_api_token):
+        """
+        Set the CAuthorization header of the transport and of its session if already created
+        :param flow_api_token: flow api token
+        """
+        self.flow_api_token = flow_api_token
+        self._headers["CAuthorization"] = f"bearer {flow_api_token}"
+        if self._session is not None:
+            self._session.headers["CAuthorization"] = self._headers["CAuthorization"]
+
+    async def request(self, method, url, **kwargs):
+        session = self._get_session()
+        started_at = instrumentation.start_timer()
+        async with self._semaphore:
+            try:
+                async with session.request(method, url, **kwargs) as r:
+                    content = await r.read()
+            except Exception as e:
+                if started_at is not None:
+                    instrumentation.emit_request(
+                        method, url, started_at, bytes_sent=instrumentation.get_body_size(kwargs), error=type(e).__name__
+                    )
+                raise
+        if started_at is not None:
+            instrumentation.emit_request(
+                method,
+                url,
+                started_at,
+                status=r.status,
+                bytes_sent=instrumentation.get_body_size(kwargs),
+                bytes_received=len(content),
+            )
+        return AsyncResponse(method, str(r.url), r.status, r.reason, r.headers, content)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def download(self, method, url, out_path, **kwargs):
+        """
+        Stream the response body to out_path, file writes run in a worker thread
+        :return:
+        """
+        session = self._get_session()
+        started_at = instrumentation.start_timer()
+        received = 0
+        status = None
+        async with self._semaphore:
+            try:
+                async with session.request(method, url, **kwargs) as r:
+                    status = r.status
+                    AsyncResponse(method, str(r.url), r.status, r.reason, r.headers, b"").raise_for_status()
+                    f = await asyncio.to_thread(open, out_path, "wb")
+                    try:
+                        async for chunk in r.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            received += len(chunk)
+                            await asyncio.to_thread(f.write, chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+            except Exception as e:
+                if started_at is not None:
+                    instrumentation.emit_request(
+                        method, url, started_at, status=status, bytes_received=received, error=type(e).__name__
+                    )
+                raise
+        if started_at is not None:
+            instrumentation.emit_request(method, url, started_at, status=status, bytes_received=received)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+@dataclass
+class AsyncFlowAlgo(_LocalStorageMixin):
+    """
+    asyncio version of FlowAlgo, results, local run cache, artifact cache and output store are the same as FlowAlgo.
+    The stream and chunked upload modes of FlowAlgo.submit are not supported.
+    """
+
+    flow_host_url: str = os.getenv("FLOW_HOST", None)
+    flow_api_token: str = os.getenv("FLOW_API_TOKEN", None)
+    flow_workspace_id: str = os.getenv("FLOW_WORKSPACE_ID", None)
+    use_local_algo_cache: bool = True
+    local_cache_dir: str = os.path.join(os.getcwd(), ".flow_algo_sdk_cache")
+    transport: AsyncFlowTransport = None
+    pool_size: int = DEFAULT_ASYNC_POOL_SIZE
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    input_hash_name: str = DEFAULT_HASH_NAME
+    strict_input_hash: bool = False
+    compression: str = COMPRESSION_GZIP
+    compression_level: int = None
+    compression_workers: int = None
+    run_cache_ttl: float = None
+    run_cache_max_entries: int = None
+    polling_policy: PollingPolicy = None
+    use_output_store: bool = True
+    output_store_max_bytes: int = DEFAULT_OUTPUT_STORE_MAX_BYTES
+    output_store_hardlinks: bool = False
+    use_artifact_cache: bool = True
+    artifact_cache_max_bytes: int = DEFAULT_ARTIFACT_CACHE_MAX_BYTES
+
+    def __post_init__(self):
+        assert self.flow_host_url is not None, "FLOW_HOST is not set"
+        assert self.flow_api_token is not None, "FLOW_API_TOKEN is not set"
+        assert self.flow_workspace_id is not None, "FLOW_WORKSPACE_ID is not set"
+        self.flow_host_url = self.flow_host_url.rstrip("/")
+        if self.polling_policy is None:
+            self.polling_policy = PollingPolicy()
+        self.run_cache = None
+        if self.use_local_algo_cache:
+            os.makedirs(self.local_cache_dir, exist_ok=True)
+            self.run_cache = RunCache(self.local_cache_dir, self.run_cache_ttl, self.run_cache_max_entries)
+        self._init_local_storage()
+        if self.transport is None:
+            self.transport = AsyncFlowTransport(
+                self.flow_api_token, pool_size=self.pool_size, max_concurrency=self.max_concurrency
+            )
+        else:
+            bind_transport_token(self.transport, self.flow_api_token)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.transport.close()
+        if self.run_cache is not None:
+            self.run_cache.close()
+        if self.output_store is not None:
+            self.output_store.close()
+
+    @property
+    def manifest_dir(self):
+        if not self.use_local_algo_cache:
+            return None
+        return os.path.join(self.local_cache_dir, "manifests")
+
+    @property
+    def api_url(self):
+        return f"{self.flow_host_url}/flowopt-server/api/"
+
+    async def list_algo_runs(self, algo_id, page=1, page_size=10):
+        """
+        List all algo runs for a given algo_id in the workspace, see FlowAlgo.list_algo_runs
+        """
+        _api_url = f"{self.api_url}algo_runs/list"
+        pagination = {"page": page, "page_size": page_size}
+        _data = {
+            "workspace_id": self.flow_workspace_id,
+            "algo_id": algo_id,
+        }
+        r = await self.transport.post(_api_url, params=pagination, json=_data)
+        r.raise_for_status()
+        return r.json()
+
+    async def check_status(self, run_id, timeout=7200, wait=True, polling_policy=None, expected_runtime=None):
+        """
+        Check algo run status, see FlowAlgo.check_status
+        :param expected_runtime: expected runtime of the run in seconds, the polling phases are derived from it
+        """
+        print(f"Checking algo run status for run_id: {run_id}")
+        _api_url = f"{self.api_url}algo_runs/check"
+        _data = {
+            "run_id": run_id,
+        }
+        _run_completed = False
+        _end_time = time.time() + timeout
+        run_status = RunStatus.UNKNOWN
+        polling_policy = polling_policy or self.polling_policy
+        if expected_runtime is not None:
+            polling_policy = polling_policy.with_expected_runtime(expected_runtime)
+        polling = None
+        while time.time() < _end_time:
+            try:
+                r = await self.transport.post(_api_url, json=_data)
+                r.raise_for_status()
+                run = r.json()
+                run_status = to_run_status(run["run_job_status"].get("status", None))
+                if run_status != RunStatus.RUNNING:
+                    _run_completed = True
+                    break
+                if not wait:
+                    break
+                if polling is None:
+                    # the phases are relative to the start of the run
+                    polling = polling_policy.start(get_run_started_at(run))
+                interval = polling.next_interval()
+                print(f"algo run {run_id} is still running, retrying in {interval:.1f} seconds")
+                await asyncio.sleep(interval)
+            except Exception as e:
+                if not wait:
+                    break
+                interval = polling_policy.error_interval
+                print(f"Failed to check algo run status: {e}, retrying in {interval:.1f} seconds")
+                await asyncio.sleep(interval)
+        if not _run_completed and wait:
+            print(f"Timeout: algo run {run_id} did not complete in {timeout} seconds")
+        return run_status
+
+    async def log(self, run_id):
+        """
+        Get algo run log, see FlowAlgo.log
+        """
+        status = await self.check_status(run_id, wait=False)
+        if status in [RunStatus.UNKNOWN, RunStatus.RUNNING]:
+            print(f"algo run {run_id} is not completed, unable to get log")
+            return None
+        print(f"Getting algo run log for run_id: {run_id}, status: {status}")
+        _api_url = f"{self.api_url}algo_runs/logs"
+        r = await self.transport.post(_api_url, json={"run_id": run_id})
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            print(f"Failed to get algo run log: {e}")
+            return None
+        return get_run_process_log(r.json())
+
+    async def submit(self, algo_id, command, config, input_path, compression=None, compression_level=None):
+        """
+        Submit an algo run, see FlowAlgo.submit
+        Hashing and compression run in a worker thread so the event loop is not blocked,
+        the archive is the same as the one of FlowAlgo and is taken from the same artifact cache
+        :param compression: compression engine of the input archive, default to self.compression
+        :param compression_level: compression level, default to self.compression_level
+        """
+        _api_url = f"{self.api_url}algo_runs/submit"
+        config = load_run_config(config)
+        check_input_folder(input_path)
+        input_fingerprint = await asyncio.to_thread(
+            fingerprint_folder, input_path, self.input_hash_name, self.manifest_dir, self.strict_input_hash
+        )
+        run_hash = generate_run_hash(
+            self.flow_host_url, self.flow_workspace_id, algo_id, command, config, input_fingerprint
+        )
+        run_id = None
+        if self.run_cache is not None:
+            run_id = await asyncio.to_thread(self.run_cache.get_run_id, run_hash)
+        if run_id is not None:
+            print(f"algo run submitted with run_id: {run_id}")
+            return run_id
+        if compression is None:
+            compression = self.compression
+        if compression_level is None:
+            compression_level = self.compression_level
+        file_content = await asyncio.to_thread(
+            self._read_input_archive, input_path, input_fingerprint, compression, compression_level
+        )
+        import aiohttp
+
+        form = aiohttp.FormData()
+        form.add_field("algo_id", algo_id)
+        form.add_field("workspace_id", self.flow_workspace_id)
+        form.add_field("run_command", command)
+        form.add_field("config", json.dumps(config))
+        form.add_field(
+            "file",
+            file_content,
+            filename=get_archive_file_name(compression),
+            content_type=get_archive_content_type(compression),
+        )
+        r = await self.transport.post(_api_url, data=form)
+        r.raise_for_status()
+        if self.run_cache is not None:
+            await asyncio.to_thread(self.run_cache.put, run_hash, r.json())
+        run_id = r.json()["run_id"]
+        print(f"algo run submitted with run_id: {run_id}")
+        return run_id
+
+    async def gather(self, run_id, output_path, include=None, exclude=None):
+        """
+        Gather algo run results, see FlowAlgo.gather
+        The archive is downloaded with non-blocking io and extracted in a worker thread,
+        complete outputs are kept in the same local output store as FlowAlgo
+        """
+        output_key = self._get_output_key(run_id)
+        if self.output_store is not None:
+            placed = await asyncio.to_thread(self.output_store.place_run, output_key, output_path, include, exclude)
+            if placed is not None:
+                print(f"gather algo run {run_id} from the local output store")
+                print("gather algo run successfully")
+                return
+        status = await self.check_status(run_id, wait=False)
+        if status == RunStatus.UNKNOWN:
+            print(f"algo run {run_id} is not completed, unable to gather results")
+            return None
+        if status == RunStatus.FAILED:
+            print(f"algo run {run_id} failed, unable to gather results")
+            return None
+        if status == RunStatus.CANCELLED:
+            print(f"algo run {run_id} canceled, unable to gather results")
+            return None
+        if status == RunStatus.RUNNING:
+            print(f"algo run {run_id} is still running, unable to gather results")
+            return None
+        if self.output_store is not None and include is None and exclude is None:
+            # only complete outputs are stored, the output is downloaded to the store and placed from there
+            staging_folder = await asyncio.to_thread(self.output_store.make_staging_dir)
+            try:
+                await self._download_output(run_id, staging_folder, None, None)
+                await asyncio.to_thread(self.output_store.add_run, output_key, staging_folder)
+            finally:
+                await asyncio.to_thread(shutil.rmtree, staging_folder, True)
+            placed = await asyncio.to_thread(self.output_store.place_run, output_key, output_path)
+            if placed is None:
+                # evicted by another process in the meantime
+                await self._download_output(run_id, output_path, None, None)
+        else:
+            await self._download_output(run_id, output_path, include, exclude)
+        print("gather algo run successfully")
+
+    async def _download_output(self, run_id, output_path, include, exclude):
+        _data = {"run_id": run_id, "file_type": "OUTPUT"}
+        _api_url = f"{self.api_url}algo_runs/download"
+        await asyncio.to_thread(os.makedirs, output_path, exist_ok=True)
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+        try:
+            temp_file = os.path.join(temp_dir, "output.tar.gz")
+            await self.transport.download("POST", _api_url, temp_file, json=_data)
+            await asyncio.to_thread(extract_archive, temp_file, output_path, include, exclude)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+    async def terminate(self, run_id):
+        """
+        Terminate an algo run, see FlowAlgo.terminate
+        """
+        _api_url = f"{self.api_url}algo_runs/terminate"
+        r = await self.transport.post(_api_url, json={"run_id": run_id})
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            print(f"Failed to terminate algo run: {e}")
+            return None
+        if self.run_cache is not None:
+            await asyncio.to_thread(self.run_cache.remove_run, run_id)
+        print("terminate algo run successfully")
+
+
+@dataclass
+class AsyncFlowApp:
+    """
+    asyncio version of the instance methods of FlowApp
+    """
+
+    flow_host_url: str = os.getenv("FLOW_HOST", None)
+    flow_api_token: str = os.getenv("FLOW_API_TOKEN", None)
+    flow_workspace_id: str = os.getenv("FLOW_WORKSPACE_ID", None)
+    flow_app_id: str = None
+    transport: AsyncFlowTransport = None
+    pool_size: int = DEFAULT_ASYNC_POOL_SIZE
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    app_manifest_cache: AppManifestCache = None
+    app_manifest_ttl: float = DEFAULT_APP_MANIFEST_TTL
+
+    def __post_init__(self):
+        if self.flow_host_url is None:
+            raise ValueError("Flow host url is not set")
+        if self.flow_api_token is None:
+            raise ValueError("Flow api token is not set")
+        if self.flow_workspace_id is None:
+            raise ValueError("Flow workspace id is not set")
+        if self.flow_app_id is None:
+            raise ValueError("Flow app id is not set")
+        self.flow_host_url = self.flow_host_url.rstrip("/")
+        if self.app_manifest_cache is None:
+            self.app_manifest_cache = get_shared_app_manifest_cache(
+                self.flow_host_url, self.flow_api_token, self.flow_workspace_id, self.app_manifest_ttl
+            )
+        if self.transport is None:
+            self.transport = AsyncFlowTransport(
+                self.flow_api_token, pool_size=self.pool_size, max_concurrency=self.max_concurrency
+            )
+        else:
+            bind_transport_token(self.transport, self.flow_api_token)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.transport.close()
+
+    @property
+    def api_url(self):
+        return f"{self.flow_host_url}/flowopt-server/api/"
+
+    async def get_app_data(self):
+        app = self.app_manifest_cache.lookup(self.flow_app_id)
+        if app is not None:
+            return app
+        if self.app_manifest_cache.is_missing(self.flow_app_id):
+            raise ValueError(f"App id {self.flow_app_id} not found")
+        _url = self.api_url + f"workspace/{self.flow_workspace_id}/all_apps"
+        app_list = []
+        page = 1
+        while True:
+            r = await self.transport.get(_url, params={"page": page, "page_size": MAX_PAGE_SIZE})
+            r.raise_for_status()
+            apps = r.json()
+            app_list.extend(apps)
+            if len(apps) < MAX_PAGE_SIZE:
+                break
+            page += 1
+        self.app_manifest_cache.set_app_list(app_list)
+        app = self.app_manifest_cache.lookup(self.flow_app_id)
+        if app is None:
+            self.app_manifest_cache.set_missing(self.flow_app_id)
+            raise ValueError(f"App id {self.flow_app_id} not found")
+        return app
+
+    def invalidate_app_manifest(self):
+        self.app_manifest_cache.invalidate()
+
+    async def get_app_endpoint(self):
+        app = await self.get_app_data()
+        return app["app_manifest"]["endpoint"]
+
+    async def get_instances(self, folder_id, active=True, page=1, page_size=99):
+        _url = self.api_url + "run_instances/list"
+        _data = {
+            "session_id": folder_id,
+            "order_by_created_at": "desc",
+            "active": active,
+            "order_by": "created_at",
+            "workspace_id": self.flow_workspace_id,
+            "app_id": self.flow_app_id,
+        }
+        r = await self.transport.post(_url, json=_data, params={"page": page, "page_size": page_size})
+        r.raise_for_status()
+        return r.json()
+
+    async def get_instance_details(self, instance_id):
+        """
+        Get instance details by instance id
+        """
+        _url = self.api_url + f"run_instances/get/{instance_id}"
+        r = await self.transport.get(_url)
+        r.raise_for_status()
+        return r.json()
+
+    async def solve_instance(self, folder_id, instance_id):
+        _url = self.api_url + "tasks/solve"
+        _data = {
+            "session_id": folder_id,
+            "run_instance_id": instance_id,
+            "pipeline_name": "flowopt_solve",
+            "pipeline_config": {
+                "pre_solve_config": {},
+                "post_solve_config": {},
+            },
+        }
+        try:
+            r = await self.transport.post(_url, json=_data)
+            r.raise_for_status()
+        except Exception as e:
+            # try again with different pipeline config, see FlowApp.solve_instance
+            _data["pipeline_config"] = {"config": {}}
+            r = await self.transport.post(_url, json=_data)
+            r.raise_for_status()
+        return r.json()["id"]
+
+    async def download_instance_data(
+        self, instance_id, data_type: DataType, language: LangType, out_path: str
+    ):
+        # download the input or output view data (same as the ui view data)
+        app_endpoint = await self.get_app_endpoint()
+        _url = self.flow_host_url + "/" + app_endpoint + f"/api/data/{instance_id}"
+        _data = {"data_type": data_type.value, "lang": language.value}
+        await self.transport.download("POST", _url, out_path, json=_data)
+
+    async def download_instance_raw_data(self, instance_id, out_path: str):
+        # download the instance raw input data (based on the input data model in the database)
+        app_endpoint = await self.get_app_endpoint()
+        _url = self.flow_host_url + "/" + app_endpoint + f"/api/raw_data/{instance_id}"
+        await self.transport.download("GET", _url, out_path)
+
+    async def download_instance_user_input_data(self, instance_id, out_path: str):
+        # download the user uploaded input data (the user initial uploaded data)
+        _url = self.api_url + "tasks/download_file"
+        _data = {"run_instance_id": instance_id}
+        await self.transport.download("POST", _url, out_path, json=_data)
@@ -0,0 +1,2 @@
+from .fake_server import FakeFlowServer
+from .runner import run_benchmarks
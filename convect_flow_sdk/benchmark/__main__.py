@@ -0,0 +1,16 @@
+import argparse
+
+from .runner import run_benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flow sdk against a local fake flow server")
+    parser.add_argument("--output", default="benchmark.json", help="path of the json results")
+    parser.add_argument("--quick", action="store_true", help="small inputs, for a smoke run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake server response")
+    args = parser.parse_args()
+    run_benchmarks(args.output, args.quick, args.latency)
+
+
+if __name__ == "__main__":
+    main()
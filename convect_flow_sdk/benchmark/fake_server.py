@@ -0,0 +1,386 @@
+import hashlib
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/flowopt-server/api/"
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+def make_csv_bytes(size, seed=0):
+    """
+    Pseudo random csv data of about the given size, it compresses like real tabular data
+    """
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = f"{rng.randint(0, 10 ** 6)},{rng.random():.6f},sku_{rng.randint(0, 5000)},{rng.choice('ABCDEFGH')}\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines).encode("utf-8")[:size]
+
+
+def make_output_archive(size, file_count=4, seed=0):
+    """
+    tar.gz archive of file_count csv files of size bytes in total
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for i in range(file_count):
+            data = make_csv_bytes(size // file_count, seed + i)
+            info = tarfile.TarInfo(f"output_{i}.csv")
+            info.size = len(data)
+            info.mtime = 0
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class FakeFlowServer:
+    """
+    In-process fake of the flow endpoints used by the sdk, for benchmarks and local testing.
+    Runs succeed run_duration seconds after they are submitted, instances are ready ready_delay seconds after
+    they are imported and solved solve_duration seconds after the solve is triggered.
+    Downloads support Range requests and send an md5 ETag.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        failure_rate=0.0,
+        drop_rate=0.0,
+        run_duration=0.0,
+        ready_delay=0.0,
+        solve_duration=0.0,
+        output_size=1024 * 1024,
+        output_file_count=4,
+        log_size=64 * 1024,
+        app_count=3,
+        max_page_size=None,
+        seed=0,
+    ):
+        """
+        :param latency: seconds added to every response
+        :param failure_rate: fraction of the requests answered with 503
+        :param drop_rate: fraction of the requests whose connection is closed without a response
+        :param run_duration: seconds an algo run stays running
+        :param ready_delay: seconds before an imported instance is ready
+        :param solve_duration: seconds a solve stays running
+        :param output_size: uncompressed size of the run output archive
+        :param output_file_count: number of files in the run output archive
+        :param log_size: size of the run and process logs
+        :param app_count: number of apps in the workspace
+        :param max_page_size: page size cap of the list endpoints, a larger page_size gets max_page_size items
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_page_size = max_page_size
+        self.drop_rate = drop_rate
+        self.run_duration = run_duration
+        self.ready_delay = ready_delay
+        self.solve_duration = solve_duration
+        self.log = make_csv_bytes(log_size, seed).decode("utf-8")
+        self.output_archive = make_output_archive(output_size, output_file_count, seed)
+        self.output_etag = f'"{hashlib.md5(self.output_archive).hexdigest()}"'
+        self.apps = [
+            {
+                "id": f"app-{i}",
+                "app_manifest": {
+                    "endpoint": f"app-endpoint-{i}",
+                    "display_name": {"zh": f"app {i}", "en": f"app {i}"},
+                    "pipelines": {"IMPORT": [{"name": "import_excel", "sample_file_url": "assets/input.xlsx"}]},
+                },
+            }
+            for i in range(app_count)
+        ]
+        self.runs = {}
+        self.sessions = {}
+        self.instances = {}
+        self.uploads = {}
+        self.requests = Counter()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        handler = type("FakeFlowHandler", (_FakeFlowHandler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = Counter()
+            self.bytes_received = 0
+            self.bytes_sent = 0
+
+    def _status(self, started_at, duration):
+        if started_at is None:
+            return None
+        status = "Succeeded" if time.time() - started_at >= duration else "Running"
+        return {"status": status, "created_at": None, "finished_at": None}
+
+    def _run_object(self, run):
+        status = self._status(run["created_at"], self.run_duration)
+        if status["status"] == "Succeeded":
+            status["finished_at"] = time.strftime("%Y-%m-%d %H:%M:%S+00:00", time.gmtime(run["created_at"] + self.run_duration))
+        status["created_at"] = time.strftime("%Y-%m-%d %H:%M:%S+00:00", time.gmtime(run["created_at"]))
+        return {"id": run["id"], "algo_id": run["algo_id"], "run_job_status": status}
+
+    def _instance_object(self, instance):
+        return {
+            "id": instance["id"],
+            "name": instance["name"],
+            "description": "",
+            "session_id": instance["session_id"],
+            "created_at": instance["created_at"],
+            "locked_at": None,
+            "readiness_status": self._status(instance["created_at"], self.ready_delay),
+            "import_process_id": f"import-{instance['id']}",
+            "solve_process_id": instance["solve_process_id"],
+            "solving_status": self._status(instance["solved_at"], self.solve_duration),
+        }
+
+    def _new_instance(self, session_id, name):
+        instance_id = str(uuid.uuid4())
+        self.instances[instance_id] = {
+            "id": instance_id,
+            "name": name,
+            "session_id": session_id,
+            "created_at": time.time(),
+            "solve_process_id": None,
+            "solved_at": None,
+        }
+        return instance_id
+
+    def handle(self, method, path, query, headers, body):
+        """
+        :return: (status code, response body, extra headers), body is a json serializable object or bytes
+        """
+        if not path.startswith(API_PREFIX):
+            # app endpoints: /{endpoint}/api/data/{id}, /{endpoint}/api/raw_data/{id}, /{endpoint}/docs/...
+            if "/docs/" in path:
+                return 200, b"<html>docs</html>" if path.endswith("/docs/") else self.output_archive[:4096], {}
+            return 200, self.output_archive, {}
+        route = path[len(API_PREFIX):]
+        data = _parse_body(headers, body)
+        page = int(query.get("page", ["1"])[0])
+        page_size = int(query.get("page_size", ["100"])[0])
+        if self.max_page_size is not None:
+            page_size = min(page_size, self.max_page_size)
+
+        def _page(items):
+            return items[(page - 1) * page_size : page * page_size]
+
+        if route == "algos/list":
+            return 200, _page([{"id": "algo-0", "algo_manifest": {}}]), {}
+        if route == "algo_runs/submit":
+            run_id = str(uuid.uuid4())
+            self.runs[run_id] = {"id": run_id, "algo_id": data.get("algo_id"), "created_at": time.time()}
+            return 200, {"run_id": run_id}, {}
+        if route in ("algo_runs/check", "algo_runs/logs", "algo_runs/download", "algo_runs/terminate"):
+            run = self.runs.get(data.get("run_id"))
+            if run is None:
+                return 404, {"detail": "run not found"}, {}
+            if route == "algo_runs/check":
+                return 200, self._run_object(run), {}
+            if route == "algo_runs/logs":
+                return 200, {"nodes": [{"displayName": "flowopt-algo-run-process", "main_log": self.log}]}, {}
+            if route == "algo_runs/download":
+                return 200, self.output_archive, {}
+            del self.runs[run["id"]]
+            return 200, {}, {}
+        if route == "algo_runs/list":
+            runs = [self._run_object(r) for r in reversed(list(self.runs.values())) if r["algo_id"] == data.get("algo_id")]
+            return 200, _page(runs), {}
+        if route == "apps/list" or route.endswith("/all_apps"):
+            return 200, _page(self.apps), {}
+        if route == "sessions/create":
+            session_id = str(uuid.uuid4())
+            self.sessions[session_id] = {"id": session_id, "name": data.get("name"), "description": "", "created_at": time.time()}
+            return 200, {"id": session_id}, {}
+        if route == "sessions/list":
+            return 200, _page(list(self.sessions.values())), {}
+        if route.startswith("sessions/get/"):
+            return 200, self.sessions.get(route.rsplit("/", 1)[1], {}), {}
+        if route == "run_instances/list":
+            instances = [
+                self._instance_object(i)
+                for i in self.instances.values()
+                if data.get("session_id") is None or i["session_id"] == data.get("session_id")
+            ]
+            if data.get("is_locked"):
+                instances = []
+            return 200, _page(instances), {}
+        if route.startswith("run_instances/get/"):
+            instance = self.instances.get(route.rsplit("/", 1)[1])
+            if instance is None:
+                return 404, {"detail": "instance not found"}, {}
+            return 200, self._instance_object(instance), {}
+        if route.startswith("run_instances/update/"):
+            return 200, {}, {}
+        if route == "tasks/upload_file":
+            return 200, {"path": f"uploads/{uuid.uuid4()}"}, {}
+        if route == "tasks/import":
+            return 200, {"id": self._new_instance(data.get("session_id"), data.get("name"))}, {}
+        if route == "tasks/reimport":
+            instance = self.instances[data["run_instance_id"]]
+            instance["created_at"] = time.time()
+            return 200, {"id": instance["id"]}, {}
+        if route == "tasks/clone":
+            return 200, {"id": self._new_instance(data.get("session_id"), data.get("name"))}, {}
+        if route == "tasks/solve":
+            instance = self.instances[data["run_instance_id"]]
+            instance["solve_process_id"] = f"solve-{instance['id']}"
+            instance["solved_at"] = time.time()
+            return 200, {"id": instance["solve_process_id"]}, {}
+        if route == "tasks/logs":
+            process_ids = {f"import-{i}" for i in self.instances}
+            process_ids.update(i["solve_process_id"] for i in self.instances.values())
+            if data.get("process_id") not in process_ids:
+                return 404, {"detail": "process not found"}, {}
+            return 200, {
+                "process": {"status": {"status": "Succeeded"}},
+                "nodes": [{"displayName": "main", "phase": "Succeeded", "main_log": self.log}],
+            }, {}
+        if route == "tasks/download_file":
+            return 200, self.output_archive, {}
+        if route == "uploads/init":
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {"meta": data, "chunks": {}}
+            return 200, {"upload_id": upload_id}, {}
+        match = re.match(r"uploads/(\w+)(?:/(chunks)/(\d+)|/(complete))?$", route)
+        if match is not None:
+            upload = self.uploads.get(match.group(1))
+            if upload is None:
+                return 404, {"detail": "upload not found"}, {}
+            if match.group(2):
+                upload["chunks"][int(match.group(3))] = len(body)
+                return 200, {}, {}
+            if match.group(4):
+                return 200, {"upload_id": match.group(1), "path": f"uploads/{match.group(1)}"}, {}
+            return 200, {"received_chunks": sorted(upload["chunks"])}, {}
+        return 404, {"detail": f"unknown route {route}"}, {}
+
+
+def _parse_body(headers, body):
+    content_type = headers.get("Content-Type", "")
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+    if content_type.startswith("multipart/form-data"):
+        # only the small text fields are needed, the file part is skipped
+        fields = {}
+        for match in re.finditer(rb'name="(\w+)"\r\n\r\n([^\r]*)\r\n', body[:64 * 1024]):
+            fields[match.group(1).decode("utf-8")] = match.group(2).decode("utf-8")
+        return fields
+    return {}
+
+
+class _FakeFlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeFlowServer = None
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _handle(self):
+        fake = self.fake
+        body = self._read_body()
+        url = urlparse(self.path)
+        with fake._lock:
+            fake.bytes_received += len(body)
+            roll = fake._rng.random()
+        if fake.latency:
+            time.sleep(fake.latency)
+        if roll < fake.drop_rate:
+            self.close_connection = True
+            return
+        if roll < fake.drop_rate + fake.failure_rate:
+            self._send(503, b'{"detail": "injected failure"}', {"Content-Type": "application/json"})
+            return
+        route = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else "app/" + url.path.split("/api/")[-1]
+        with fake._lock:
+            fake.requests[re.sub(r"/[0-9a-f-]{8,}.*$", "", route)] += 1
+            status, payload, headers = fake.handle(self.command, url.path, parse_qs(url.query), self.headers, body)
+        if isinstance(payload, bytes):
+            self._send_bytes(status, payload)
+        else:
+            self._send(status, json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json", **headers})
+
+    def _send_bytes(self, status, payload):
+        if payload is self.fake.output_archive:
+            etag = self.fake.output_etag
+        else:
+            etag = f'"{hashlib.md5(payload).hexdigest()}"'
+        headers = {"Content-Type": "application/octet-stream", "Accept-Ranges": "bytes", "ETag": etag}
+        match = RANGE.match(self.headers.get("Range", ""))
+        if match is not None and self.headers.get("If-Range", headers["ETag"]) == headers["ETag"]:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(payload) - 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(payload)}"
+            status, payload = 206, payload[start : end + 1]
+        self._send(status, payload, headers)
+
+    def _send(self, status, payload, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        with self.fake._lock:
+            self.fake.bytes_sent += len(payload)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+
+    def log_message(self, format, *args):
+        pass
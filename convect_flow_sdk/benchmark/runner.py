@@ -0,0 +1,289 @@
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from ..compression import COMPRESSION_GZIP, COMPRESSION_NONE, COMPRESSION_PARALLEL_GZIP, COMPRESSION_ZSTD
+from ..flow_algo import FlowAlgo, compress_to_tar_gz, extract_archive
+from ..polling import PollingPolicy
+from .fake_server import FakeFlowServer, make_csv_bytes
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+MB = 1024 * 1024
+
+# (total input size, file count) of the submit and compress benchmarks
+DEFAULT_INPUT_SHAPES = [(4 * MB, 4), (32 * MB, 16), (32 * MB, 512)]
+QUICK_INPUT_SHAPES = [(2 * MB, 4), (4 * MB, 64)]
+
+
+def get_peak_rss():
+    """
+    Peak resident set size of the process in bytes, None if the platform does not report it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_sdk_version():
+    try:
+        from importlib.metadata import version
+
+        return version("convect-flow-sdk")
+    except Exception:
+        return "unknown"
+
+
+def make_input_folder(folder, total_size, file_count):
+    """
+    Create an input folder of file_count csv files of total_size bytes in total
+    """
+    os.makedirs(folder, exist_ok=True)
+    block = make_csv_bytes(min(total_size // file_count, 4 * MB))
+    for i in range(file_count):
+        sub_folder = os.path.join(folder, f"part_{i % 8}")
+        os.makedirs(sub_folder, exist_ok=True)
+        remaining = total_size // file_count
+        with open(os.path.join(sub_folder, f"data_{i}.csv"), "wb") as f:
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+    return folder
+
+
+def _timed(func, *args, **kwargs):
+    started_at = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started_at, result
+
+
+def _available_engines():
+    engines = [COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP, COMPRESSION_NONE]
+    try:
+        import zstandard  # noqa: F401
+
+        engines.append(COMPRESSION_ZSTD)
+    except ImportError:
+        pass
+    return engines
+
+
+def bench_compress(work_dir, input_shapes):
+    """
+    compress_to_tar_gz throughput of each compression engine
+    """
+    results = []
+    for total_size, file_count in input_shapes:
+        input_folder = make_input_folder(os.path.join(work_dir, f"input-{total_size}-{file_count}"), total_size, file_count)
+        for engine in _available_engines():
+            archive = os.path.join(work_dir, f"archive-{engine}")
+            seconds, _ = _timed(compress_to_tar_gz, input_folder, archive, engine=engine)
+            results.append(
+                {
+                    "input_bytes": total_size,
+                    "file_count": file_count,
+                    "engine": engine,
+                    "seconds": seconds,
+                    "mb_per_s": total_size / MB / seconds,
+                    "ratio": total_size / os.path.getsize(archive),
+                }
+            )
+            os.remove(archive)
+    return results
+
+
+def bench_submit(work_dir, input_shapes, latency, submits=4):
+    """
+    FlowAlgo.submit throughput against the fake server, buffered and streamed, without the local run cache,
+    and with a cold and a warm artifact cache
+    """
+    results = []
+    with FakeFlowServer(latency=latency) as server:
+        flow_algo = FlowAlgo(server.url, "benchmark-token", "benchmark-workspace", use_local_algo_cache=False)
+        for total_size, file_count in input_shapes:
+            input_folder = make_input_folder(
+                os.path.join(work_dir, f"input-{total_size}-{file_count}"), total_size, file_count
+            )
+            for stream in (False, True):
+                server.reset_stats()
+                started_at = time.perf_counter()
+                for i in range(submits):
+                    flow_algo.submit("algo-0", "run", {"benchmark": i}, input_folder, stream=stream)
+                seconds = time.perf_counter() - started_at
+                results.append(
+                    {
+                        "input_bytes": total_size,
+                        "file_count": file_count,
+                        "stream": stream,
+                        "submits": submits,
+                        "seconds": seconds,
+                        "submits_per_s": submits / seconds,
+                        "input_mb_per_s": submits * total_size / MB / seconds,
+                        "uploaded_bytes": server.bytes_received,
+                    }
+                )
+        # same input with a new config every time, only the first submit compresses the input
+        cached_flow_algo = FlowAlgo(
+            server.url, "benchmark-token", "benchmark-workspace", local_cache_dir=os.path.join(work_dir, "cache")
+        )
+        for total_size, file_count in input_shapes:
+            input_folder = os.path.join(work_dir, f"input-{total_size}-{file_count}")
+            for artifact_cache in ("cold", "warm"):
+                seconds, _ = _timed(
+                    cached_flow_algo.submit, "algo-0", "run", {"artifact_cache": artifact_cache}, input_folder
+                )
+                results.append(
+                    {
+                        "input_bytes": total_size,
+                        "file_count": file_count,
+                        "artifact_cache": artifact_cache,
+                        "submits": 1,
+                        "seconds": seconds,
+                        "submits_per_s": 1 / seconds,
+                        "input_mb_per_s": total_size / MB / seconds,
+                    }
+                )
+        cached_flow_algo.run_cache.close()
+        cached_flow_algo.output_store.close()
+    return results
+
+
+def bench_gather(work_dir, output_size, latency):
+    """
+    FlowAlgo.gather throughput (download and extract, and placement from the output store)
+    and extract_archive throughput of a local archive
+    """
+    results = []
+    with FakeFlowServer(latency=latency, output_size=output_size) as server:
+        flow_algo = FlowAlgo(
+            server.url,
+            "benchmark-token",
+            "benchmark-workspace",
+            local_cache_dir=os.path.join(work_dir, "cache"),
+            use_output_store=False,
+        )
+        run_id = flow_algo.submit("algo-0", "run", {}, make_input_folder(os.path.join(work_dir, "gather-input"), MB, 1))
+        for resumable in (False, True):
+            output_path = os.path.join(work_dir, f"gather-output-{resumable}")
+            seconds, _ = _timed(flow_algo.gather, run_id, output_path, resumable=resumable)
+            results.append(
+                {
+                    "name": "gather",
+                    "resumable": resumable,
+                    "output_bytes": output_size,
+                    "archive_bytes": len(server.output_archive),
+                    "seconds": seconds,
+                    "mb_per_s": output_size / MB / seconds,
+                }
+            )
+            shutil.rmtree(output_path)
+        stored_flow_algo = FlowAlgo(
+            server.url, "benchmark-token", "benchmark-workspace", local_cache_dir=os.path.join(work_dir, "cache")
+        )
+        for name in ("gather_store_miss", "gather_store_hit"):
+            output_path = os.path.join(work_dir, f"{name}-output")
+            seconds, _ = _timed(stored_flow_algo.gather, run_id, output_path)
+            results.append(
+                {"name": name, "output_bytes": output_size, "seconds": seconds, "mb_per_s": output_size / MB / seconds}
+            )
+            shutil.rmtree(output_path)
+        stored_flow_algo.output_store.close()
+        archive = os.path.join(work_dir, "output.tar.gz")
+        with open(archive, "wb") as f:
+            f.write(server.output_archive)
+    output_path = os.path.join(work_dir, "extract-output")
+    seconds, _ = _timed(extract_archive, archive, output_path, verbose=False)
+    results.append(
+        {"name": "extract_archive", "output_bytes": output_size, "seconds": seconds, "mb_per_s": output_size / MB / seconds}
+    )
+    return results
+
+
+def bench_polling(run_count, run_duration, latency):
+    """
+    Requests needed to wait for runs, check_status per run versus one paged listing with wait_all
+    """
+    results = []
+    policy = PollingPolicy(min_interval=0.05, max_interval=0.5, jitter=0.0)
+    with FakeFlowServer(latency=latency, run_duration=run_duration) as server:
+        flow_algo = FlowAlgo(
+            server.url, "benchmark-token", "benchmark-workspace", use_local_algo_cache=False, polling_policy=policy
+        )
+        with tempfile.TemporaryDirectory() as input_folder:
+            make_input_folder(input_folder, 64 * 1024, 1)
+            for method in ("check_status", "wait_all"):
+                run_ids = [flow_algo.submit("algo-0", "run", {"i": i, "m": method}, input_folder) for i in range(run_count)]
+                server.reset_stats()
+                started_at = time.perf_counter()
+                if method == "check_status":
+                    for run_id in run_ids:
+                        flow_algo.check_status(run_id)
+                else:
+                    flow_algo.wait_all(run_ids, "algo-0", interval=policy.min_interval)
+                seconds = time.perf_counter() - started_at
+                requests = sum(server.requests.values())
+                results.append(
+                    {
+                        "method": method,
+                        "runs": run_count,
+                        "run_duration": run_duration,
+                        "seconds": seconds,
+                        "requests": requests,
+                        "requests_per_s": requests / seconds,
+                        "requests_per_run": requests / run_count,
+                    }
+                )
+    return results
+
+
+def run_benchmarks(output_path=None, quick=False, latency=0.0, work_dir=None):
+    """
+    Run all benchmarks against an in-process fake flow server
+    :param output_path: write the results as json to this path
+    :param quick: small inputs, for a smoke run
+    :param latency: seconds added to every fake server response
+    :param work_dir: folder of the generated inputs and outputs, a temp folder if not set
+    :return: results dict
+    """
+    input_shapes = QUICK_INPUT_SHAPES if quick else DEFAULT_INPUT_SHAPES
+    output_size = 4 * MB if quick else 64 * MB
+    results = {
+        "sdk_version": get_sdk_version(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {"quick": quick, "latency": latency},
+        "benchmarks": {},
+    }
+    temp_dir = tempfile.mkdtemp(prefix="flow-benchmark-", dir=work_dir)
+    try:
+        benchmarks = [
+            ("compress", lambda: bench_compress(os.path.join(temp_dir, "compress"), input_shapes)),
+            ("submit", lambda: bench_submit(os.path.join(temp_dir, "submit"), input_shapes, latency)),
+            ("gather", lambda: bench_gather(os.path.join(temp_dir, "gather"), output_size, latency)),
+            ("polling", lambda: bench_polling(4 if quick else 16, 0.5 if quick else 2.0, latency)),
+        ]
+        for name, benchmark in benchmarks:
+            print(f"Running benchmark {name}...")
+            seconds, result = _timed(benchmark)
+            results["benchmarks"][name] = {"seconds": seconds, "results": result, "peak_rss_bytes": get_peak_rss()}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    results["peak_rss_bytes"] = get_peak_rss()
+    if output_path is not None:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Benchmark results written to {output_path}")
+    return results
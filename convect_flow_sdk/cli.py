@@ -1,6 +1,9 @@
 import click
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from .flow_app import list_app,FlowApp
+from .regression_report import build_report, get_failed_stage, write_json_report, write_junit_xml
 from pprint import pprint
 def run_command():
     @click.group()
@@ -8,8 +11,25 @@ def run_command():
         pass
 
     cli_entry.add_command(regression_test)
+    cli_entry.add_command(benchmark)
     cli_entry()
 
+@click.command(name="benchmark", help="benchmark the sdk against a local fake flow server")
+@click.option("--output",
+              type=click.Path(dir_okay=False),
+              default="benchmark.json", show_default=True, help="path of the json results")
+@click.option("--quick",
+              is_flag=True,
+              default=False, help="small inputs, for a smoke run")
+@click.option("--latency",
+              type=click.FLOAT,
+              default=0.0, show_default=True, help="seconds added to every fake server response")
+def benchmark(output, quick, latency):
+    from .benchmark import run_benchmarks
+
+    run_benchmarks(output, quick, latency)
+
+
 @click.command(name="regression-test", help="regression test")
 @click.option("--flow_host_url",
               type=click.STRING,
@@ -23,7 +43,16 @@ def run_command():
 @click.option("--app_id",
                 type=click.STRING,
               required=False, help="app id")
-def regression_test(flow_host_url, flow_api_token, workspace_id,app_id):
+@click.option("--parallel",
+              type=click.INT,
+              default=1, show_default=True, help="number of apps tested at the same time")
+@click.option("--report_json",
+              type=click.Path(dir_okay=False),
+              required=False, help="write a json report with the stage timings to this path")
+@click.option("--junit_xml",
+              type=click.Path(dir_okay=False),
+              required=False, help="write a junit xml report to this path")
+def regression_test(flow_host_url, flow_api_token, workspace_id, app_id, parallel, report_json, junit_xml):
     if flow_host_url is None:
         flow_host_url = os.getenv("FLOW_HOST")
     if flow_api_token is None:
@@ -40,27 +69,44 @@ def regression_test(flow_host_url, flow_api_token, workspace_id,app_id):
     print("workspace_id", workspace_id)
     if app_id is not None:
         print("app_id", app_id)
-        app = FlowApp(flow_host_url, flow_api_token, workspace_id, app_id)
-        try:
-            app.regression_test()
-        except Exception as e:
-            print("regression test failed for app_id ", app_id)
-            print(e)
+        app_list = [app_id]
     else:
         # list all apps
         app_list = list_app(flow_host_url, flow_api_token)
-        test_result = {}
-        for app_id in app_list:
-            app = FlowApp(flow_host_url, flow_api_token, workspace_id, app_id)
-            _success = True
-            try:
-                app.regression_test()
-                print(f"Regression test PASSED for app_id:{app_id}")
-            except Exception as e:
-                print(f"Regression test FAILED for app_id:{app_id}, with error: {e}")
-                _success = False
-            test_result[app_id] = _success
-        print("regression test result:")
-        pprint(test_result)
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        results = list(
+            executor.map(
+                lambda _app_id: _run_app_regression_test(flow_host_url, flow_api_token, workspace_id, _app_id),
+                app_list,
+            )
+        )
+    report = build_report(results)
+    print("regression test result:")
+    pprint({result["app_id"]: result["passed"] for result in results})
+    print("stage latency (seconds):")
+    for stage, summary in report["stages"].items():
+        if summary["count"]:
+            print(f"{stage}: p50 {summary['p50']:.2f} p90 {summary['p90']:.2f} max {summary['max']:.2f}")
+    if report_json is not None:
+        write_json_report(report, report_json)
+        print(f"json report written to {report_json}")
+    if junit_xml is not None:
+        write_junit_xml(report, junit_xml)
+        print(f"junit xml report written to {junit_xml}")
 
 
+def _run_app_regression_test(flow_host_url, flow_api_token, workspace_id, app_id):
+    timings = {}
+    result = {"app_id": app_id, "passed": True, "error": None, "failed_stage": None, "timings": timings}
+    started_at = time.perf_counter()
+    try:
+        app = FlowApp(flow_host_url, flow_api_token, workspace_id, app_id)
+        app.regression_test(timings)
+        print(f"Regression test PASSED for app_id:{app_id}")
+    except Exception as e:
+        print(f"Regression test FAILED for app_id:{app_id}, with error: {e}")
+        result["passed"] = False
+        result["error"] = str(e)
+        result["failed_stage"] = get_failed_stage(timings)
+    result["duration"] = time.perf_counter() - started_at
+    return result
@@ -0,0 +1,190 @@
+import gzip
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_PARALLEL_GZIP = "pgzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSION_NONE = "tar"
+COMPRESSION_ENGINES = [COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP, COMPRESSION_ZSTD, COMPRESSION_NONE]
+
+# same default as tarfile "w:gz"
+DEFAULT_GZIP_LEVEL = 9
+DEFAULT_ZSTD_LEVEL = 3
+PARALLEL_GZIP_BLOCK_SIZE = 1024 * 1024
+# deflate window, the tail of the previous block is used as dictionary of the next block
+DEFLATE_DICT_SIZE = 32 * 1024
+# fixed modification time of the gzip header and of the tar members,
+# so the same input files always give the same archive bytes
+ARCHIVE_MTIME = 0
+
+
+def get_archive_file_name(engine, base_name="input"):
+    """
+    Get the archive file name of a compression engine
+    :param engine: compression engine
+    :param base_name: file name without extension
+    :return: file name, e.g. input.tar.gz
+    """
+    if engine in (COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP):
+        return f"{base_name}.tar.gz"
+    if engine == COMPRESSION_ZSTD:
+        return f"{base_name}.tar.zst"
+    if engine == COMPRESSION_NONE:
+        return f"{base_name}.tar"
+    raise ValueError(f"Unsupported compression engine {engine}, supported engines: {COMPRESSION_ENGINES}")
+
+
+def get_archive_content_type(engine):
+    if engine in (COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP):
+        return "application/gzip"
+    if engine == COMPRESSION_ZSTD:
+        return "application/zstd"
+    return "application/x-tar"
+
+
+def _compress_block(data, level, zdict, last):
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipWriter:
+    """
+    Block-parallel gzip writer, the same technique as pigz.
+    The input is cut into fixed size blocks which are deflated on a thread pool (zlib releases the GIL),
+    each block is primed with the last 32KB of the previous block and ends on a byte boundary,
+    so the concatenated blocks form one regular gzip member that any gzip reader can decompress.
+    """
+
+    def __init__(self, fileobj, level=DEFAULT_GZIP_LEVEL, workers=None, block_size=PARALLEL_GZIP_BLOCK_SIZE, mtime=None):
+        """
+        :param fileobj: file object the gzip stream is written to, it is not closed by close()
+        :param level: gzip compression level
+        :param workers: number of compression threads, default to the number of cpus
+        :param block_size: size of the independently compressed blocks
+        :param mtime: modification time in the gzip header, default to the current time
+        """
+        self.fileobj = fileobj
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._zdict = b""
+        self._crc = 0
+        self._size = 0
+        self.closed = False
+        if mtime is None:
+            mtime = int(time.time())
+        if level == 9:
+            xfl = 2
+        elif level == 1:
+            xfl = 4
+        else:
+            xfl = 0
+        # magic, deflate, no flags, mtime, extra flags, unknown os
+        self.fileobj.write(b"\x1f\x8b\x08\x00" + struct.pack("<I", mtime & 0xFFFFFFFF) + bytes([xfl, 255]))
+
+    def _submit(self, data, last):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._pending.append(self._executor.submit(_compress_block, data, self.level, self._zdict, last))
+        self._zdict = data[-DEFLATE_DICT_SIZE:]
+        # keep the number of blocks in memory bounded
+        while len(self._pending) > self.workers * 2:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed ParallelGzipWriter")
+        self._buffer += data
+        while len(self._buffer) > self.block_size:
+            self._submit(bytes(self._buffer[: self.block_size]), last=False)
+            del self._buffer[: self.block_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._submit(bytes(self._buffer), last=True)
+            self._buffer = bytearray()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+            self.fileobj.write(struct.pack("<II", self._crc & 0xFFFFFFFF, self._size & 0xFFFFFFFF))
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _PassThroughWriter:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def write(self, data):
+        return self.fileobj.write(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+def open_compressor(fileobj, engine=COMPRESSION_GZIP, level=None, workers=None):
+    """
+    Wrap a file object with a compressing writer, closing the writer does not close the file object.
+    The gzip header has a fixed timestamp, so the output only depends on the input bytes.
+    :param fileobj: file object the compressed stream is written to
+    :param engine: gzip, pgzip (multi-threaded gzip), zstd (requires the zstandard package) or tar (no compression)
+    :param level: compression level, default to 9 for gzip and 3 for zstd
+    :param workers: number of compression threads for pgzip and zstd, default to the number of cpus
+    :return: writer
+    """
+    if engine in (COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP) and level is None:
+        level = DEFAULT_GZIP_LEVEL
+    if engine == COMPRESSION_GZIP:
+        return gzip.GzipFile(filename="", mode="wb", fileobj=fileobj, compresslevel=level, mtime=ARCHIVE_MTIME)
+    if engine == COMPRESSION_PARALLEL_GZIP:
+        return ParallelGzipWriter(fileobj, level=level, workers=workers, mtime=ARCHIVE_MTIME)
+    if engine == COMPRESSION_ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstandard is required by the zstd compression engine, install it with `pip install convect-flow-sdk[zstd]`"
+            )
+        compressor = zstandard.ZstdCompressor(
+            level=DEFAULT_ZSTD_LEVEL if level is None else level, threads=workers or os.cpu_count() or 1
+        )
+        return compressor.stream_writer(fileobj, closefd=False)
+    if engine == COMPRESSION_NONE:
+        return _PassThroughWriter(fileobj)
+    raise ValueError(f"Unsupported compression engine {engine}, supported engines: {COMPRESSION_ENGINES}")
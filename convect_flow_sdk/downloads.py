@@ -0,0 +1,294 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import instrumentation
+from .hashing import hash_file
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_DOWNLOAD_RETRIES = 5
+# files above this size are downloaded in parallel range segments when the server supports ranges
+PARALLEL_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024
+DOWNLOAD_SEGMENT_SIZE = 16 * 1024 * 1024
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+MD5_ETAG = re.compile(r'^"?([0-9a-fA-F]{32})"?$')
+
+
+class DownloadError(IOError):
+    pass
+
+
+def is_retryable_error(e):
+    """
+    Whether a failed request may succeed when sent again: connection errors, timeouts, 5xx and 429 responses,
+    other 4xx responses are raised at once
+    """
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and (e.response.status_code >= 500 or e.response.status_code == 429)
+    return isinstance(e, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.Timeout))
+
+
+def _get_validator(r):
+    """
+    ETag or Last-Modified of a response, sent in If-Range so a changed file is not resumed
+    """
+    etag = r.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return r.headers.get("Last-Modified")
+
+
+def _get_expected_md5(r):
+    """
+    md5 hex digest announced by the server in Content-MD5 or in a plain md5 ETag
+    :return: hex digest or None
+    """
+    content_md5 = r.headers.get("Content-MD5")
+    if content_md5:
+        try:
+            return base64.b64decode(content_md5).hex()
+        except ValueError:
+            pass
+    match = MD5_ETAG.match(r.headers.get("ETag") or "")
+    if match is not None:
+        return match.group(1).lower()
+    return None
+
+
+def _get_total_size(r, offset):
+    if r.status_code == 206:
+        match = CONTENT_RANGE.match(r.headers.get("Content-Range", ""))
+        if match is None or int(match.group(1)) != offset:
+            raise DownloadError(f"Unexpected Content-Range {r.headers.get('Content-Range')} for offset {offset}")
+        return None if match.group(3) == "*" else int(match.group(3))
+    if "Content-Length" in r.headers and not r.headers.get("Content-Encoding"):
+        return int(r.headers["Content-Length"])
+    return None
+
+
+class ResumableDownload:
+    """
+    Download of one url to a file, the bytes are written to {out_path}.part and moved to out_path
+    with os.replace once the size and the checksum are verified, so out_path is either complete or untouched.
+    An interrupted download continues from the end of the .part file with a Range request, also in a new process,
+    and large files are downloaded in parallel range segments when the server announces Accept-Ranges.
+    Servers that ignore Range answer 200 and the download restarts from the beginning.
+    """
+
+    def __init__(
+        self,
+        transport,
+        method,
+        url,
+        out_path,
+        workers=DEFAULT_DOWNLOAD_WORKERS,
+        max_retries=DEFAULT_DOWNLOAD_RETRIES,
+        retry_interval=1.0,
+        **kwargs,
+    ):
+        """
+        :param transport: transport of the client
+        :param method: http method
+        :param url: url
+        :param out_path: output file path
+        :param workers: max number of parallel range segments
+        :param max_retries: max number of retries after a failed request or an interrupted body
+        :param retry_interval: interval before the first retry, doubled on every retry
+        :param kwargs: arguments of the request, e.g. json
+        """
+        self.transport = transport
+        self.method = method
+        self.url = url
+        self.out_path = out_path
+        self.part_path = f"{out_path}.part"
+        self.state_path = f"{out_path}.part.json"
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.kwargs = kwargs
+        self._lock = threading.Lock()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state):
+        temp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def _request(self, headers, attempt=0):
+        kwargs = dict(self.kwargs)
+        kwargs["headers"] = {**kwargs.get("headers", {}), **headers}
+        with instrumentation.retry_attempt(attempt):
+            r = self.transport.request(self.method, self.url, stream=True, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def _retry(self, attempt, e):
+        if attempt >= self.max_retries or not is_retryable_error(e):
+            raise e
+        interval = self.retry_interval * (2 ** attempt)
+        print(f"Download of {self.url} interrupted: {e}, retrying in {interval:.1f} seconds")
+        time.sleep(interval)
+
+    def run(self):
+        """
+        Download the file
+        :return: out_path
+        """
+        out_folder = os.path.dirname(self.out_path)
+        if out_folder:
+            os.makedirs(out_folder, exist_ok=True)
+        started_at = instrumentation.start_timer()
+        state = self._load_state()
+        resumed = state is not None
+        if state is not None and state.get("segments") is not None:
+            self._download_segments(state)
+        else:
+            self._download_sequential(state)
+        os.replace(self.part_path, self.out_path)
+        os.remove(self.state_path)
+        if started_at is not None:
+            instrumentation.emit_operation(
+                "download", started_at, bytes_out=os.path.getsize(self.out_path), resumed=resumed
+            )
+        return self.out_path
+
+    def _download_sequential(self, state):
+        attempt = 0
+        while True:
+            offset = 0
+            headers = {}
+            if state is not None and state.get("validator") and os.path.exists(self.part_path):
+                offset = os.path.getsize(self.part_path)
+                if offset and offset == state["total_size"]:
+                    # interrupted after the last byte
+                    self._verify(state)
+                    return
+                if offset:
+                    headers = {"Range": f"bytes={offset}-", "If-Range": state["validator"]}
+            try:
+                r = self._request(headers, attempt)
+            except requests.RequestException as e:
+                self._retry(attempt, e)
+                attempt += 1
+                continue
+            try:
+                if r.status_code != 206:
+                    # the server ignored the range or the file changed, start over
+                    offset = 0
+                total_size = _get_total_size(r, offset)
+                if state is None or offset == 0:
+                    state = {
+                        "validator": _get_validator(r),
+                        "total_size": total_size,
+                        "md5": _get_expected_md5(r),
+                        "segments": None,
+                    }
+                    if (
+                        total_size is not None
+                        and total_size >= PARALLEL_DOWNLOAD_THRESHOLD
+                        and self.workers > 1
+                        and state["validator"]
+                        and r.headers.get("Accept-Ranges") == "bytes"
+                    ):
+                        r.close()
+                        self._download_segments(state)
+                        return
+                    self._save_state(state)
+                with open(self.part_path, "ab" if offset else "wb") as f:
+                    for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            except requests.RequestException as e:
+                self._retry(attempt, e)
+                attempt += 1
+                continue
+            finally:
+                r.close()
+            self._verify(state)
+            return
+
+    def _download_segments(self, state):
+        total_size = state["total_size"]
+        if state["segments"] is None or not os.path.exists(self.part_path):
+            state["segments"] = []
+            with open(self.part_path, "wb") as f:
+                f.truncate(total_size)
+            self._save_state(state)
+        done = set(state["segments"])
+        starts = [s for s in range(0, total_size, DOWNLOAD_SEGMENT_SIZE) if s not in done]
+
+        def _download(start):
+            end = min(start + DOWNLOAD_SEGMENT_SIZE, total_size) - 1
+            attempt = 0
+            while True:
+                try:
+                    r = self._request({"Range": f"bytes={start}-{end}", "If-Range": state["validator"]}, attempt)
+                    try:
+                        if r.status_code != 206:
+                            raise DownloadError(f"{self.url} changed during the download")
+                        position = start
+                        with open(self.part_path, "r+b") as f:
+                            f.seek(start)
+                            for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                                f.write(chunk)
+                                position += len(chunk)
+                    finally:
+                        r.close()
+                    if position != end + 1:
+                        raise requests.exceptions.ChunkedEncodingError(f"segment {start}-{end} is incomplete")
+                    break
+                except requests.RequestException as e:
+                    self._retry(attempt, e)
+                    attempt += 1
+            with self._lock:
+                state["segments"].append(start)
+                self._save_state(state)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for future in [executor.submit(_download, start) for start in starts]:
+                    future.result()
+        except DownloadError:
+            # the file changed on the server, the segments can not be combined
+            os.remove(self.part_path)
+            os.remove(self.state_path)
+            raise
+        self._verify(state)
+
+    def _verify(self, state):
+        size = os.path.getsize(self.part_path)
+        if state["total_size"] is not None and size != state["total_size"]:
+            self._discard()
+            raise DownloadError(f"Incomplete download of {self.url}: {size} of {state['total_size']} bytes")
+        if state["md5"] is not None:
+            md5 = hash_file(self.part_path, "md5")
+            if md5 != state["md5"]:
+                self._discard()
+                raise DownloadError(f"Checksum mismatch of {self.url}: md5 {md5}, expected {state['md5']}")
+
+    def _discard(self):
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def download_file(transport, method, url, out_path, workers=DEFAULT_DOWNLOAD_WORKERS, **kwargs):
+    """
+    Resumable and verified download of a url to out_path, see ResumableDownload
+    :return: out_path
+    """
+    return ResumableDownload(transport, method, url, out_path, workers, **kwargs).run()
@@ -0,0 +1,137 @@
+import os
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from glob import has_magic
+
+DEFAULT_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def normalize_member_name(name):
+    """
+    Archive member name without the leading ./ and trailing /, e.g. ./output/ -> output
+    """
+    name = name.replace("\\", "/")
+    while name.startswith("./"):
+        name = name[2:]
+    return name.rstrip("/")
+
+
+class MemberFilter:
+    """
+    Selects archive members by glob patterns matched against the whole member path, e.g. output.csv or output/*.csv.
+    When every include pattern is a literal path, the extraction can stop as soon as all of them are found.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        """
+        :param include: glob patterns of the members to extract, None to extract all members
+        :param exclude: glob patterns of the members to skip
+        """
+        self.include = [normalize_member_name(p) for p in include] if include else None
+        self.exclude = [normalize_member_name(p) for p in exclude] if exclude else []
+        if self.include is not None and not any(has_magic(p) for p in self.include):
+            self._pending = set(self.include)
+        else:
+            self._pending = None
+
+    def match(self, name):
+        name = normalize_member_name(name)
+        if any(fnmatchcase(name, p) for p in self.exclude):
+            return False
+        if self.include is None:
+            return True
+        if not any(fnmatchcase(name, p) for p in self.include):
+            return False
+        if self._pending is not None:
+            self._pending.discard(name)
+        return True
+
+    @property
+    def done(self):
+        """
+        All the literal include paths are found, no other member can match
+        """
+        return self._pending is not None and not self._pending
+
+
+def safe_member_path(target_folder, name):
+    """
+    Get the extraction path of a member, the member must not be written outside of the target folder
+    :return: absolute path
+    :raise ValueError: the member is absolute or goes up with ..
+    """
+    root = os.path.realpath(target_folder)
+    path = os.path.realpath(os.path.join(root, name))
+    if path != root and not path.startswith(root + os.sep):
+        raise ValueError(f"Unsafe archive member {name}, it would be extracted outside of {target_folder}")
+    return path
+
+
+def _check_tar_member(target_folder, member):
+    path = safe_member_path(target_folder, member.name)
+    if member.issym():
+        safe_member_path(target_folder, os.path.join(os.path.dirname(path), member.linkname))
+    elif member.islnk():
+        safe_member_path(target_folder, member.linkname)
+    elif not (member.isfile() or member.isdir()):
+        raise ValueError(f"Unsupported archive member {member.name}, only files, directories and links are extracted")
+
+
+def extract_tar_members(tar, target_folder, member_filter):
+    """
+    Extract the selected members of an open tarfile, it also works in stream mode ("r|*")
+    :return: list of the extracted member names
+    """
+    extracted = []
+    # use the stdlib data filter in addition to the checks above when the python version has it
+    kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+    for member in tar:
+        if not member_filter.match(member.name):
+            continue
+        _check_tar_member(target_folder, member)
+        tar.extract(member, target_folder, **kwargs)
+        extracted.append(member.name)
+        if member_filter.done:
+            break
+    return extracted
+
+
+def _extract_zip_group(archive_path, target_folder, names):
+    # one ZipFile per worker, a ZipFile can not be read from several threads at the same time
+    with zipfile.ZipFile(archive_path, "r") as zip_ref:
+        for name in names:
+            zip_ref.extract(name, target_folder)
+
+
+def extract_zip_members(archive_path, target_folder, member_filter, workers=None):
+    """
+    Extract the selected members of a zip file, the members are split into groups of similar size
+    that are decompressed and written in parallel (zlib releases the GIL)
+    :return: list of the extracted member names
+    """
+    workers = workers or DEFAULT_EXTRACT_WORKERS
+    with zipfile.ZipFile(archive_path, "r") as zip_ref:
+        infos = [info for info in zip_ref.infolist() if member_filter.match(info.filename)]
+    for info in infos:
+        safe_member_path(target_folder, info.filename)
+    files = [info for info in infos if not info.is_dir()]
+    for info in infos:
+        if info.is_dir():
+            os.makedirs(os.path.join(target_folder, info.filename), exist_ok=True)
+    groups = [[] for _ in range(max(1, min(workers, len(files))))]
+    sizes = [0] * len(groups)
+    # largest members first on the least loaded group
+    for info in sorted(files, key=lambda i: i.file_size, reverse=True):
+        index = sizes.index(min(sizes))
+        groups[index].append(info.filename)
+        sizes[index] += info.file_size
+    if len(groups) == 1:
+        _extract_zip_group(archive_path, target_folder, groups[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = [executor.submit(_extract_zip_group, archive_path, target_folder, g) for g in groups]
+            for future in futures:
+                future.result()
+    return [info.filename for info in infos]
@@ -2,73 +2,250 @@ import json
 import mimetypes
 import os
 import tempfile
+import threading
 import time
 from dataclasses import dataclass
 from enum import Enum
 from pprint import pprint
 import shutil
-import requests
 import tarfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 import hashlib
+from . import instrumentation
+from .artifact_cache import DEFAULT_ARTIFACT_CACHE_MAX_BYTES, ArtifactCache
+from .compression import (
+    ARCHIVE_MTIME,
+    COMPRESSION_GZIP,
+    get_archive_content_type,
+    get_archive_file_name,
+    open_compressor,
+)
 from .constants import RunStatus
+from .downloads import DEFAULT_DOWNLOAD_WORKERS, download_file
+from .extraction import MemberFilter, extract_tar_members, extract_zip_members
+from .hashing import DEFAULT_HASH_NAME, HASH_CHUNK_SIZE, HashingReader, fingerprint_folder, new_hasher
+from .log_tail import LogTail
+from .output_store import DEFAULT_OUTPUT_STORE_MAX_BYTES, OutputStore
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, iter_pages
+from .polling import EXPECTED_RUNTIME_TTL, PollingPolicy, get_run_started_at, median_run_duration
+from .run_cache import RunCache
+from .streaming import STREAM_CHUNK_SIZE, IterReader, iter_multipart, produce_in_thread
+from .transport import DEFAULT_POOL_SIZE, BaseTransport, bind_transport_token, get_default_transport
+from .uploads import (
+    DEFAULT_UPLOAD_CHUNK_SIZE,
+    DEFAULT_UPLOAD_WORKERS,
+    UPLOAD_MODE_CHUNKED,
+    UPLOAD_MODE_MULTIPART,
+    ChunkedUploader,
+    check_upload_mode,
+)
 
-def extract_archive(archive_path, target_folder):
+def extract_archive(archive_path, target_folder, include=None, exclude=None, workers=None, verbose=True):
     """
     Extracts a .tar.gz, .tar, or .zip file to a target folder.
+    Members that would be written outside of the target folder are rejected.
 
     Parameters:
     archive_path (str): The path to the archive file.
     target_folder (str): The path to the target folder where files will be extracted.
+    include (list): Glob patterns of the member paths to extract, e.g. ["output.csv"], all members if not set.
+        When all patterns are literal paths, a tar archive is only read until they are found.
+    exclude (list): Glob patterns of the member paths to skip.
+    workers (int): The number of threads writing zip members in parallel.
+    verbose (bool): Print the archive type.
 
     Returns:
-    None
+    list: The extracted member names
     """
     if not os.path.exists(target_folder):
         os.makedirs(target_folder)
+    started_at = instrumentation.start_timer()
+    member_filter = MemberFilter(include, exclude)
     if tarfile.is_tarfile(archive_path):
-        print("Extracting tar file")
+        if verbose:
+            print("Extracting tar file")
         with tarfile.open(archive_path, "r:*") as tar:
-            tar.extractall(path=target_folder)
+            names = extract_tar_members(tar, target_folder, member_filter)
     elif zipfile.is_zipfile(archive_path):
-        print("Extracting zip file")
-        with zipfile.ZipFile(archive_path, "r") as zip_ref:
-            zip_ref.extractall(target_folder)
+        if verbose:
+            print("Extracting zip file")
+        names = extract_zip_members(archive_path, target_folder, member_filter, workers)
     else:
         raise ValueError(
             f"Unsupported file format for {archive_path}. Please provide a .tar.gz, .tar, or .zip file."
         )
+    if started_at is not None:
+        _emit_extract(started_at, target_folder, names, os.path.getsize(archive_path))
+    return names
 
 
-def compress_to_tar_gz(source_folder, target_file):
+def extract_archive_stream(fileobj, target_folder, include=None, exclude=None, workers=None, verbose=True):
+    """
+    Extracts a .tar.gz, .tar, or .zip stream to a target folder.
+    tar archives are extracted member by member while they are read (tarfile stream mode "r|*"),
+    zip archives need random access and are spooled to a temp file first.
+
+    Parameters:
+    fileobj (IterReader): The archive stream, it must support peek.
+    target_folder (str): The path to the target folder where files will be extracted.
+    include (list): Glob patterns of the member paths to extract, see extract_archive.
+        The rest of a tar stream is not read once all literal paths are found.
+    exclude (list): Glob patterns of the member paths to skip.
+    workers (int): The number of threads writing zip members in parallel.
+    verbose (bool): Print the archive type.
+
+    Returns:
+    list: The extracted member names
+    """
+    if not os.path.exists(target_folder):
+        os.makedirs(target_folder)
+    started_at = instrumentation.start_timer()
+    member_filter = MemberFilter(include, exclude)
+    if fileobj.peek(4) == b"PK\x03\x04":
+        if verbose:
+            print("Extracting zip file")
+        # a named file, every extraction thread opens its own ZipFile
+        fd, temp_path = tempfile.mkstemp(suffix=".zip")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(fileobj, f, STREAM_CHUNK_SIZE)
+            names = extract_zip_members(temp_path, target_folder, member_filter, workers)
+        finally:
+            os.remove(temp_path)
+    else:
+        if verbose:
+            print("Extracting tar file")
+        try:
+            with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+                names = extract_tar_members(tar, target_folder, member_filter)
+        except tarfile.ReadError:
+            raise ValueError("Unsupported file format, the archive is not a .tar.gz, .tar, or .zip file.")
+    if started_at is not None:
+        _emit_extract(started_at, target_folder, names)
+    return names
+
+
+def _emit_extract(started_at, target_folder, names, archive_size=None):
+    extracted_size = 0
+    for name in names:
+        path = os.path.join(target_folder, name)
+        if os.path.isfile(path):
+            extracted_size += os.path.getsize(path)
+    instrumentation.emit_operation("extract", started_at, archive_size, extracted_size, files=len(names))
+
+
+def compress_to_tar_gz(
+    source_folder, target_file, hash_name=DEFAULT_HASH_NAME, engine=COMPRESSION_GZIP, level=None, workers=None
+):
     """
     Compresses the contents of a source folder into a .tar.gz file.
 
     Parameters:
     source_folder (str): The path to the source folder to be compressed.
     target_file (str): The path of the resulting .tar.gz file.
+    hash_name (str): The hash algorithm of the input hash, e.g. md5 or blake2b.
+    engine (str): The compression engine, gzip, pgzip (multi-threaded gzip), zstd or tar (no compression).
+    level (int): The compression level, default to 9 for gzip and 3 for zstd.
+    workers (int): The number of compression threads of pgzip and zstd, default to the number of cpus.
 
     Returns:
-    None
+    str: The hash of the input files
     """
     # check if target_file parent folder exists
     target_folder = os.path.dirname(target_file)
     if not os.path.exists(target_folder):
         os.makedirs(target_folder)
-    file_md5 = []
-    with tarfile.open(target_file, "w:gz") as tar:
-        for root, dirs, files in os.walk(source_folder):
-            for file in files:
-                full_path = os.path.join(root, file)
-                arcname = os.path.relpath(full_path, source_folder)
-                tarinfo = tar.gettarinfo(full_path, arcname=arcname)
-                with open(full_path, "rb") as fileobj:
-                    tar.addfile(tarinfo, fileobj)
-                    fileobj.seek(0)
-                    file_md5.append(hashlib.md5(fileobj.read()).hexdigest())
-    # sort file_md5 to make sure the order is consistent
-    file_md5.sort()
-    return hashlib.md5(json.dumps(file_md5).encode()).hexdigest()
+    with open(target_file, "wb") as f:
+        return write_tar_gz(source_folder, f, hash_name, engine, level, workers)
+
+
+def write_tar_gz(
+    source_folder, target_fileobj, hash_name=DEFAULT_HASH_NAME, engine=COMPRESSION_GZIP, level=None, workers=None
+):
+    """
+    Writes the contents of a source folder as a compressed tar stream to a file object.
+    The file object only needs a write method, it is never seeked.
+    Each input file is read once, in fixed size chunks, and hashed while it is added to the archive.
+    The archive is reproducible: members are sorted by path and their mtime, owner and mode are normalized,
+    see normalize_tarinfo.
+
+    Parameters:
+    source_folder (str): The path to the source folder to be compressed.
+    target_fileobj: The file object the compressed tar stream is written to.
+    hash_name (str): The hash algorithm of the input hash, e.g. md5 or blake2b.
+    engine (str): The compression engine, gzip, pgzip (multi-threaded gzip), zstd or tar (no compression).
+    level (int): The compression level, default to 9 for gzip and 3 for zstd.
+    workers (int): The number of compression threads of pgzip and zstd, default to the number of cpus.
+
+    Returns:
+    str: The hash of the input files
+    """
+    file_hashes = []
+    started_at = instrumentation.start_timer()
+    if started_at is not None:
+        target_fileobj = instrumentation.CountingWriter(target_fileobj)
+    input_size = 0
+    with open_compressor(target_fileobj, engine, level, workers) as compressed:
+        with tarfile.open(fileobj=compressed, mode="w|", copybufsize=HASH_CHUNK_SIZE) as tar:
+            for root, dirs, files in os.walk(source_folder):
+                # walk in a fixed order, the member order must not depend on the file system
+                dirs.sort()
+                for file in sorted(files):
+                    full_path = os.path.join(root, file)
+                    arcname = os.path.relpath(full_path, source_folder)
+                    tarinfo = normalize_tarinfo(tar.gettarinfo(full_path, arcname=arcname))
+                    input_size += tarinfo.size
+                    with open(full_path, "rb") as fileobj:
+                        reader = HashingReader(fileobj, new_hasher(hash_name))
+                        tar.addfile(tarinfo, reader)
+                        file_hashes.append(reader.hexdigest())
+    if started_at is not None:
+        instrumentation.emit_operation(
+            "compress", started_at, input_size, target_fileobj.count, engine=engine, files=len(file_hashes)
+        )
+    # sort file_hashes to make sure the order is consistent
+    file_hashes.sort()
+    hasher = new_hasher(hash_name)
+    hasher.update(json.dumps(file_hashes).encode())
+    return hasher.hexdigest()
+
+
+def _copy_file_to(source, fileobj):
+    with source:
+        shutil.copyfileobj(source, fileobj, STREAM_CHUNK_SIZE)
+
+
+def normalize_tarinfo(tarinfo):
+    """
+    Drop the metadata of an archive member that does not belong to the input, so the archive bytes
+    only depend on the paths, the contents and the executable bit of the input files
+    :param tarinfo: tarfile.TarInfo
+    :return: tarinfo
+    """
+    tarinfo.mtime = ARCHIVE_MTIME
+    tarinfo.uid = 0
+    tarinfo.gid = 0
+    tarinfo.uname = ""
+    tarinfo.gname = ""
+    tarinfo.mode = 0o755 if tarinfo.mode & 0o111 else 0o644
+    return tarinfo
+
+
+def get_executable_files(source_folder):
+    """
+    Sorted relative paths of the executable files of a folder, the only file metadata kept in the input archive
+    """
+    executable_files = []
+    for root, dirs, files in os.walk(source_folder):
+        for file in files:
+            full_path = os.path.join(root, file)
+            if os.stat(full_path).st_mode & 0o111:
+                executable_files.append(os.path.relpath(full_path, source_folder).replace(os.sep, "/"))
+    executable_files.sort()
+    return executable_files
+
 
 def generate_run_hash(
     flow_host, workspace_id, algo_id, run_command, config, input_data_md5
@@ -88,22 +265,220 @@ def generate_run_hash(
     }
     return hashlib.sha256(json.dumps(_data).encode("utf-8")).hexdigest()
 
+
+def load_run_config(config):
+    """
+    Load run config
+    :param config: run config dict or path to config file or json string
+    :return: run config
+    """
+    if isinstance(config, str):
+        if os.path.exists(config):
+            with open(config, "r") as f:
+                config = json.load(f)
+        else:
+            try:
+                config = json.loads(config)
+            except Exception as e:
+                raise Exception(f"Failed to parse config: {e}")
+    return config
+
+
+def check_input_folder(input_path):
+    # check if input_path exists
+    if not os.path.exists(input_path):
+        raise Exception(f"{input_path} does not exist")
+    # check if input_path is a folder
+    if not os.path.isdir(input_path):
+        raise Exception(f"{input_path} is not a folder")
+
+
+def to_run_status(run_job_status):
+    """
+    Convert the run_job_status.status returned by flow to RunStatus
+    :param run_job_status: status string, e.g. Succeeded, Failed, Canceled, Running
+    :return: RunStatus
+    """
+    if run_job_status == "Succeeded":
+        return RunStatus.SUCCEEDED
+    if run_job_status == "Failed":
+        return RunStatus.FAILED
+    if run_job_status == "Canceled":
+        return RunStatus.CANCELLED
+    return RunStatus.RUNNING
+
+
+def get_run_process_log(logs):
+    """
+    Get the main log of the algo run process from the algo_runs/logs response
+    :param logs: algo_runs/logs response
+    :return: main log or None if the run process node is not found
+    """
+    # for nodes in logs['nodes']:, only keep displayName=='flowopt-algo-run-process'
+    for l in logs["nodes"]:
+        if l["displayName"] == "flowopt-algo-run-process":
+            return l["main_log"]
+    return None
+
+
+@dataclass
+class SubmitResult:
+    """
+    Result of one config of FlowAlgo.submit_many
+    """
+
+    config: dict
+    run_id: str = None
+    cached: bool = False
+    error: Exception = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.run_id is not None
+
+
+class _LocalStorageMixin:
+    """
+    Artifact cache of the compressed inputs and output store of the gathered outputs,
+    shared by FlowAlgo and AsyncFlowAlgo so both clients upload the same archives and reuse the same local files
+    """
+
+    def _init_local_storage(self):
+        self.artifact_cache = None
+        if self.use_local_algo_cache and self.use_artifact_cache:
+            self.artifact_cache = ArtifactCache(
+                os.path.join(self.local_cache_dir, "artifacts"), self.artifact_cache_max_bytes
+            )
+        self.output_store = None
+        if self.use_local_algo_cache and self.use_output_store:
+            self.output_store = OutputStore(
+                os.path.join(self.local_cache_dir, "outputs"), self.output_store_max_bytes, self.output_store_hardlinks
+            )
+
+    def _get_artifact_key(self, input_path, input_fingerprint, compression, compression_level):
+        return self.artifact_cache.get_key(
+            input_fingerprint, compression, compression_level, get_executable_files(input_path)
+        )
+
+    def _compress_input(self, input_path, archive_path, compression, compression_level):
+        compress_to_tar_gz(
+            input_path, archive_path, self.input_hash_name, compression, compression_level, self.compression_workers
+        )
+
+    @contextmanager
+    def _open_input_archive(self, input_path, input_fingerprint, compression, compression_level):
+        """
+        Open the compressed input archive, taken from the artifact cache when the same input was compressed
+        before, or built in a temp folder if the artifact cache is disabled.
+        A cached archive evicted by another process between the lookup and the open is built again,
+        once opened the file stays readable even if it is evicted.
+        :return: binary file object, its name is the archive path
+        """
+        if self.artifact_cache is not None:
+            key = self._get_artifact_key(input_path, input_fingerprint, compression, compression_level)
+            for _ in range(2):
+                archive_path = self.artifact_cache.get(key, compression)
+                if archive_path is None:
+                    archive_path = self.artifact_cache.put(
+                        key,
+                        compression,
+                        lambda path: self._compress_input(input_path, path, compression, compression_level),
+                    )
+                try:
+                    f = open(archive_path, "rb")
+                except FileNotFoundError:
+                    print(f"Input archive {archive_path} was evicted from the artifact cache, building it again")
+                    continue
+                with f:
+                    yield f
+                return
+        with tempfile.TemporaryDirectory() as temp_dir:
+            archive_path = os.path.join(temp_dir, get_archive_file_name(compression))
+            self._compress_input(input_path, archive_path, compression, compression_level)
+            with open(archive_path, "rb") as f:
+                yield f
+
+    def _read_input_archive(self, input_path, input_fingerprint, compression, compression_level):
+        with self._open_input_archive(input_path, input_fingerprint, compression, compression_level) as f:
+            return f.read()
+
+    def _get_output_key(self, run_id):
+        return hashlib.sha256(f"{self.flow_host_url}|{self.flow_workspace_id}|{run_id}".encode("utf-8")).hexdigest()
+
+
 @dataclass
-class FlowAlgo:
+class FlowAlgo(_LocalStorageMixin):
     flow_host_url: str = os.getenv("FLOW_HOST", None)
     flow_api_token: str = os.getenv("FLOW_API_TOKEN", None)
     flow_workspace_id: str = os.getenv("FLOW_WORKSPACE_ID", None)
     use_local_algo_cache: bool = True
     local_cache_dir: str = os.path.join(os.getcwd(), ".flow_algo_sdk_cache")
+    transport: BaseTransport = None
+    pool_size: int = DEFAULT_POOL_SIZE
+    input_hash_name: str = DEFAULT_HASH_NAME
+    strict_input_hash: bool = False
+    compression: str = COMPRESSION_GZIP
+    compression_level: int = None
+    compression_workers: int = None
+    run_cache_ttl: float = None
+    run_cache_max_entries: int = None
+    polling_policy: PollingPolicy = None
+    upload_mode: str = UPLOAD_MODE_MULTIPART
+    upload_chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE
+    upload_workers: int = DEFAULT_UPLOAD_WORKERS
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS
+    use_output_store: bool = True
+    output_store_max_bytes: int = DEFAULT_OUTPUT_STORE_MAX_BYTES
+    output_store_hardlinks: bool = False
+    use_artifact_cache: bool = True
+    artifact_cache_max_bytes: int = DEFAULT_ARTIFACT_CACHE_MAX_BYTES
 
     def __post_init__(self):
         assert self.flow_host_url is not None, "FLOW_HOST is not set"
         assert self.flow_api_token is not None, "FLOW_API_TOKEN is not set"
         assert self.flow_workspace_id is not None, "FLOW_WORKSPACE_ID is not set"
         self.flow_host_url = self.flow_host_url.rstrip("/")
+        if self.polling_policy is None:
+            self.polling_policy = PollingPolicy()
+        # {algo_id: (expires_at, expected runtime)}, see get_polling_policy
+        self._expected_runtimes = {}
+        # run hash -> lock of the chunked submits of the run, see _submit_chunked
+        self._chunked_submit_locks = {}
+        self._chunked_submit_locks_lock = threading.Lock()
+        self.run_cache = None
         if self.use_local_algo_cache:
             os.makedirs(self.local_cache_dir, exist_ok=True)
+            self.run_cache = RunCache(self.local_cache_dir, self.run_cache_ttl, self.run_cache_max_entries)
+        self._init_local_storage()
+        if self.transport is None:
+            self.transport = get_default_transport(self.flow_api_token, self.pool_size)
+        else:
+            bind_transport_token(self.transport, self.flow_api_token)
+        check_upload_mode(self.upload_mode)
+
+
+    @property
+    def manifest_dir(self):
+        """
+        Folder of the input manifests, None if the local cache is disabled
+        :return:
+        """
+        if not self.use_local_algo_cache:
+            return None
+        return os.path.join(self.local_cache_dir, "manifests")
 
+    @property
+    def upload_dir(self):
+        """
+        Folder of the chunked upload states and of the archives waiting for their upload to complete
+        :return:
+        """
+        return os.path.join(self.local_cache_dir, "uploads")
+
+    def get_chunked_uploader(self):
+        return ChunkedUploader(
+            self.transport, self.api_url, self.upload_dir, self.upload_chunk_size, self.upload_workers
+        )
 
     @property
     def api_url(self):
@@ -122,9 +497,11 @@ class FlowAlgo:
             raise ValueError("Flow api token is not set")
         return {"CAuthorization": f"bearer {self.flow_api_token}"}
 
-    def list_algos(self):
+    def list_algos(self, page=1, page_size=100):
         """
         List all algos in the workspace
+        :param page: page number
+        :param page_size: page size
         :return:
         a list of algo objects
         [{'active': True,
@@ -150,21 +527,33 @@ class FlowAlgo:
           'workspace_id': '3fa85f64-5717-4562-b3fc-2c963f66afa6'}]
         """
         _api_url = f"{self.api_url}algos/list"
-        pagination = {"page": 1, "page_size": 100}
+        pagination = {"page": page, "page_size": page_size}
         _data = {
             "workspace_id": self.flow_workspace_id,
         }
-        r = requests.post(_api_url, headers=self.get_credential_header(), params=pagination,json=_data)
-        print(r.json())
+        r = self.transport.post(_api_url, params=pagination,json=_data)
         r.raise_for_status()
         return r.json()
 
+    def iter_algos(self, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+        """
+        Iterate all algos in the workspace, pages are fetched lazily
+        :param page_size: page size
+        :param prefetch: fetch the next page in the background
+        :return: generator of algo objects, see list_algos
+        """
+        return iter_pages(lambda page, size: self.list_algos(page, size), page_size, prefetch=prefetch)
+
     def clear_local_algo_cache(self):
         """
         Clear local algo cache, this will delete the local history of submitted runs
         :return:
         """
         # delete local cache
+        if self.run_cache is not None:
+            self.run_cache.close()
+        if self.output_store is not None:
+            self.output_store.close()
         if os.path.exists(self.local_cache_dir):
             try:
                 shutil.rmtree(self.local_cache_dir)
@@ -210,15 +599,34 @@ class FlowAlgo:
             "workspace_id": self.flow_workspace_id,
             "algo_id": algo_id,
         }
-        r = requests.post(_api_url, headers=self.get_credential_header(), params=pagination, json=_data)
+        r = self.transport.post(_api_url, params=pagination, json=_data)
         r.raise_for_status()
         return r.json()
 
-    def check_status(self, run_id, timeout=7200, wait = True):
+    def iter_algo_runs(self, algo_id, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+        """
+        Iterate all algo runs of an algo, pages are fetched lazily
+        :param algo_id: algo id
+        :param page_size: page size
+        :param prefetch: fetch the next page in the background
+        :return: generator of algo run objects, see list_algo_runs
+        """
+        return iter_pages(lambda page, size: self.list_algo_runs(algo_id, page, size), page_size, prefetch=prefetch)
+
+    def check_status(
+        self, run_id, timeout=7200, wait = True, polling_policy=None, algo_id=None, expected_runtime=None
+    ):
         """
         Check algo run status
         :param run_id: algo run id
+        :param timeout: max seconds to wait
+        :param wait: wait until the run is completed
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :param algo_id: algo id of the run, default to the algo id returned by algo_runs/check
+        :param expected_runtime: expected runtime of the run in seconds, estimated from the recent runs
+            of the algo if not set and the policy is adaptive, see get_polling_policy
         :return:
+        The polling phases are relative to the start of the run, not to the first check.
         """
         print(f"Checking algo run status for run_id: {run_id}")
         _api_url = f"{self.api_url}algo_runs/check"
@@ -229,32 +637,181 @@ class FlowAlgo:
         _start_time = time.time()
         _end_time = _start_time + timeout
         run_status = RunStatus.UNKNOWN
+        polling = None
         while time.time()< _end_time:
             try:
-                r = requests.post(_api_url, headers=self.get_credential_header(), json=_data)
+                r = self.transport.post(_api_url, json=_data)
                 r.raise_for_status()
-                run_job_status = r.json()["run_job_status"].get("status", None)
-                if run_job_status in ["Succeeded", "Failed", "Canceled"]:
+                run = r.json()
+                run_status = to_run_status(run["run_job_status"].get("status", None))
+                if run_status != RunStatus.RUNNING:
                     _run_completed = True
-                    if run_job_status == "Succeeded":
-                        run_status = RunStatus.SUCCEEDED
-                    elif run_job_status == "Failed":
-                        run_status = RunStatus.FAILED
-                    elif run_job_status == "Canceled":
-                        run_status = RunStatus.CANCELLED
                     break
-                run_status = RunStatus.RUNNING
-                print(f"algo run {run_id} is still running, retrying in 3 seconds")
-                time.sleep(3)
+                if not wait:
+                    break
+                if polling is None:
+                    polling = self._start_run_polling(run, polling_policy, algo_id, expected_runtime)
+                interval = polling.next_interval()
+                print(f"algo run {run_id} is still running, retrying in {interval:.1f} seconds")
+                time.sleep(interval)
             except Exception as e:
-                print(f"Failed to check algo run status: {e}, retrying in 10 seconds")
-                time.sleep(10)
-            if not wait:
-                break
+                if not wait:
+                    break
+                interval = (polling_policy or self.polling_policy).error_interval
+                print(f"Failed to check algo run status: {e}, retrying in {interval:.1f} seconds")
+                time.sleep(interval)
         if not _run_completed and wait:
             print(f"Timeout: algo run {run_id} did not complete in {timeout} seconds")
         return run_status
 
+    def estimate_runtime(self, algo_id, sample_size=20):
+        """
+        Estimate the runtime of an algo as the median duration of its recent succeeded runs
+        :param algo_id: algo id
+        :param sample_size: number of recent runs to look at
+        :return: seconds or None if there is no finished run
+        """
+        return median_run_duration(self.list_algo_runs(algo_id, page=1, page_size=sample_size))
+
+    def get_polling_policy(self, algo_id, polling_policy=None):
+        """
+        Polling policy with the expected runtime of the algo,
+        the estimate is reused for EXPECTED_RUNTIME_TTL seconds
+        :param algo_id: algo id
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :return: PollingPolicy
+        """
+        polling_policy = polling_policy or self.polling_policy
+        cached = self._expected_runtimes.get(algo_id)
+        if cached is not None and cached[0] > time.time():
+            expected_runtime = cached[1]
+        else:
+            try:
+                expected_runtime = self.estimate_runtime(algo_id)
+            except Exception as e:
+                print(f"Failed to estimate algo runtime: {e}")
+                expected_runtime = None
+            self._expected_runtimes[algo_id] = (time.time() + EXPECTED_RUNTIME_TTL, expected_runtime)
+        if expected_runtime is None:
+            return polling_policy
+        return polling_policy.with_expected_runtime(expected_runtime)
+
+    def _get_run_polling_policy(self, polling_policy, algo_id, expected_runtime):
+        """
+        Policy used to wait for runs of an algo: the given expected runtime, else the estimated one
+        if the policy is adaptive and has no expected runtime
+        """
+        polling_policy = polling_policy or self.polling_policy
+        if expected_runtime is not None:
+            return polling_policy.with_expected_runtime(expected_runtime)
+        if algo_id is not None and polling_policy.expected_runtime is None and polling_policy.is_adaptive:
+            return self.get_polling_policy(algo_id, polling_policy)
+        return polling_policy
+
+    def _start_run_polling(self, run, polling_policy, algo_id, expected_runtime):
+        """
+        Start polling a running algo run, the phases are offset by the start time of the run
+        :param run: algo run object returned by algo_runs/check
+        :return: PollingState
+        """
+        polling_policy = self._get_run_polling_policy(polling_policy, algo_id or run.get("algo_id"), expected_runtime)
+        return polling_policy.start(get_run_started_at(run))
+
+    def watch(
+        self, run_ids, algo_id, timeout=7200, interval=None, page_size=DEFAULT_PAGE_SIZE, expected_runtime=None
+    ):
+        """
+        Watch many algo runs of one algo with paged algo_runs/list calls instead of one check per run.
+        Runs missing from the listing are checked one by one.
+        Usage:
+            for run_id, status in flow_algo.watch(run_ids, algo_id):
+                ...
+        or `statuses = yield from flow_algo.watch(run_ids, algo_id)`, see also wait_all
+        :param run_ids: algo run ids
+        :param algo_id: algo id of the runs
+        :param timeout: max seconds to watch
+        :param interval: seconds between refreshes, self.polling_policy is used if not set
+        :param page_size: page size of algo_runs/list
+        :param expected_runtime: expected runtime of the runs in seconds, estimated from the recent runs
+            of the algo if not set, see get_polling_policy
+        :return: generator yielding (run_id, RunStatus) when a run completes,
+        it returns the {run_id: RunStatus} map of all watched runs
+        The polling phases are relative to the start of the oldest pending run.
+        """
+        statuses = {run_id: RunStatus.UNKNOWN for run_id in run_ids}
+        pending = set(statuses)
+        started_at = {}
+        _end_time = time.time() + timeout
+        if interval is None:
+            polling = self._get_run_polling_policy(None, algo_id, expected_runtime).start()
+        else:
+            polling = PollingPolicy.fixed(interval).start()
+        while pending:
+            try:
+                listed = self._list_run_statuses(algo_id, pending, page_size, started_at)
+            except Exception as e:
+                _interval = polling.error_interval()
+                print(f"Failed to list algo run status: {e}, retrying in {_interval:.1f} seconds")
+                time.sleep(_interval)
+                if time.time() >= _end_time:
+                    break
+                continue
+            for run_id in pending - listed.keys():
+                listed[run_id] = self.check_status(run_id, wait=False)
+            for run_id, status in listed.items():
+                statuses[run_id] = status
+                if status not in (RunStatus.RUNNING, RunStatus.UNKNOWN):
+                    pending.discard(run_id)
+                    print(f"algo run {run_id} completed with status: {status}")
+                    yield run_id, status
+            if not pending:
+                break
+            pending_started_at = [started_at[run_id] for run_id in pending if run_id in started_at]
+            if pending_started_at:
+                polling.set_job_started_at(min(pending_started_at))
+            _interval = polling.next_interval()
+            if time.time() + _interval >= _end_time:
+                print(f"Timeout: {len(pending)} algo runs did not complete in {timeout} seconds")
+                break
+            time.sleep(_interval)
+        return statuses
+
+    def wait_all(
+        self, run_ids, algo_id, timeout=7200, interval=None, page_size=DEFAULT_PAGE_SIZE, expected_runtime=None
+    ):
+        """
+        Wait for many algo runs of one algo, see watch
+        :return: {run_id: RunStatus}
+        """
+        events = self.watch(run_ids, algo_id, timeout, interval, page_size, expected_runtime)
+        while True:
+            try:
+                next(events)
+            except StopIteration as e:
+                return e.value
+
+    def _list_run_statuses(self, algo_id, run_ids, page_size, started_at=None):
+        """
+        Get the status of the given runs from algo_runs/list, pages are fetched until every run is found
+        :param started_at: dict updated with the {run_id: unix start time} of the runs found
+        :return: {run_id: RunStatus} of the runs found in the listing
+        """
+        page_size = min(page_size, MAX_PAGE_SIZE)
+        statuses = {}
+        page = 1
+        while True:
+            runs = self.list_algo_runs(algo_id, page=page, page_size=page_size)
+            for run in runs:
+                if run["id"] in run_ids:
+                    run_job_status = run.get("run_job_status") or {}
+                    statuses[run["id"]] = to_run_status(run_job_status.get("status", None))
+                    if started_at is not None:
+                        run_started_at = get_run_started_at(run)
+                        if run_started_at is not None:
+                            started_at[run["id"]] = run_started_at
+            if len(statuses) == len(run_ids) or len(runs) < page_size:
+                return statuses
+            page += 1
 
     def log(self,run_id):
         """
@@ -267,96 +824,369 @@ class FlowAlgo:
             print(f"algo run {run_id} is not completed, unable to get log")
             return None
         print(f"Getting algo run log for run_id: {run_id}, status: {status}")
-        _api_url = f"{self.api_url}algo_runs/logs"
-        r = requests.post(_api_url, headers=self.get_credential_header(), json={"run_id": run_id})
         try:
-            r.raise_for_status()
+            return self._get_run_log(run_id)
         except Exception as e:
             print(f"Failed to get algo run log: {e}")
             return None
-        res = r.json()
-        # for nodes in res['nodes']:, only keep displayName=='flowopt-algo-run-process'
-        run_node = None
-        for l in res["nodes"]:
-            if l["displayName"] == "flowopt-algo-run-process":
-                run_node=l
-                break
-        if run_node is None:
-            return None
-        return run_node["main_log"]
 
-    def submit(self, algo_id, command, config, input_path):
+    def _get_run_log(self, run_id):
+        _api_url = f"{self.api_url}algo_runs/logs"
+        r = self.transport.post(_api_url, json={"run_id": run_id})
+        r.raise_for_status()
+        return get_run_process_log(r.json())
+
+    def tail_log(self, run_id, follow=True, timeout=7200, polling_policy=None, algo_id=None, expected_runtime=None):
+        """
+        Iterate the lines of an algo run log, also while the run is running
+        :param run_id: algo run id
+        :param follow: keep polling and yield the new lines until the run is completed
+        :param timeout: max seconds to follow the log, TimeoutError is raised if the requests still fail by then
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :param algo_id: algo id of the run, see check_status
+        :param expected_runtime: expected runtime of the run in seconds, see check_status
+        :return: generator of log lines
+        """
+        _api_url = f"{self.api_url}algo_runs/check"
+        tail = LogTail()
+        _start_time = time.monotonic()
+        polling = None
+        while True:
+            try:
+                r = self.transport.post(_api_url, json={"run_id": run_id})
+                r.raise_for_status()
+                run = r.json()
+                run_status = to_run_status(run["run_job_status"].get("status", None))
+                # the status is checked before the log, so the log of a completed run is complete
+                completed = run_status != RunStatus.RUNNING
+                log = self._get_run_log(run_id)
+            except Exception as e:
+                if not follow:
+                    raise
+                interval = (polling_policy or self.polling_policy).error_interval
+                if timeout is not None and time.monotonic() - _start_time + interval > timeout:
+                    print(f"Timeout: failed to get the log of algo run {run_id} in {timeout} seconds: {e}")
+                    for _, line in tail.flush():
+                        yield line
+                    raise TimeoutError(f"Failed to get the log of algo run {run_id} in {timeout} seconds") from e
+                print(f"Failed to get algo run log: {e}, retrying in {interval:.1f} seconds")
+                time.sleep(interval)
+                continue
+            final = completed or not follow
+            for line in tail.feed("flowopt-algo-run-process", log, final=final):
+                yield line
+            if final:
+                return
+            if polling is None:
+                polling = self._start_run_polling(run, polling_policy, algo_id, expected_runtime)
+            interval = polling.next_interval()
+            if timeout is not None and time.monotonic() - _start_time + interval > timeout:
+                print(f"Timeout: algo run {run_id} did not complete in {timeout} seconds")
+                for _, line in tail.flush():
+                    yield line
+                return
+            time.sleep(interval)
+
+    def submit(
+        self,
+        algo_id,
+        command,
+        config,
+        input_path,
+        stream=False,
+        compression=None,
+        compression_level=None,
+        upload_mode=None,
+    ):
         """
         Submit an algo run
         :param algo_id: algo id
         :param command: run command
         :param config: run config dict or path to config file or json string
         :param input_path: input path for the run
+        :param stream: compress and upload the input in one pipeline with a chunked multipart body,
+        memory stays bounded and nothing is written to disk, the server must accept chunked requests
+        :param compression: compression engine of the input archive, gzip, pgzip (multi-threaded gzip),
+        zstd or tar (no compression), zstd and tar require server support, default to self.compression
+        :param compression_level: compression level, default to self.compression_level
+        :param upload_mode: multipart (one request) or chunked (resumable chunks, requires server support),
+        default to self.upload_mode
         :return: run id
+        The compressed input is kept in the artifact cache (use_artifact_cache), a later submit of the same input
+        folder with another config uploads the same archive bytes without compressing anything.
         """
         _api_url = f"{self.api_url}algo_runs/submit"
-        if config is str:
-            if os.path.exists(config):
-                config = json.load(open(config, "r"))
-            else:
-                try:
-                    config = json.loads(config)
-                except Exception as e:
-                    raise Exception(f"Failed to parse config: {e}")
-        # check if input_path exists
-        if not os.path.exists(input_path):
-            raise Exception(f"{input_path} does not exist")
-        # check if input_path is a folder
-        if not os.path.isdir(input_path):
-            raise Exception(f"{input_path} is not a folder")
-        # create temp folder and tar zip all files in input_path to temp folder as input.tar.gz using python tarfile
-        with tempfile.TemporaryDirectory() as temp_dir:
-            input_tar_gz_file = os.path.join(temp_dir, "input.tar.gz")
-            input_file_md5 = compress_to_tar_gz(input_path, input_tar_gz_file)
-            # print(f"algo run input file md5: {input_file_md5}")
-            run_hash = generate_run_hash(
-                self.flow_host_url, self.flow_workspace_id, algo_id, command, config, input_file_md5
+        if upload_mode is None:
+            upload_mode = self.upload_mode
+        check_upload_mode(upload_mode)
+        if stream and upload_mode == UPLOAD_MODE_CHUNKED:
+            raise ValueError("stream is not supported by the chunked upload mode")
+        config = load_run_config(config)
+        check_input_folder(input_path)
+        # the run hash is based on the input content manifest, so a cached run is found before anything is compressed
+        input_fingerprint = self.get_input_fingerprint(input_path)
+        run_hash = generate_run_hash(
+            self.flow_host_url, self.flow_workspace_id, algo_id, command, config, input_fingerprint
+        )
+        # print(f"algo run hash: {run_hash}")
+        run_id = self._load_cached_run_id(run_hash)
+        if run_id is not None:
+            print(f"algo run submitted with run_id: {run_id}")
+            return run_id
+        if compression is None:
+            compression = self.compression
+        if compression_level is None:
+            compression_level = self.compression_level
+        if stream:
+            return self._submit_stream(
+                algo_id, command, config, input_path, run_hash, input_fingerprint, compression, compression_level
+            )
+        if upload_mode == UPLOAD_MODE_CHUNKED:
+            return self._submit_chunked(
+                algo_id, command, config, input_path, run_hash, input_fingerprint, compression, compression_level
             )
-            # print(f"algo run hash: {run_hash}")
-            # check if run_hash exists
-            _run_hash_file_name = os.path.join(self.local_cache_dir,f"algo-run-{run_hash}.json")
-            if os.path.exists(_run_hash_file_name):
-                # load run_hash_file
-                _run_hash_file = json.load(open(_run_hash_file_name, "r"))
-                run_id = _run_hash_file["run_id"]
+        file_content = self._read_input_archive(input_path, input_fingerprint, compression, compression_level)
+        return self._upload_run(
+            algo_id, command, config, run_hash, get_archive_file_name(compression), file_content, compression
+        )
+
+    def submit_many(self, algo_id, command, configs, input_path, max_workers=8, compression=None, compression_level=None):
+        """
+        Submit one algo run per config with the same input, e.g. for a parameter sweep.
+        The input folder is fingerprinted and compressed once and the archive is shared by all uploads,
+        configs found in the local run cache are not submitted again.
+        :param algo_id: algo id
+        :param command: run command
+        :param configs: list of run configs, each a dict or path to config file or json string
+        :param input_path: input path shared by all runs
+        :param max_workers: max number of concurrent uploads
+        :param compression: compression engine of the input archive, default to self.compression
+        :param compression_level: compression level, default to self.compression_level
+        :return: list of SubmitResult in the order of configs
+        """
+        check_input_folder(input_path)
+        if compression is None:
+            compression = self.compression
+        if compression_level is None:
+            compression_level = self.compression_level
+        input_fingerprint = self.get_input_fingerprint(input_path)
+        results = []
+        # run hash -> results waiting for the upload, identical configs are only submitted once
+        to_submit = {}
+        for config in configs:
+            result = SubmitResult(config)
+            results.append(result)
+            try:
+                result.config = load_run_config(config)
+                run_hash = generate_run_hash(
+                    self.flow_host_url, self.flow_workspace_id, algo_id, command, result.config, input_fingerprint
+                )
+                result.run_id = self._load_cached_run_id(run_hash)
+            except Exception as e:
+                result.error = e
+                continue
+            if result.run_id is not None:
+                result.cached = True
+                continue
+            to_submit.setdefault(run_hash, []).append(result)
+        if not to_submit:
+            return results
+        file_content = self._read_input_archive(input_path, input_fingerprint, compression, compression_level)
+        file_name = get_archive_file_name(compression)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._upload_run, algo_id, command, same_runs[0].config, run_hash, file_name, file_content, compression
+                ): same_runs
+                for run_hash, same_runs in to_submit.items()
+            }
+            for future in as_completed(futures):
+                for result in futures[future]:
+                    try:
+                        result.run_id = future.result()
+                    except Exception as e:
+                        print(f"Failed to submit algo run with config {result.config}: {e}")
+                        result.error = e
+        return results
+
+    def _upload_run(self, algo_id, command, config, run_hash, file_name, file_content, compression, upload_id=None):
+        """
+        Upload an input archive and submit the run
+        :param upload_id: id of an input archive uploaded with the chunked upload mode, file_content is not sent
+        :return: run id
+        """
+        _api_url = f"{self.api_url}algo_runs/submit"
+        _data = {
+            "algo_id": algo_id,
+            "workspace_id": self.flow_workspace_id,
+            "run_command": command,
+            "config": json.dumps(config),
+        }
+        if upload_id is not None:
+            _data["upload_id"] = upload_id
+            files = None
+        else:
+            files = {
+                "file": (file_name, file_content, get_archive_content_type(compression)),
+            }
+        r = self.transport.post(
+            _api_url,
+            data=_data,
+            files=files,
+        )
+        r.raise_for_status()
+        self._save_cached_run(run_hash, r.json())
+        run_id = r.json()["run_id"]
+        print(f"algo run submitted with run_id: {run_id}")
+        return run_id
+
+    def get_input_fingerprint(self, input_path):
+        """
+        Content manifest hash of the input folder, used in the run hash
+        :param input_path: input path for the run
+        :return: hex digest
+        """
+        return fingerprint_folder(
+            input_path, self.input_hash_name, self.manifest_dir, strict=self.strict_input_hash
+        )
+
+    def get_run_hash(self, algo_id, command, config, input_path):
+        """
+        Get the local cache key of a run
+        :param algo_id: algo id
+        :param command: run command
+        :param config: run config dict
+        :param input_path: input path for the run
+        :return: run hash
+        """
+        input_fingerprint = self.get_input_fingerprint(input_path)
+        return generate_run_hash(
+            self.flow_host_url, self.flow_workspace_id, algo_id, command, config, input_fingerprint
+        )
+
+    def _load_cached_run_id(self, run_hash):
+        if self.run_cache is None:
+            return None
+        return self.run_cache.get_run_id(run_hash)
+
+    def _save_cached_run(self, run_hash, submit_response):
+        if self.run_cache is not None:
+            self.run_cache.put(run_hash, submit_response)
+
+    def _submit_chunked(
+        self, algo_id, command, config, input_path, run_hash, input_fingerprint, compression, compression_level
+    ):
+        """
+        Submit an algo run with a resumable chunked upload of the input archive.
+        The archive is kept in upload_dir until the run is submitted, so a retry after a failure
+        uploads the same bytes and resumes from the last acknowledged chunk.
+        Threads submitting the same run share the archive in upload_dir, they are serialized per run hash
+        and the run submitted by the first one is returned to the others.
+        :return: run id
+        """
+        with self._chunked_submit_locks_lock:
+            lock = self._chunked_submit_locks.setdefault(run_hash, threading.Lock())
+        with lock:
+            run_id = self._load_cached_run_id(run_hash)
+            if run_id is not None:
                 print(f"algo run submitted with run_id: {run_id}")
+                return run_id
+            return self._submit_chunked_locked(
+                algo_id, command, config, input_path, run_hash, input_fingerprint, compression, compression_level
+            )
+
+    def _submit_chunked_locked(
+        self, algo_id, command, config, input_path, run_hash, input_fingerprint, compression, compression_level
+    ):
+        file_name = get_archive_file_name(compression)
+        archive_path = os.path.join(self.upload_dir, get_archive_file_name(compression, f"input-{run_hash}"))
+        if not os.path.exists(archive_path):
+            os.makedirs(self.upload_dir, exist_ok=True)
+            temp_path = f"{archive_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            if self.artifact_cache is None:
+                self._compress_input(input_path, temp_path, compression, compression_level)
             else:
-                with open(input_tar_gz_file, "rb") as f:
-                    file_content = f.read()
-                    files = {
-                        "file": (os.path.basename(input_tar_gz_file), file_content),
-                    }
-                    _data = {
-                        "algo_id": algo_id,
-                        "workspace_id": self.flow_workspace_id,
-                        "run_command": command,
-                        "config": json.dumps(config),
-                    }
-                    r = requests.post(
-                        _api_url,
-                        headers=self.get_credential_header(),
-                        data=_data,
-                        files=files,
-                    )
-                r.raise_for_status()
-                with open(_run_hash_file_name, "w") as f:
-                    json.dump(r.json(), f, indent=4)
-                run_id = r.json()["run_id"]
-                print(f"algo run submitted with run_id: {run_id}")
-            return run_id
+                # the artifact cache may evict the archive during the upload, upload_dir keeps its own link or copy
+                with self._open_input_archive(input_path, input_fingerprint, compression, compression_level) as f:
+                    try:
+                        os.link(f.name, temp_path)
+                    except OSError:
+                        # no hardlinks, or evicted after the open, the open file is still readable
+                        with open(temp_path, "wb") as out:
+                            shutil.copyfileobj(f, out)
+            os.replace(temp_path, archive_path)
+        upload = self.get_chunked_uploader().upload(archive_path, file_name)
+        run_id = self._upload_run(
+            algo_id, command, config, run_hash, file_name, None, compression, upload_id=upload["upload_id"]
+        )
+        os.remove(archive_path)
+        return run_id
 
-    def gather(self, run_id, output_path):
+    def _submit_stream(
+        self, algo_id, command, config, input_path, run_hash, input_fingerprint, compression, compression_level
+    ):
+        """
+        Submit an algo run while the input archive is being created,
+        an archive of the same input found in the artifact cache is sent instead
+        :return: run id
+        """
+        _api_url = f"{self.api_url}algo_runs/submit"
+        cached_archive = None
+        if self.artifact_cache is not None:
+            archive_path = self.artifact_cache.get(
+                self._get_artifact_key(input_path, input_fingerprint, compression, compression_level), compression
+            )
+            if archive_path is not None:
+                try:
+                    cached_archive = open(archive_path, "rb")
+                except FileNotFoundError:
+                    # evicted by another process
+                    pass
+        if cached_archive is not None:
+            chunks, _ = produce_in_thread(lambda f: _copy_file_to(cached_archive, f))
+        else:
+            chunks, _ = produce_in_thread(
+                lambda f: write_tar_gz(
+                    input_path, f, self.input_hash_name, compression, compression_level, self.compression_workers
+                )
+            )
+        _data = {
+            "algo_id": algo_id,
+            "workspace_id": self.flow_workspace_id,
+            "run_command": command,
+            "config": json.dumps(config),
+        }
+        content_type, body = iter_multipart(
+            _data, "file", get_archive_file_name(compression), chunks, get_archive_content_type(compression)
+        )
+        r = self.transport.post(_api_url, data=body, headers={"Content-Type": content_type})
+        r.raise_for_status()
+        self._save_cached_run(run_hash, r.json())
+        run_id = r.json()["run_id"]
+        print(f"algo run submitted with run_id: {run_id}")
+        return run_id
+
+    def gather(self, run_id, output_path, include=None, exclude=None, resumable=False):
         """
         Gather algo run results
         :param run_id: algo run id
         :param output_path: output path for the run
+        :param include: glob patterns of the output files to extract, e.g. ["output.csv"], all files if not set.
+            The download stops once all the literal paths are extracted.
+        :param exclude: glob patterns of the output files to skip
+        :param resumable: download the archive to the local cache dir first, with resume, range segments and
+            integrity checks, then extract it to a staging folder and move the files to output_path
         :return:
+        Complete outputs are kept in the local output store (use_output_store), a run gathered again
+        is placed from the store as reflinks or copies (hardlinks if output_store_hardlinks) without any request.
         """
+        # the output of a succeeded run never changes, a stored output is placed without any request
+        output_key = self._get_output_key(run_id)
+        if self.output_store is not None:
+            if self.output_store.place_run(output_key, output_path, include, exclude) is not None:
+                print(f"gather algo run {run_id} from the local output store")
+                print("gather algo run successfully")
+                return
         # check run status
         status = self.check_status(run_id, wait=False)
         if status == RunStatus.UNKNOWN:
@@ -372,22 +1202,62 @@ class FlowAlgo:
             print(f"algo run {run_id} is still running, unable to gather results")
             return None
         # status == RunStatus.SUCCEEDED
+        if self.output_store is not None and include is None and exclude is None:
+            # only complete outputs are stored, the output is downloaded to the store and placed from there
+            staging_folder = self.output_store.make_staging_dir()
+            try:
+                self._download_output(run_id, staging_folder, None, None, resumable)
+                self.output_store.add_run(output_key, staging_folder)
+            finally:
+                shutil.rmtree(staging_folder, ignore_errors=True)
+            if self.output_store.place_run(output_key, output_path) is None:
+                # evicted by another process in the meantime
+                self._download_output(run_id, output_path, None, None, resumable)
+        else:
+            self._download_output(run_id, output_path, include, exclude, resumable)
+        print("gather algo run successfully")
+
+    def _download_output(self, run_id, output_path, include, exclude, resumable):
         _data = {"run_id": run_id, "file_type": "OUTPUT"}
         _api_url = f"{self.api_url}algo_runs/download"
-        r = requests.post(
-            _api_url,
-            json=_data,
-            headers=self.get_credential_header(),
-        )
-        r.raise_for_status()
-        os.makedirs(output_path, exist_ok=True)
-        # write file to temp file and extract to output_path
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_file = os.path.join(temp_dir, "output.tar.gz")
-            with open(temp_file, "wb") as f:
-                f.write(r.content)
-            extract_archive(temp_file, output_path)
-        print("gather algo run successfully")
+        if resumable:
+            self._gather_resumable(_api_url, _data, run_id, output_path, include, exclude)
+            return
+        r = self.transport.post(_api_url, json=_data, stream=True)
+        try:
+            r.raise_for_status()
+            os.makedirs(output_path, exist_ok=True)
+            # download in a background thread and extract the archive while it is received
+            def _download(f):
+                for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+
+            chunks, _ = produce_in_thread(_download)
+            reader = IterReader(chunks)
+            try:
+                extract_archive_stream(reader, output_path, include, exclude)
+            finally:
+                reader.close()
+        finally:
+            r.close()
+
+    def _gather_resumable(self, api_url, data, run_id, output_path, include, exclude):
+        archive_path = os.path.join(self.local_cache_dir, "downloads", f"output-{run_id}.archive")
+        download_file(self.transport, "POST", api_url, archive_path, self.download_workers, json=data)
+        # extract next to output_path, so the files are moved with a rename on the same file system
+        parent_folder = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(parent_folder, exist_ok=True)
+        staging_folder = tempfile.mkdtemp(prefix=".gather-", dir=parent_folder)
+        try:
+            extract_archive(archive_path, staging_folder, include, exclude)
+            for root, _, files in os.walk(staging_folder):
+                target_folder = os.path.join(output_path, os.path.relpath(root, staging_folder))
+                os.makedirs(target_folder, exist_ok=True)
+                for file in files:
+                    os.replace(os.path.join(root, file), os.path.join(target_folder, file))
+        finally:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+        os.remove(archive_path)
 
     def terminate(self, run_id):
         """
@@ -397,23 +1267,13 @@ class FlowAlgo:
         """
         _api_url = f"{self.api_url}algo_runs/terminate"
         _data = {"run_id": run_id}
-        r = requests.post(
-            _api_url,
-            json=_data,
-            headers=self.get_credential_header(),
-        )
+        r = self.transport.post(_api_url, json=_data)
         try:
             r.raise_for_status()
         except Exception as e:
             print(f"Failed to terminate algo run: {e}")
             return None
         # delete local cache
-        # go through all files in local_cache_dir, if run_id is in the loaded json file, delete the file
-        for file in os.listdir(self.local_cache_dir):
-            _file_path = os.path.join(self.local_cache_dir, file)
-            if os.path.isfile(_file_path):
-                _run_hash_file = json.load(open(_file_path, "r"))
-                if _run_hash_file["run_id"] == run_id:
-                    os.remove(_file_path)
-                    break
+        if self.run_cache is not None:
+            self.run_cache.remove_run(run_id)
         print("terminate algo run successfully")
\ No newline at end of file
@@ -3,38 +3,73 @@ import mimetypes
 import os
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from enum import Enum
 from pprint import pprint
-import requests
-import re
 import uuid
+
+import requests
+
+from .app_cache import DEFAULT_APP_MANIFEST_TTL, AppManifestCache, get_shared_app_manifest_cache
 from .constants import DataType, LangType, RunStatus
+from .downloads import DEFAULT_DOWNLOAD_WORKERS, download_file
+from .log_errors import ErrorExtractor, iter_error_records
+from .log_tail import LogTail
+from .pagination import DEFAULT_PAGE_SIZE, iter_pages
+from .polling import PollingPolicy
+from .regression_report import StageTimer
+from .transport import DEFAULT_POOL_SIZE, BaseTransport, bind_transport_token, get_default_transport
+from .uploads import (
+    DEFAULT_UPLOAD_CHUNK_SIZE,
+    DEFAULT_UPLOAD_WORKERS,
+    UPLOAD_MODE_CHUNKED,
+    UPLOAD_MODE_MULTIPART,
+    ChunkedUploader,
+    check_upload_mode,
+)
 
 
 def extract_error_message(log_string):
-    combined_pattern = re.compile(
-        r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} ERROR.*?(?=\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|$)|Traceback \(most recent call last\):[\s\S]+?(?=\d{4}-\d{2}-\d{2} |\Z))",
-        re.DOTALL,
-    )
-    # pattern = re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} ERROR.*?(?=\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|$))", re.DOTALL)
-    matches = combined_pattern.findall(log_string)
-    return "\n\n".join(matches)
+    """
+    Get the ERROR records and tracebacks of a log
+    :param log_string: log string, file object or iterable of lines
+    :return: errors separated by blank lines
+    """
+    return "\n\n".join(record.text for record in iter_error_records(log_string))
 
 
-def extract_exception(log: str) -> str:
-    pattern = r"(Traceback \(most recent call last\):[\s\S]+?(?=\d{4}-\d{2}-\d{2} |\Z))"
-    matches = re.findall(pattern, log)
-    traceback = "\n".join(matches)
-    return traceback
+def extract_exception(log) -> str:
+    """
+    Get the tracebacks of a log
+    :param log: log string, file object or iterable of lines
+    :return: tracebacks separated by new lines
+    """
+    return "\n".join(record.traceback for record in iter_error_records(log) if record.traceback is not None)
 
 
-def list_app(flow_host_url=None,flow_api_token=None):
+def list_app(flow_host_url=None,flow_api_token=None,transport=None):
     """
     List all apps in the workspace
+    :param transport: optional transport, the default pooled transport of the api token is used if not set
     :return:
     """
     print("Listing all apps accessible by the api token...")
+    app_ids = []
+    for app in iter_apps(flow_host_url, flow_api_token, transport):
+        print(app["id"],app["app_manifest"]["display_name"]["zh"])
+        app_ids.append(app["id"])
+    return app_ids
+
+
+def iter_apps(flow_host_url=None, flow_api_token=None, transport=None, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """
+    Iterate all apps accessible by the api token, pages are fetched lazily
+    :param transport: optional transport, the default pooled transport of the api token is used if not set
+    :param page_size: page size
+    :param prefetch: fetch the next page in the background
+    :return: generator of app objects
+    """
     if flow_host_url is None:
         flow_host_url = os.getenv("FLOW_HOST", None)
     if flow_api_token is None:
@@ -45,12 +80,33 @@ def list_app(flow_host_url=None,flow_api_token=None):
         raise ValueError("Flow api token is not set")
     flow_host_url = flow_host_url.rstrip("/")
     api_url = f"{flow_host_url}/flowopt-server/api/apps/list"
-    r = requests.get(api_url, headers={"CAuthorization": f"bearer {flow_api_token}"}, params={"page": 1, "page_size": 99})
-    r.raise_for_status()
-    app_list = r.json()
-    for app in app_list:
-        print(app["id"],app["app_manifest"]["display_name"]["zh"])
-    return [app["id"] for app in app_list]
+    if transport is None:
+        transport = get_default_transport(flow_api_token)
+    else:
+        bind_transport_token(transport, flow_api_token)
+
+    def _fetch_page(page, size):
+        r = transport.get(api_url, params={"page": page, "page_size": size})
+        r.raise_for_status()
+        return r.json()
+
+    return iter_pages(_fetch_page, page_size, prefetch=prefetch)
+
+@dataclass
+class SolveResult:
+    """
+    Result of one instance of FlowApp.solve_all_instances
+    """
+
+    instance_id: str
+    process_id: str = None
+    status: RunStatus = RunStatus.UNKNOWN
+    error: Exception = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.status != RunStatus.FAILED and self.status != RunStatus.CANCELLED
+
 
 @dataclass
 class FlowApp:
@@ -58,6 +114,16 @@ class FlowApp:
     flow_api_token: str = os.getenv("FLOW_API_TOKEN", None)
     flow_workspace_id: str = os.getenv("FLOW_WORKSPACE_ID", None)
     flow_app_id: str = None
+    transport: BaseTransport = None
+    pool_size: int = DEFAULT_POOL_SIZE
+    polling_policy: PollingPolicy = None
+    app_manifest_cache: AppManifestCache = None
+    app_manifest_ttl: float = DEFAULT_APP_MANIFEST_TTL
+    local_cache_dir: str = os.path.join(os.getcwd(), ".flow_algo_sdk_cache")
+    upload_mode: str = UPLOAD_MODE_MULTIPART
+    upload_chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE
+    upload_workers: int = DEFAULT_UPLOAD_WORKERS
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS
 
     def __post_init__(self):
         if self.flow_host_url is None:
@@ -69,6 +135,17 @@ class FlowApp:
         if self.flow_app_id is None:
             raise ValueError("Flow app id is not set")
         self.flow_host_url = self.flow_host_url.rstrip("/")
+        if self.transport is None:
+            self.transport = get_default_transport(self.flow_api_token, self.pool_size)
+        else:
+            bind_transport_token(self.transport, self.flow_api_token)
+        if self.polling_policy is None:
+            self.polling_policy = PollingPolicy()
+        if self.app_manifest_cache is None:
+            self.app_manifest_cache = get_shared_app_manifest_cache(
+                self.flow_host_url, self.flow_api_token, self.flow_workspace_id, self.app_manifest_ttl
+            )
+        check_upload_mode(self.upload_mode)
 
     @property
     def api_url(self):
@@ -104,7 +181,7 @@ class FlowApp:
             "app_id": self.get_app_id(),
             "order_by_locked_at": "desc",
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         res = [
             {
@@ -126,15 +203,27 @@ class FlowApp:
 
     def get_app_data(self):
         app_id = self.get_app_id()
+        app = self.app_manifest_cache.get(app_id, self._load_app_list)
+        if app is None:
+            raise ValueError(f"App id {app_id} not found")
+        return app
+
+    def _load_app_list(self):
         _url = self.api_url + f"workspace/{self.flow_workspace_id}/all_apps"
-        # r = request_cache(_url, headers_str=json.dumps(self.get_credential_header()))
-        r = requests.get(_url, headers=self.get_credential_header(), params={"page": 1, "page_size": 99})
-        r.raise_for_status()
-        app_list = r.json()
-        for app in app_list:
-            if app["id"] == app_id:
-                return app
-        raise ValueError(f"App id {app_id} not found")
+
+        def _fetch_page(page, size):
+            r = self.transport.get(_url, params={"page": page, "page_size": size})
+            r.raise_for_status()
+            return r.json()
+
+        return list(iter_pages(_fetch_page, prefetch=False))
+
+    def invalidate_app_manifest(self):
+        """
+        Drop the cached app list, the next call reloads it from flow
+        :return:
+        """
+        self.app_manifest_cache.invalidate()
 
     def get_app_endpoint(self):
         app = self.get_app_data()
@@ -148,29 +237,20 @@ class FlowApp:
         app_endpoint = self.get_app_endpoint()
         _url = self.flow_host_url + "/" + app_endpoint + f"/api/data/{instance_id}"
         _data = {"data_type": data_type.value, "lang": language.value}
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
-        r.raise_for_status()
-        with open(out_path, "wb") as f:
-            f.write(r.content)
+        download_file(self.transport, "POST", _url, out_path, self.download_workers, json=_data)
 
     def download_instance_raw_data(self, instance_id, out_path: str):
         # download the instance raw input data (based on the input data model in the database)
         # the sheet and column name are based on the input data model, and can be re-use to create new instance by using raw_import process
         app_endpoint = self.get_app_endpoint()
         _url = self.flow_host_url + "/" + app_endpoint + f"/api/raw_data/{instance_id}"
-        r = requests.get(_url, headers=self.get_credential_header())
-        r.raise_for_status()
-        with open(out_path, "wb") as f:
-            f.write(r.content)
+        download_file(self.transport, "GET", _url, out_path, self.download_workers)
 
     def download_instance_user_input_data(self, instance_id, out_path: str):
         # download the user uploaded input data (the user initial uploaded data)
         _url = self.api_url + "tasks/download_file"
         _data = {"run_instance_id": instance_id}
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
-        r.raise_for_status()
-        with open(out_path, "wb") as f:
-            f.write(r.content)
+        download_file(self.transport, "POST", _url, out_path, self.download_workers, json=_data)
 
     def create_folder(self, name, description=""):
         workspace_id = self.get_workspace_id()
@@ -182,7 +262,7 @@ class FlowApp:
             "name": name,
             "description": description,
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         # print(r.json())
         # return folder id
@@ -199,8 +279,8 @@ class FlowApp:
             "order_by": "created_at",
             "order_by_created_at": "desc",
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data,
-                          params={"page": 1, "page_size": 99})
+        r = self.transport.post(_url, json=_data,
+                          params={"page": page, "page_size": page_size})
         r.raise_for_status()
         res = [
             {
@@ -214,9 +294,18 @@ class FlowApp:
         # print(res)
         return res
 
+    def iter_folders(self, active=True, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+        """
+        Iterate all folders of the app, pages are fetched lazily
+        :return: generator of folders, see get_folders
+        """
+        return iter_pages(
+            lambda page, size: self.get_folders(active, page, size), page_size, prefetch=prefetch
+        )
+
     def get_folder_details(self, folder_id):
         _url = self.api_url + f"sessions/get/{folder_id}"
-        r = requests.get(_url, headers=self.get_credential_header())
+        r = self.transport.get(_url)
         r.raise_for_status()
         # print(r.json())
         return r.json()
@@ -233,39 +322,68 @@ class FlowApp:
             "workspace_id": workspace_id,
             "app_id": app_id,
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data,
-                          params={"page": 1, "page_size": 99})
+        r = self.transport.post(_url, json=_data,
+                          params={"page": page, "page_size": page_size})
         r.raise_for_status()
         # print(r.json())
         return r.json()
 
+    def iter_instances(self, folder_id, active=True, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+        """
+        Iterate all instances of a folder, pages are fetched lazily
+        :return: generator of instance objects, see get_instances
+        """
+        return iter_pages(
+            lambda page, size: self.get_instances(folder_id, active, page, size), page_size, prefetch=prefetch
+        )
+
     def get_instance_details(self, instance_id):
         """
         Get instance details by instance id
         """
         _url = self.api_url + f"run_instances/get/{instance_id}"
-        r = requests.get(_url, headers=self.get_credential_header())
+        r = self.transport.get(_url)
         r.raise_for_status()
         # print(r.json())
         return r.json()
 
-    def create_instance(
-        self, name, file_path, folder_id, description="", raw_import=False
-    ):
-        # check if file_path exists
-        if os.path.isfile(file_path) is False:
-            raise FileNotFoundError(f"File {file_path} not found")
+    def upload_file(self, file_path, upload_mode=None):
+        """
+        Upload an instance file
+        :param file_path: file path
+        :param upload_mode: multipart (one request) or chunked (resumable chunks, requires server support),
+        default to self.upload_mode
+        :return: server path of the file
+        """
+        if upload_mode is None:
+            upload_mode = self.upload_mode
+        check_upload_mode(upload_mode)
+        if upload_mode == UPLOAD_MODE_CHUNKED:
+            uploader = ChunkedUploader(
+                self.transport,
+                self.api_url,
+                os.path.join(self.local_cache_dir, "uploads"),
+                self.upload_chunk_size,
+                self.upload_workers,
+            )
+            return uploader.upload(file_path)["path"]
         _url = self.api_url + "tasks/upload_file"
         with open(file_path, "rb") as f:
             file_content = f.read()
             files = {
                 "file": (os.path.basename(file_path), file_content),
             }
-            r = requests.post(_url, headers=self.get_credential_header(), files=files)
+            r = self.transport.post(_url, files=files)
         r.raise_for_status()
-        # print(r.json())
-        path = r.json()["path"]
-        # print(path)
+        return r.json()["path"]
+
+    def create_instance(
+        self, name, file_path, folder_id, description="", raw_import=False, upload_mode=None
+    ):
+        # check if file_path exists
+        if os.path.isfile(file_path) is False:
+            raise FileNotFoundError(f"File {file_path} not found")
+        path = self.upload_file(file_path, upload_mode)
         _url = self.api_url + "tasks/import"
         _data = {
             "session_id": folder_id,
@@ -274,7 +392,7 @@ class FlowApp:
             "pipeline_name": "import_excel" if raw_import is False else "raw_import",
             "pipeline_config": {"config": {"file_path": path}},
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         # print(r.json())
         # return instance id
@@ -291,39 +409,31 @@ class FlowApp:
             "pipeline_name": "raw_clone",
             "pipeline_config": {"config": {}},
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         # print(r.json())
         # return instance id
         return r.json()["id"]
 
-    def re_import_instance(self, instance_id, file_path, raw_import=False):
+    def re_import_instance(self, instance_id, file_path, raw_import=False, upload_mode=None):
         """
         Re-import instance data
         :param instance_id:
         :param file_path:
+        :param upload_mode: multipart or chunked, default to self.upload_mode
         :return:
         """
         # check if file_path exists
         if os.path.isfile(file_path) is False:
             raise FileNotFoundError(f"File {file_path} not found")
-        _url = self.api_url + "tasks/upload_file"
-        with open(file_path, "rb") as f:
-            file_content = f.read()
-            files = {
-                "file": (os.path.basename(file_path), file_content),
-            }
-            r = requests.post(_url, headers=self.get_credential_header(), files=files)
-        r.raise_for_status()
-        # print(r.json())
-        path = r.json()["path"]
+        path = self.upload_file(file_path, upload_mode)
         _url = self.api_url + "tasks/reimport"
         _data = {
             "run_instance_id": instance_id,
             "pipeline_name": "import_excel" if raw_import is False else "raw_import",
             "pipeline_config": {"config": {"file_path": path}},
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         # print(r.json())
         # return instance id
@@ -338,7 +448,7 @@ class FlowApp:
             _data["description"] = description
         if len(_data) == 0:
             return
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         return r.json()
 
@@ -354,7 +464,7 @@ class FlowApp:
             },
         }
         try:
-            r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+            r = self.transport.post(_url, json=_data)
             r.raise_for_status()
         except Exception as e:
             # try again with different pipeline config
@@ -368,15 +478,26 @@ class FlowApp:
                 "config": {},
             },
             }
-            r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+            r = self.transport.post(_url, json=_data)
             r.raise_for_status()
 
         # print(r.json())
         return r.json()["id"]
 
-    def solve_all_instances(self, folder_id):
-        instances = self.get_instances(folder_id)
-        for instance in instances:
+    def solve_all_instances(self, folder_id, max_workers=8, wait=False, timeout=None, polling_policy=None):
+        """
+        Solve all ready instances of a folder that are not solved yet
+        :param folder_id: folder id
+        :param max_workers: max number of solves triggered at the same time, they share the pooled transport
+        :param wait: wait until all triggered solves are completed, the statuses are polled with one paged
+        list of the folder instead of one request per instance, instances missing from the listing are checked
+        one by one and a deleted instance gets the 404 error as its result error
+        :param timeout: max seconds to wait, None for no limit
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :return: dict of instance id -> SolveResult of the triggered solves
+        """
+        results = {}
+        for instance in self.iter_instances(folder_id):
             # check if instance is ready
             readiness_status = instance["readiness_status"]
             # continue if not ready or solve process is triggered
@@ -384,19 +505,120 @@ class FlowApp:
                 continue
             if instance["solve_process_id"] is not None:
                 continue
-            self.solve_instance(folder_id, instance["id"])
-            print(f"Solve instance {instance['id']}")
+            results[instance["id"]] = SolveResult(instance["id"])
+        if not results:
+            return results
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.solve_instance, folder_id, instance_id): result
+                for instance_id, result in results.items()
+            }
+            for future in as_completed(futures):
+                result = futures[future]
+                try:
+                    result.process_id = future.result()
+                    result.status = RunStatus.RUNNING
+                    print(f"Solve instance {result.instance_id}")
+                except Exception as e:
+                    print(f"Failed to solve instance {result.instance_id}: {e}")
+                    result.error = e
+        if wait:
+            self._wait_for_folder_solves(folder_id, results, timeout, polling_policy)
+        return results
+
+    def _wait_for_folder_solves(self, folder_id, results, timeout, polling_policy):
+        pending = {instance_id for instance_id, result in results.items() if result.error is None}
+        polling = (polling_policy or self.polling_policy).start()
+        while pending:
+            try:
+                listed = set()
+                for instance in self.iter_instances(folder_id):
+                    if instance["id"] not in pending:
+                        continue
+                    listed.add(instance["id"])
+                    self._set_solve_status(results[instance["id"]], self._get_status(instance.get("solving_status")), pending)
+                # instances missing from a complete listing were moved or deleted, check them one by one
+                for instance_id in pending - listed:
+                    try:
+                        status = self._get_solve_status(instance_id)
+                    except requests.HTTPError as e:
+                        if e.response is None or e.response.status_code != 404:
+                            raise
+                        print(f"Instance {instance_id} was deleted while its solve was running")
+                        results[instance_id].error = e
+                        pending.discard(instance_id)
+                        continue
+                    self._set_solve_status(results[instance_id], status, pending)
+                interval = polling.next_interval()
+            except Exception as e:
+                interval = polling.error_interval()
+                print(f"Failed to check solve status of folder {folder_id}: {e}, retrying in {interval:.1f} seconds")
+            if not pending:
+                break
+            if timeout is not None and polling.elapsed + interval > timeout:
+                print(f"Timeout: {len(pending)} solves of folder {folder_id} did not complete in {timeout} seconds")
+                break
+            print(f"{len(pending)} solves of folder {folder_id} are still running, retrying in {interval:.1f} seconds")
+            time.sleep(interval)
+
+    @staticmethod
+    def _set_solve_status(result, status, pending):
+        result.status = status
+        if status in [RunStatus.SUCCEEDED, RunStatus.FAILED, RunStatus.CANCELLED]:
+            pending.discard(result.instance_id)
 
     def get_logs(self, process_id):
         _url = self.api_url + f"tasks/logs"
         _data = {
             "process_id": process_id,
         }
-        r = requests.post(_url, headers=self.get_credential_header(), json=_data)
+        r = self.transport.post(_url, json=_data)
         r.raise_for_status()
         # print(r.json())
         return r.json()
 
+    def tail_logs(self, process_id, follow=True, timeout=None, polling_policy=None):
+        """
+        Iterate the log lines of all nodes of a process, also while the process is running
+        :param process_id: process id
+        :param follow: keep polling and yield the new lines until the process is completed
+        :param timeout: max seconds to follow the logs, None for no limit,
+            TimeoutError is raised if the requests still fail by then
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :return: generator of (node name, line)
+        """
+        tail = LogTail()
+        polling = (polling_policy or self.polling_policy).start()
+        while True:
+            try:
+                logs = self.get_logs(process_id)
+            except Exception as e:
+                if not follow:
+                    raise
+                interval = polling.error_interval()
+                if timeout is not None and polling.elapsed + interval > timeout:
+                    print(f"Timeout: failed to get the logs of process {process_id} in {timeout} seconds: {e}")
+                    for node_name, line in tail.flush():
+                        yield node_name, line
+                    raise TimeoutError(f"Failed to get the logs of process {process_id} in {timeout} seconds") from e
+                print(f"Failed to get logs of process {process_id}: {e}, retrying in {interval:.1f} seconds")
+                time.sleep(interval)
+                continue
+            status = self._get_status(logs["process"]["status"])
+            final = status != RunStatus.RUNNING or not follow
+            for node in logs["nodes"]:
+                node_name = node.get("displayName") or node.get("id")
+                for line in tail.feed(node_name, node.get("main_log"), final=final):
+                    yield node_name, line
+            if final:
+                return
+            interval = polling.next_interval()
+            if timeout is not None and polling.elapsed + interval > timeout:
+                for node_name, line in tail.flush():
+                    yield node_name, line
+                return
+            time.sleep(interval)
+
     def _get_status(self,status):
         if status is None:
             return RunStatus.UNKNOWN
@@ -415,17 +637,40 @@ class FlowApp:
         status = logs["process"]["status"]
         return self._get_status(status)
 
-    def filter_error_logs(self, logs, only_error=True):
+    def filter_error_logs(self, logs, only_error=True, as_records=False):
+        """
+        Get the log of the first node that did not succeed
+        :param logs: tasks/logs response
+        :param only_error: only keep the ERROR records and tracebacks of the log
+        :param as_records: return a list of ErrorRecord instead of a string
+        :return:
+        """
         errors = None
         nodes = logs["nodes"]
         for node in nodes:
             if node["phase"] != "Succeeded":
                 errors = node["main_log"]
+                if as_records:
+                    return list(iter_error_records(errors or ""))
                 if only_error:
                     errors = extract_error_message(errors)
                 return errors
         return errors
 
+    def tail_errors(self, process_id, follow=True, timeout=None, polling_policy=None):
+        """
+        Iterate the errors of all nodes of a process as they are logged, see tail_logs
+        :return: generator of (node name, ErrorRecord)
+        """
+        extractors = {}
+        for node_name, line in self.tail_logs(process_id, follow, timeout, polling_policy):
+            extractor = extractors.setdefault(node_name, ErrorExtractor())
+            for record in extractor.feed(line):
+                yield node_name, record
+        for node_name, extractor in extractors.items():
+            for record in extractor.close():
+                yield node_name, record
+
     def get_import_logs(self, instance_id):
         import_process_id = self.get_import_process_id(instance_id)
         if import_process_id is not None:
@@ -467,34 +712,42 @@ class FlowApp:
         return self._get_status(readiness_status)
 
     def get_readiness_status(
-        self, instance_id, continue_checks=False, max_checks=30, sleep_time=2
+        self, instance_id, continue_checks=False, max_checks=30, sleep_time=None, polling_policy=None, timeout=None
     ):
         """
         Check if instance is ready
         :param instance_id:
         :param continue_checks:
         :param max_checks:
-        :param sleep_time:
+        :param sleep_time: fixed seconds between checks, self.polling_policy is used if not set
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :param timeout: max seconds to keep checking
         :return:
         """
-        readiness_status = RunStatus.UNKNOWN
+        return self._wait_for_status(
+            self._get_readiness_status, instance_id, continue_checks, max_checks, sleep_time, polling_policy, timeout
+        )
+
+    def _wait_for_status(
+        self, get_status, instance_id, continue_checks, max_checks, sleep_time, polling_policy, timeout
+    ):
+        if sleep_time is not None:
+            polling_policy = PollingPolicy.fixed(sleep_time)
+        polling = (polling_policy or self.polling_policy).start()
+        status = RunStatus.UNKNOWN
         for i in range(max_checks):
-            readiness_status = self._get_readiness_status(instance_id)
-            if readiness_status == RunStatus.UNKNOWN:
+            status = get_status(instance_id)
+            if status == RunStatus.UNKNOWN:
                 return RunStatus.UNKNOWN
-            if readiness_status == RunStatus.SUCCEEDED:
-                return readiness_status
-            elif readiness_status == RunStatus.FAILED:
-                return readiness_status
-            elif readiness_status == RunStatus.CANCELLED:
-                return readiness_status
-            else:
-                if continue_checks is True:
-                    time.sleep(sleep_time)
-                    continue
-                else:
-                    return readiness_status
-        return readiness_status
+            if status in [RunStatus.SUCCEEDED, RunStatus.FAILED, RunStatus.CANCELLED]:
+                return status
+            if continue_checks is not True or i == max_checks - 1:
+                return status
+            interval = polling.next_interval()
+            if timeout is not None and polling.elapsed + interval > timeout:
+                return status
+            time.sleep(interval)
+        return status
 
     def _get_solve_status(self, instance_id):
         instance = self.get_instance_details(instance_id)
@@ -502,34 +755,21 @@ class FlowApp:
         return self._get_status(solve_status)
 
     def get_solve_status(
-        self, instance_id, continue_checks=False, max_checks=30, sleep_time=2
+        self, instance_id, continue_checks=False, max_checks=30, sleep_time=None, polling_policy=None, timeout=None
     ):
         """
-        Check if instance is ready
+        Check if instance is solved
         :param instance_id:
         :param continue_checks:
         :param max_checks:
-        :param sleep_time:
+        :param sleep_time: fixed seconds between checks, self.polling_policy is used if not set
+        :param polling_policy: PollingPolicy, default to self.polling_policy
+        :param timeout: max seconds to keep checking
         :return:
         """
-        solve_status = RunStatus.UNKNOWN
-        for i in range(max_checks):
-            solve_status = self._get_solve_status(instance_id)
-            if solve_status == RunStatus.UNKNOWN:
-                return RunStatus.UNKNOWN
-            if solve_status == RunStatus.SUCCEEDED:
-                return solve_status
-            elif solve_status == RunStatus.FAILED:
-                return solve_status
-            elif solve_status == RunStatus.CANCELLED:
-                return solve_status
-            else:
-                if continue_checks is True:
-                    time.sleep(sleep_time)
-                    continue
-                else:
-                    return solve_status
-        return solve_status
+        return self._wait_for_status(
+            self._get_solve_status, instance_id, continue_checks, max_checks, sleep_time, polling_policy, timeout
+        )
 
     def get_app_name(self):
         app = self.get_app_data()
@@ -571,12 +811,19 @@ class FlowApp:
             f"{self.flow_host_url}/app/{self.get_app_id()}/executions/{process_id}/logs"
         )
 
-    def regression_test(self):
+    def regression_test(self, timings=None):
+        """
+        Run the regression test of the app, raise ValueError on the first failed step
+        :param timings: optional dict filled in place with the seconds spent in each stage of REGRESSION_STAGES
+        :return:
+        """
         print("-" * 100)
         print("Do regression test for app:{}...".format(self.get_app_id()))
         print("-" * 100)
+        timer = StageTimer(timings)
         # check if flow connection is ok
         test_id = f"{uuid.uuid4()}"
+        timer.start("connection")
         print("Checking flow connection...")
         if self.check_flow_connection() is False:
             raise ValueError("Flow connection failed")
@@ -590,23 +837,25 @@ class FlowApp:
         # print("App data:")
         # pprint(app_data)
         # check app help doc link
+        timer.start("doc_link")
         print("Checking app help doc link...")
         app_help_doc_link = self.get_app_help_doc_link()
         print(app_help_doc_link)
         # check if app help doc link is valid
         try:
-            r = requests.get(app_help_doc_link)
+            r = self.transport.get(app_help_doc_link)
             r.raise_for_status()
         except Exception as e:
             raise ValueError("App help doc link is not valid, ex:{}".format(e))
         print("App help doc link ok")
         # check app input template link
+        timer.start("template_download")
         print("Checking app input template link...")
         app_input_template_link = self.get_app_input_template_link()
         print(app_input_template_link)
         # check if app input template link is valid
         try:
-            r = requests.get(app_input_template_link)
+            r = self.transport.get(app_input_template_link)
             r.raise_for_status()
         except Exception as e:
             raise ValueError("App input template link is not valid, ex:{}".format(e))
@@ -620,6 +869,7 @@ class FlowApp:
                 f.write(r.content)
             print("App input template downloaded to {}".format(tmp_file_path))
             # create folder
+            timer.start("upload")
             print("Creating folder...")
             try:
                 folder_id = self.create_folder("regresion_test#{}".format(test_id))
@@ -655,15 +905,17 @@ class FlowApp:
             print("Instance details:")
             # pprint(instance_details)
             # check if instance is ready
+            timer.start("readiness")
             print("Checking if instance is ready...")
             try:
-                readiness_status = self.get_readiness_status(instance_id, True, 600, 2)
+                readiness_status = self.get_readiness_status(instance_id, True, 600, timeout=1200)
             except Exception as e:
                 raise ValueError("Check if instance is ready failed, ex:{}".format(e))
             if readiness_status != RunStatus.SUCCEEDED:
                 raise ValueError("Instance is not ready, status:{}".format(readiness_status))
             print("Instance is ready")
             # solve instance
+            timer.start("solve")
             print("Solving instance...")
             try:
                 solve_process_id = self.solve_instance(folder_id, instance_id)
@@ -673,13 +925,14 @@ class FlowApp:
             # check if instance is solved
             print("Checking if instance is solved...")
             try:
-                solve_status = self.get_solve_status(instance_id, True, 600, 2)
+                solve_status = self.get_solve_status(instance_id, True, 600, timeout=1200)
             except Exception as e:
                 raise ValueError("Check if instance is solved failed, ex:{}".format(e))
             if solve_status != RunStatus.SUCCEEDED:
                 raise ValueError("Instance is not solved, status:{}".format(solve_status))
             print("Instance is solved")
             # download instance output data
+            timer.start("output_download")
             print("Downloading instance output data...")
             try:
                 tmp_file_path = os.path.join(tmp_dir, "output_data.xlsx")
@@ -690,6 +943,7 @@ class FlowApp:
             except Exception as e:
                 raise ValueError("Download instance output data failed, ex:{}".format(e))
             # check clone instance
+            timer.start("clone")
             print("Checking clone instance...")
             try:
                 clone_instance_id = self.clone_instance(
@@ -710,7 +964,7 @@ class FlowApp:
             print("Checking if clone instance is ready...")
             try:
                 clone_readiness_status = self.get_readiness_status(
-                    clone_instance_id, True, 600, 2
+                    clone_instance_id, True, 600, timeout=1200
                 )
             except Exception as e:
                 raise ValueError(
@@ -723,6 +977,7 @@ class FlowApp:
                     )
                 )
             print("Clone instance is ready")
+            timer.stop()
 
 
 
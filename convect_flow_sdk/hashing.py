@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from . import instrumentation
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_HASH_NAME = "md5"
+
+
+def new_hasher(hash_name=DEFAULT_HASH_NAME):
+    """
+    Create a hash object
+    :param hash_name: any name supported by hashlib.new, e.g. md5, sha256, blake2b
+    :return: hash object
+    """
+    return hashlib.new(hash_name)
+
+
+class HashingReader:
+    """
+    Read-only file object wrapper that updates a hash with every chunk read through it,
+    so a file can be hashed in the same pass that copies it elsewhere.
+    """
+
+    def __init__(self, fileobj, hasher):
+        self.fileobj = fileobj
+        self.hasher = hasher
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def hash_file(path, hash_name=DEFAULT_HASH_NAME, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Hash a file in fixed size chunks
+    :param path: file path
+    :param hash_name: hash algorithm
+    :param chunk_size: read size
+    :return: hex digest
+    """
+    started_at = instrumentation.start_timer()
+    hasher = new_hasher(hash_name)
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size += len(chunk)
+    if started_at is not None:
+        instrumentation.emit_operation("hash", started_at, size, hash_name=hash_name)
+    return hasher.hexdigest()
+
+
+class InputManifest:
+    """
+    Persistent manifest of a folder, it stores path, size, mtime_ns, inode and content hash of every file,
+    so only files whose stat data changed need to be hashed again.
+    """
+
+    # files modified less than this before the previous scan started may have changed
+    # within the mtime resolution of the file system, they are always hashed again
+    RACY_WINDOW_NS = 2 * 10**9
+
+    def __init__(self, manifest_dir, source_folder, hash_name=DEFAULT_HASH_NAME):
+        self.source_folder = os.path.abspath(source_folder)
+        self.hash_name = hash_name
+        key = hashlib.sha256(f"{self.source_folder}|{hash_name}".encode("utf-8")).hexdigest()
+        self.path = os.path.join(manifest_dir, f"manifest-{key}.json")
+        self.scanned_at_ns = 0
+        self.entries = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # a broken manifest only costs a full rehash
+            return
+        if data.get("source_folder") != self.source_folder or data.get("hash_name") != self.hash_name:
+            return
+        self.scanned_at_ns = data["scanned_at_ns"]
+        self.entries = data["entries"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "source_folder": self.source_folder,
+            "hash_name": self.hash_name,
+            "scanned_at_ns": self.scanned_at_ns,
+            "entries": self.entries,
+        }
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def get_digest(self, arcname, stat):
+        """
+        Get the cached content hash of a file if its stat data did not change
+        :return: hex digest or None
+        """
+        digest = self._get_digest(arcname, stat)
+        instrumentation.emit_cache("input_manifest", digest is not None)
+        return digest
+
+    def _get_digest(self, arcname, stat):
+        entry = self.entries.get(arcname)
+        if entry is None:
+            return None
+        size, mtime_ns, inode, digest = entry
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns or inode != stat.st_ino:
+            return None
+        if stat.st_mtime_ns >= self.scanned_at_ns - self.RACY_WINDOW_NS:
+            return None
+        return digest
+
+    def scan(self, strict=False):
+        """
+        Hash all files of the folder, reusing the stored hash of unchanged files
+        :param strict: ignore the stored hashes and hash every file
+        :return: sorted list of [relative path, hex digest]
+        """
+        if not strict:
+            self.load()
+        scanned_at_ns = time.time_ns()
+        entries = {}
+        manifest = []
+        for root, dirs, files in os.walk(self.source_folder):
+            for file in files:
+                full_path = os.path.join(root, file)
+                arcname = os.path.relpath(full_path, self.source_folder).replace(os.sep, "/")
+                stat = os.stat(full_path)
+                digest = None if strict else self.get_digest(arcname, stat)
+                if digest is None:
+                    digest = hash_file(full_path, self.hash_name)
+                entries[arcname] = [stat.st_size, stat.st_mtime_ns, stat.st_ino, digest]
+                manifest.append([arcname, digest])
+        self.entries = entries
+        self.scanned_at_ns = scanned_at_ns
+        manifest.sort()
+        return manifest
+
+
+def fingerprint_folder(source_folder, hash_name=DEFAULT_HASH_NAME, manifest_dir=None, strict=False):
+    """
+    Content manifest hash of a folder, based on the relative path and the content hash of every file.
+    It is computed without compressing anything, so it can be used as cache key before an archive is built.
+    :param source_folder: folder path
+    :param hash_name: hash algorithm
+    :param manifest_dir: folder of the persistent InputManifest, only changed files are hashed if set
+    :param strict: hash every file even if the manifest has an entry with the same stat data
+    :return: hex digest
+    """
+    started_at = instrumentation.start_timer()
+    if manifest_dir is not None:
+        input_manifest = InputManifest(manifest_dir, source_folder, hash_name)
+        manifest = input_manifest.scan(strict=strict)
+        input_manifest.save()
+    else:
+        manifest = []
+        for root, dirs, files in os.walk(source_folder):
+            for file in files:
+                full_path = os.path.join(root, file)
+                arcname = os.path.relpath(full_path, source_folder).replace(os.sep, "/")
+                manifest.append([arcname, hash_file(full_path, hash_name)])
+        # sort by path to make sure the order does not depend on the file system
+        manifest.sort()
+    hasher = new_hasher(hash_name)
+    hasher.update(json.dumps(manifest).encode())
+    if started_at is not None:
+        instrumentation.emit_operation("fingerprint", started_at, files=len(manifest), hash_name=hash_name)
+    return hasher.hexdigest()
@@ -0,0 +1,421 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+# Structured events of the http requests, archive operations and local caches of the sdk.
+#
+# Hooks are callables registered with add_hook, they receive a RequestEvent, OperationEvent or CacheEvent.
+# Every instrumented call site checks has_hooks() (one truthiness test of a module global) before it measures
+# anything, so nothing is timed, counted or allocated while no hook is registered.
+#
+# Hooks run synchronously in the thread that made the call, they should be fast and thread safe.
+
+_hooks = ()
+_hooks_lock = threading.Lock()
+_local = threading.local()
+
+# seconds, the upper bounds of the duration histograms of MetricsAggregator
+DEFAULT_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# path segments replaced by {id} in the endpoint of a request, so ids do not become metric labels
+_ID_SEGMENT = re.compile(
+    r"^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}|\d+)$"
+)
+API_PATH_PREFIX = "/flowopt-server/api/"
+
+
+@dataclass
+class RequestEvent:
+    """
+    One http request, latency is the time until the response headers are received for streamed responses,
+    bytes are None when the size is not known without reading the body
+    """
+
+    method: str
+    endpoint: str
+    url: str
+    status: int = None
+    latency: float = 0.0
+    bytes_sent: int = None
+    bytes_received: int = None
+    retries: int = 0
+    error: str = None
+
+
+@dataclass
+class OperationEvent:
+    """
+    One local operation, e.g. compress, hash, fingerprint or extract
+    """
+
+    operation: str
+    duration: float
+    bytes_in: int = None
+    bytes_out: int = None
+    attributes: dict = field(default_factory=dict)
+
+
+@dataclass
+class CacheEvent:
+    """
+    One lookup in a local cache, e.g. run_cache, app_manifest or input_manifest
+    """
+
+    cache: str
+    hit: bool
+    attributes: dict = field(default_factory=dict)
+
+
+def add_hook(hook):
+    """
+    Register a hook called with every event
+    :param hook: callable taking one event
+    :return: hook
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook):
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def clear_hooks():
+    global _hooks
+    with _hooks_lock:
+        _hooks = ()
+
+
+def has_hooks():
+    return bool(_hooks)
+
+
+def emit(event):
+    for hook in _hooks:
+        try:
+            hook(event)
+        except Exception as e:
+            # a broken hook must not break the sdk call
+            print(f"Instrumentation hook {hook} failed: {e}")
+
+
+def start_timer():
+    """
+    Start time of an operation, None if no hook is registered so the operation is not measured
+    :return: perf_counter value or None
+    """
+    return time.perf_counter() if _hooks else None
+
+
+def emit_operation(operation, started_at, bytes_in=None, bytes_out=None, **attributes):
+    """
+    Emit an OperationEvent
+    :param operation: operation name
+    :param started_at: value of start_timer, nothing is emitted if None
+    """
+    if started_at is None or not _hooks:
+        return
+    emit(OperationEvent(operation, time.perf_counter() - started_at, bytes_in, bytes_out, attributes))
+
+
+def emit_cache(cache, hit, **attributes):
+    if _hooks:
+        emit(CacheEvent(cache, hit, attributes))
+
+
+@contextmanager
+def retry_attempt(attempt):
+    """
+    Report the requests made in the block as retry number attempt of the same call
+    :param attempt: 0 for the first try
+    """
+    previous = getattr(_local, "attempt", 0)
+    _local.attempt = attempt
+    try:
+        yield
+    finally:
+        _local.attempt = previous
+
+
+def get_endpoint(url):
+    """
+    Path of a url relative to the flow api, with ids replaced by {id}, e.g. uploads/{id}/chunks/{id}
+    """
+    path = urlsplit(url).path
+    if path.startswith(API_PATH_PREFIX):
+        path = path[len(API_PATH_PREFIX) :]
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+def get_body_size(kwargs):
+    """
+    Size of the data argument of a request, None if it is not a bytes or str body
+    """
+    data = kwargs.get("data")
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    return None
+
+
+class CountingWriter:
+    """
+    Write-only file object wrapper that counts the bytes written through it
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        flush = getattr(self.fileobj, "flush", None)
+        if flush is not None:
+            flush()
+
+
+def _count_chunks(chunks, counter):
+    for chunk in chunks:
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def _get_bytes_sent(r, counter):
+    if counter is not None:
+        return counter[0]
+    body = getattr(getattr(r, "request", None), "body", None)
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return None
+
+
+def _get_bytes_received(r, stream):
+    if not stream:
+        return len(r.content)
+    content_length = r.headers.get("Content-Length")
+    return int(content_length) if content_length is not None else None
+
+
+def _get_transport_retries(r):
+    # connection retries done by urllib3 inside the adapter
+    retries = getattr(getattr(r, "raw", None), "retries", None)
+    history = getattr(retries, "history", None)
+    return len(history) if history else 0
+
+
+def emit_request(method, url, started_at, status=None, bytes_sent=None, bytes_received=None, retries=0, error=None):
+    if not _hooks:
+        return
+    emit(
+        RequestEvent(
+            method=method.upper(),
+            endpoint=get_endpoint(url),
+            url=url,
+            status=status,
+            latency=time.perf_counter() - started_at,
+            bytes_sent=bytes_sent,
+            bytes_received=bytes_received,
+            retries=retries + getattr(_local, "attempt", 0),
+            error=error,
+        )
+    )
+
+
+def instrumented_request(send, method, url, **kwargs):
+    """
+    Call send(method, url, **kwargs), a requests-like request function, and emit a RequestEvent
+    :return: response of send
+    """
+    counter = None
+    data = kwargs.get("data")
+    if data is not None and hasattr(data, "__next__"):
+        # generator body of a chunked upload, counted while requests sends it
+        counter = [0]
+        kwargs["data"] = _count_chunks(data, counter)
+    started_at = time.perf_counter()
+    try:
+        r = send(method, url, **kwargs)
+    except Exception as e:
+        response = getattr(e, "response", None)
+        emit_request(
+            method,
+            url,
+            started_at,
+            status=getattr(response, "status_code", None),
+            bytes_sent=counter[0] if counter is not None else get_body_size(kwargs),
+            error=type(e).__name__,
+        )
+        raise
+    emit_request(
+        method,
+        url,
+        started_at,
+        status=r.status_code,
+        bytes_sent=_get_bytes_sent(r, counter),
+        bytes_received=_get_bytes_received(r, kwargs.get("stream", False)),
+        retries=_get_transport_retries(r),
+    )
+    return r
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsAggregator:
+    """
+    In-memory aggregation of the sdk events in counters and duration histograms,
+    register it with add_hook(aggregator) and read it with to_prometheus()
+    """
+
+    METRICS = {
+        "flow_sdk_requests_total": ("counter", "Number of http requests"),
+        "flow_sdk_request_duration_seconds": ("histogram", "Latency of the http requests"),
+        "flow_sdk_request_sent_bytes_total": ("counter", "Bytes sent in http request bodies"),
+        "flow_sdk_request_received_bytes_total": ("counter", "Bytes received in http response bodies"),
+        "flow_sdk_request_retries_total": ("counter", "Number of retried http requests"),
+        "flow_sdk_operations_total": ("counter", "Number of local operations"),
+        "flow_sdk_operation_duration_seconds": ("histogram", "Duration of the local operations"),
+        "flow_sdk_operation_input_bytes_total": ("counter", "Bytes read by the local operations"),
+        "flow_sdk_operation_output_bytes_total": ("counter", "Bytes written by the local operations"),
+        "flow_sdk_cache_lookups_total": ("counter", "Number of local cache lookups"),
+    }
+
+    def __init__(self, buckets=DEFAULT_DURATION_BUCKETS):
+        """
+        :param buckets: upper bounds of the duration histogram buckets in seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # (metric name, labels tuple) -> value
+        self.counters = {}
+        # (metric name, labels tuple) -> [bucket counts, sum, count]
+        self.histograms = {}
+
+    def __call__(self, event):
+        if isinstance(event, RequestEvent):
+            labels = (("method", event.method), ("endpoint", event.endpoint))
+            status = str(event.status) if event.status is not None else "error"
+            self.inc("flow_sdk_requests_total", labels + (("status", status),))
+            self.observe("flow_sdk_request_duration_seconds", labels, event.latency)
+            if event.bytes_sent:
+                self.inc("flow_sdk_request_sent_bytes_total", labels, event.bytes_sent)
+            if event.bytes_received:
+                self.inc("flow_sdk_request_received_bytes_total", labels, event.bytes_received)
+            if event.retries:
+                self.inc("flow_sdk_request_retries_total", labels, event.retries)
+        elif isinstance(event, OperationEvent):
+            labels = (("operation", event.operation),)
+            self.inc("flow_sdk_operations_total", labels)
+            self.observe("flow_sdk_operation_duration_seconds", labels, event.duration)
+            if event.bytes_in:
+                self.inc("flow_sdk_operation_input_bytes_total", labels, event.bytes_in)
+            if event.bytes_out:
+                self.inc("flow_sdk_operation_output_bytes_total", labels, event.bytes_out)
+        elif isinstance(event, CacheEvent):
+            self.inc(
+                "flow_sdk_cache_lookups_total", (("cache", event.cache), ("result", "hit" if event.hit else "miss"))
+            )
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * len(self.buckets), 0.0, 0]
+                self.histograms[key] = histogram
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def get_counter(self, name, **labels):
+        """
+        Sum of a counter over the series matching the given labels
+        """
+        with self._lock:
+            return sum(
+                value
+                for (metric, series_labels), value in self.counters.items()
+                if metric == name and all(dict(series_labels).get(k) == v for k, v in labels.items())
+            )
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def to_prometheus(self):
+        """
+        Metrics in the Prometheus text exposition format
+        :return: str
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self.histograms.items()}
+        lines = []
+        for name, (metric_type, help_text) in self.METRICS.items():
+            series = counters if metric_type == "counter" else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key in keys:
+                labels = key[1]
+                if metric_type == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(series[key])}")
+                    continue
+                bucket_counts, total, count = series[key]
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (("le", _format_value(float(bound))),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_prometheus(self, path):
+        """
+        Write the metrics to a file atomically, e.g. for the textfile collector of the node exporter
+        :param path: file path
+        """
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(temp_path, path)
@@ -0,0 +1,159 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# a log record starts with a timestamp, e.g. 2023-12-18 21:36:15 ERROR message
+RECORD_START = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\S*\s+(\S+)\s?(.*)$")
+DATE_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2} ", re.MULTILINE)
+TRACEBACK_START = "Traceback (most recent call last):"
+DEFAULT_ERROR_LEVELS = ("ERROR",)
+
+
+@dataclass
+class ErrorRecord:
+    """
+    Error found in a log, either an ERROR record or a traceback printed outside of an ERROR record
+    """
+
+    timestamp: Optional[str]
+    level: Optional[str]
+    message: str
+    traceback: Optional[str] = None
+    lines: List[str] = field(default_factory=list, repr=False)
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+
+class ErrorExtractor:
+    """
+    Line-oriented state machine finding the errors of a log in one pass.
+    Lines are pushed with feed, the records are returned as soon as the next record starts,
+    so memory is bounded by the size of one record and the extractor can run on a growing log.
+    """
+
+    def __init__(self, levels=DEFAULT_ERROR_LEVELS):
+        """
+        :param levels: log levels reported as errors
+        """
+        self.levels = set(levels)
+        self._record = None
+        # index of the first traceback line in the lines of the current record
+        self._traceback_index = None
+        # first line of the current non error record, parsed only if a traceback is printed in the record
+        self._header = None
+
+    def _finish(self):
+        record = self._record
+        if record is None:
+            return None
+        lines = record.lines
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if self._traceback_index is not None:
+            record.traceback = "\n".join(lines[self._traceback_index :])
+            if record.level not in self.levels:
+                # a bare traceback, the last line is the exception
+                record.message = lines[-1].strip()
+        self._record = None
+        self._traceback_index = None
+        return record
+
+    def feed(self, line):
+        """
+        Push one log line
+        :return: list of the records completed by the line
+        """
+        line = line.rstrip("\r\n")
+        completed = []
+        if DATE_PREFIX.match(line):
+            if self._record is not None:
+                completed.append(self._finish())
+            self._header = line
+            # cheap substring test first, most records are not errors
+            if any(level in line for level in self.levels):
+                match = RECORD_START.match(line)
+                if match is not None and match.group(2) in self.levels:
+                    timestamp, level, message = match.groups()
+                    self._record = ErrorRecord(timestamp, level, message, lines=[line])
+            return completed
+        is_traceback_start = line.lstrip().startswith(TRACEBACK_START)
+        if self._record is None:
+            if is_traceback_start:
+                match = RECORD_START.match(self._header) if self._header is not None else None
+                timestamp, level = match.groups()[:2] if match is not None else (None, None)
+                self._record = ErrorRecord(timestamp, level, "", lines=[line])
+                self._traceback_index = 0
+            return completed
+        self._record.lines.append(line)
+        if self._traceback_index is None:
+            if is_traceback_start:
+                self._traceback_index = len(self._record.lines) - 1
+            else:
+                self._record.message += "\n" + line
+        return completed
+
+    def is_idle(self):
+        return self._record is None
+
+    def close(self):
+        """
+        End of the log
+        :return: list of the remaining records
+        """
+        record = self._finish()
+        return [] if record is None else [record]
+
+
+def _iter_error_lines(text, extractor):
+    """
+    Iterate only the lines of a log string around the error markers.
+    The text between markers is skipped with str.find, the lines of the record containing a marker are
+    fed from the first line of the record until the extractor has no open record.
+    The next index of every marker is kept and searched again only once pos is past it,
+    so every marker scans the text once and the whole pass stays linear, even with rare markers.
+    """
+    markers = list(extractor.levels) + [TRACEBACK_START]
+    next_index = {marker: -2 for marker in markers}
+    pos = 0
+    length = len(text)
+    while pos < length:
+        hit = -1
+        for marker in markers:
+            index = next_index[marker]
+            if index != -1 and index < pos:
+                index = next_index[marker] = text.find(marker, pos)
+            if index != -1 and (hit == -1 or index < hit):
+                hit = index
+        if hit == -1:
+            return
+        start = text.rfind("\n", pos, hit) + 1 or pos
+        while start > pos and not DATE_PREFIX.match(text, start):
+            start = text.rfind("\n", pos, start - 1) + 1 or pos
+        while start < length:
+            end = text.find("\n", start)
+            if end == -1:
+                end = length
+            yield text[start:end]
+            start = end + 1
+            if start > hit and extractor.is_idle():
+                break
+        pos = start
+
+
+def iter_error_records(log, levels=DEFAULT_ERROR_LEVELS):
+    """
+    Find the ERROR records and tracebacks of a log in one linear pass
+    :param log: log string, file object or iterable of lines
+    :param levels: log levels reported as errors
+    :return: generator of ErrorRecord
+    """
+    extractor = ErrorExtractor(levels)
+    if isinstance(log, str):
+        log = _iter_error_lines(log, extractor)
+    for line in log:
+        for record in extractor.feed(line):
+            yield record
+    for record in extractor.close():
+        yield record
@@ -0,0 +1,49 @@
+class LogTail:
+    """
+    Turns repeated snapshots of growing logs into the lines added since the previous snapshot.
+    The flow log endpoints return the whole log of every node on each call, so an offset and the
+    unterminated last line are kept per node and only the new complete lines are returned.
+    """
+
+    def __init__(self):
+        self._offsets = {}
+        self._partials = {}
+
+    def feed(self, node, log, final=False):
+        """
+        Feed the current snapshot of a node log
+        :param node: node name
+        :param log: whole log of the node, None if the node has no log in this snapshot
+        :param final: the log will not grow anymore, the unterminated last line is returned too
+        :return: list of new lines
+        """
+        offset = self._offsets.get(node, 0)
+        partial = self._partials.get(node, "")
+        if log is None:
+            # a missing log is not a truncated one, keep the offset so the log is not replayed
+            if final and partial:
+                self._partials[node] = ""
+                return [partial.rstrip("\r")]
+            return []
+        if len(log) < offset:
+            # the log was truncated or replaced, start over
+            offset = 0
+            partial = ""
+        text = partial + log[offset:]
+        self._offsets[node] = len(log)
+        lines = text.split("\n")
+        partial = lines.pop()
+        if final and partial:
+            lines.append(partial)
+            partial = ""
+        self._partials[node] = partial
+        return [line.rstrip("\r") for line in lines]
+
+    def flush(self):
+        """
+        Get the unterminated last lines of all nodes
+        :return: list of (node, line)
+        """
+        lines = [(node, partial) for node, partial in self._partials.items() if partial]
+        self._partials = {node: "" for node in self._partials}
+        return lines
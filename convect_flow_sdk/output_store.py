@@ -0,0 +1,337 @@
+import errno
+import json
+import os
+import shutil
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+from . import instrumentation
+from .extraction import MemberFilter
+from .hashing import hash_file
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows
+    fcntl = None
+
+OUTPUT_STORE_DB_NAME = "outputs.sqlite3"
+DEFAULT_OUTPUT_STORE_MAX_BYTES = 5 * 1024**3
+OUTPUT_HASH_NAME = "sha256"
+# linux ioctl cloning a file on copy-on-write file systems (btrfs, xfs, bcachefs, ...)
+FICLONE = 0x40049409
+# errors of a file system or a pair of paths without reflink or hardlink support
+_LINK_UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.EMLINK}
+
+PLACE_REFLINK = "reflink"
+PLACE_HARDLINK = "hardlink"
+PLACE_COPY = "copy"
+
+
+class OutputStore:
+    """
+    Content-addressed store of the outputs of succeeded algo runs, the output of a run never changes.
+    Files are stored once per content under objects/{sha256[:2]}/{sha256} as read-only files, and every run
+    has a manifest of (path, sha256, size) indexed in SQLite (WAL mode).
+    The size and mtime of every object are recorded when it is added and checked before it is placed,
+    a changed object is a miss and is replaced by the next download.
+    The least recently used runs are evicted once the objects are larger than max_bytes,
+    objects are deleted when no remaining run refers to them.
+    Files are placed in an output folder as reflinks (copy-on-write clones) where the file system supports them,
+    else as copies, both are independent writable files. Hardlinks to the read-only objects are opt-in.
+    """
+
+    def __init__(self, store_dir, max_bytes=DEFAULT_OUTPUT_STORE_MAX_BYTES, hardlinks=False):
+        """
+        :param store_dir: store folder
+        :param max_bytes: max total size of the objects, None for no limit
+        :param hardlinks: place files as hardlinks instead of copies when reflinks are not supported,
+            the placed files are the read-only store objects, editing them (e.g. as root) invalidates the stored runs
+        """
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.hardlinks = hardlinks
+        self.objects_dir = os.path.join(store_dir, "objects")
+        self.staging_dir = os.path.join(store_dir, "staging")
+        self.db_path = os.path.join(store_dir, OUTPUT_STORE_DB_NAME)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._reflink_supported = fcntl is not None and hasattr(fcntl, "ioctl")
+        self._hardlink_supported = hardlinks
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS output_runs ("
+                "run_key TEXT PRIMARY KEY, "
+                "files TEXT NOT NULL, "
+                "dirs TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS output_runs_last_used_at ON output_runs (last_used_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS output_objects ("
+                "digest TEXT PRIMARY KEY, "
+                "size INTEGER NOT NULL, "
+                "refs INTEGER NOT NULL, "
+                "mtime_ns INTEGER)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(output_objects)")]
+            if "mtime_ns" not in columns:
+                # store created by an older version, its objects have no recorded mtime and are downloaded again
+                conn.execute("ALTER TABLE output_objects ADD COLUMN mtime_ns INTEGER")
+            self._conn = conn
+        return self._conn
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def make_staging_dir(self):
+        """
+        Temp folder on the file system of the store, files extracted there are moved into the store without a copy
+        :return: folder path, removed by the caller
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return tempfile.mkdtemp(prefix="run-", dir=self.staging_dir)
+
+    def has_run(self, run_key):
+        with self._lock:
+            row = self._connect().execute("SELECT 1 FROM output_runs WHERE run_key = ?", (run_key,)).fetchone()
+        return row is not None
+
+    def add_run(self, run_key, folder):
+        """
+        Move the files of a folder into the store as the output of a run, the folder is left without its files
+        :param run_key: run key
+        :param folder: output folder of the run, usually a staging dir
+        :return: total size of the files in bytes
+        """
+        files = []
+        dirs = []
+        for root, sub_dirs, file_names in os.walk(folder):
+            rel_root = os.path.relpath(root, folder)
+            if not sub_dirs and not file_names and rel_root != ".":
+                dirs.append(rel_root.replace(os.sep, "/"))
+            for file_name in file_names:
+                path = os.path.join(root, file_name)
+                arcname = os.path.relpath(path, folder).replace(os.sep, "/")
+                files.append([arcname, hash_file(path, OUTPUT_HASH_NAME), os.path.getsize(path)])
+        files.sort()
+        total_size = sum(size for _, _, size in files)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # immediate transaction, the objects are moved while no other process evicts them
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM output_runs WHERE run_key = ?", (run_key,)).fetchone() is None:
+                    for arcname, digest, size in files:
+                        self._add_object(conn, os.path.join(folder, *arcname.split("/")), digest, size)
+                    conn.execute(
+                        "INSERT INTO output_runs VALUES (?, ?, ?, ?, ?, ?)",
+                        (run_key, json.dumps(files), json.dumps(dirs), total_size, now, now),
+                    )
+                self._evict(conn, keep=run_key)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return total_size
+
+    def _add_object(self, conn, path, digest, size):
+        object_path = self.object_path(digest)
+        row = conn.execute("SELECT size, mtime_ns FROM output_objects WHERE digest = ?", (digest,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE output_objects SET refs = refs + 1 WHERE digest = ?", (digest,))
+            if self._is_object_unchanged(digest, *row):
+                return
+            # the object was deleted or changed outside of the store, replace it
+        else:
+            conn.execute("INSERT INTO output_objects (digest, size, refs) VALUES (?, ?, 1)", (digest, size))
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(path, object_path)
+        conn.execute(
+            "UPDATE output_objects SET size = ?, mtime_ns = ? WHERE digest = ?",
+            (size, os.stat(object_path).st_mtime_ns, digest),
+        )
+
+    def _is_object_unchanged(self, digest, size, mtime_ns):
+        """
+        Check an object against the size and mtime recorded when it was added,
+        an in place edit changes the mtime even if the size stays the same
+        """
+        if mtime_ns is None:
+            return False
+        try:
+            object_stat = os.stat(self.object_path(digest))
+        except OSError:
+            return False
+        return object_stat.st_size == size and object_stat.st_mtime_ns == mtime_ns
+
+    def place_run(self, run_key, output_path, include=None, exclude=None):
+        """
+        Place the stored output of a run in output_path
+        :param run_key: run key
+        :param output_path: output folder
+        :param include: glob patterns of the files to place, see MemberFilter
+        :param exclude: glob patterns of the files to skip
+        :return: list of the placed paths, None if the run is not stored or one of its objects is missing
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT files, dirs FROM output_runs WHERE run_key = ?", (run_key,)).fetchone()
+            if row is None:
+                instrumentation.emit_cache("output_store", False)
+                return None
+            files, dirs = json.loads(row[0]), json.loads(row[1])
+            member_filter = MemberFilter(include, exclude)
+            selected = [(arcname, digest, size) for arcname, digest, size in files if member_filter.match(arcname)]
+            recorded = {}
+            for _, digest, _ in selected:
+                if digest not in recorded:
+                    recorded[digest] = conn.execute(
+                        "SELECT mtime_ns FROM output_objects WHERE digest = ?", (digest,)
+                    ).fetchone()
+        for _, digest, size in selected:
+            object_row = recorded[digest]
+            if object_row is None or not self._is_object_unchanged(digest, size, object_row[0]):
+                # evicted by another process or changed in place, download the output again
+                self.remove_run(run_key)
+                instrumentation.emit_cache("output_store", False)
+                return None
+        os.makedirs(output_path, exist_ok=True)
+        placed = []
+        for arcname, digest, _ in selected:
+            target = os.path.join(output_path, *arcname.split("/"))
+            target_folder = os.path.dirname(target)
+            if target_folder:
+                os.makedirs(target_folder, exist_ok=True)
+            try:
+                self.place_file(self.object_path(digest), target)
+            except FileNotFoundError:
+                # evicted by another process after the check, the placed files are replaced by the download
+                self.remove_run(run_key)
+                instrumentation.emit_cache("output_store", False)
+                return None
+            placed.append(arcname)
+        instrumentation.emit_cache("output_store", True)
+        if include is None:
+            for arcname in dirs:
+                if member_filter.match(arcname):
+                    os.makedirs(os.path.join(output_path, *arcname.split("/")), exist_ok=True)
+        with self._lock:
+            self._connect().execute(
+                "UPDATE output_runs SET last_used_at = ? WHERE run_key = ?", (time.time(), run_key)
+            )
+        return placed
+
+    def place_file(self, source, target):
+        """
+        Place a stored object at target as a reflink, a hardlink if enabled, or a copy, an existing target is replaced
+        :return: reflink, hardlink or copy
+        """
+        if os.path.lexists(target):
+            os.remove(target)
+        if self._reflink_supported:
+            try:
+                with open(source, "rb") as src, open(target, "wb") as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return PLACE_REFLINK
+            except OSError as e:
+                if os.path.lexists(target):
+                    os.remove(target)
+                if e.errno in _LINK_UNSUPPORTED:
+                    self._reflink_supported = False
+                else:
+                    raise
+        if self._hardlink_supported:
+            try:
+                os.link(source, target)
+                return PLACE_HARDLINK
+            except OSError as e:
+                if e.errno not in _LINK_UNSUPPORTED:
+                    raise
+                self._hardlink_supported = False
+        shutil.copyfile(source, target)
+        return PLACE_COPY
+
+    def remove_run(self, run_key):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._remove_run(conn, run_key)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _remove_run(self, conn, run_key):
+        row = conn.execute("SELECT files FROM output_runs WHERE run_key = ?", (run_key,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM output_runs WHERE run_key = ?", (run_key,))
+        for _, digest, _ in json.loads(row[0]):
+            conn.execute("UPDATE output_objects SET refs = refs - 1 WHERE digest = ?", (digest,))
+        for (digest,) in conn.execute("SELECT digest FROM output_objects WHERE refs <= 0").fetchall():
+            conn.execute("DELETE FROM output_objects WHERE digest = ?", (digest,))
+            try:
+                os.remove(self.object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn, keep=None):
+        """
+        Remove the least recently used runs until the objects fit in max_bytes, the run keep is never removed
+        """
+        if self.max_bytes is None:
+            return
+        while True:
+            total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM output_objects").fetchone()[0]
+            if total_size <= self.max_bytes:
+                return
+            row = conn.execute(
+                "SELECT run_key FROM output_runs WHERE run_key != ? ORDER BY last_used_at LIMIT 1", (keep or "",)
+            ).fetchone()
+            if row is None:
+                return
+            self._remove_run(conn, row[0])
+
+    @property
+    def size(self):
+        """
+        Total size of the stored objects in bytes
+        """
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM output_objects").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM output_runs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# flow caps the page size of the list endpoints, the sdk always requested 99 items,
+# a larger page_size would get short pages which look like the last page
+MAX_PAGE_SIZE = 99
+DEFAULT_PAGE_SIZE = MAX_PAGE_SIZE
+
+
+def iter_pages(fetch_page, page_size=DEFAULT_PAGE_SIZE, start_page=1, prefetch=True):
+    """
+    Iterate the items of a paged list endpoint, pages are fetched lazily.
+    With prefetch the next page is requested in a background thread while the caller handles the current one.
+    Only the current and the next page are held in memory, and no more pages are fetched once the caller stops.
+    :param fetch_page: function (page, page_size) -> list of items
+    :param page_size: page size, at most MAX_PAGE_SIZE
+    :param start_page: first page number
+    :param prefetch: fetch the next page in the background
+    :return: generator of items
+    """
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        page = start_page
+        pending = executor.submit(fetch_page, page, page_size) if prefetch else None
+        while True:
+            items = pending.result() if prefetch else fetch_page(page, page_size)
+            # a short page is the last one
+            has_next = len(items) >= page_size
+            if prefetch and has_next:
+                pending = executor.submit(fetch_page, page + 1, page_size)
+            for item in items:
+                yield item
+            if not has_next:
+                return
+            page += 1
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,209 @@
+import random
+import statistics
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import List, Optional
+
+# seconds an expected runtime estimated from the recent runs of an algo is reused
+EXPECTED_RUNTIME_TTL = 3600
+
+
+@dataclass
+class PollingPhase:
+    """
+    Polling interval bounds that apply from `start` seconds after the job started,
+    or after polling started if the job start time is unknown
+    """
+
+    start: float
+    min_interval: float
+    max_interval: float
+
+
+@dataclass
+class PollingPolicy:
+    """
+    Polling policy shared by FlowAlgo.check_status, FlowApp.get_readiness_status and FlowApp.get_solve_status.
+    Within a phase the interval grows exponentially from the phase min_interval to its max_interval,
+    with random jitter so many pollers do not hit the server at the same time.
+    When the expected runtime is known the phases are derived from it:
+    back off while the job is far from done, poll fast around the expected completion, back off again on overrun.
+    """
+
+    min_interval: float = 1.0
+    max_interval: float = 30.0
+    multiplier: float = 1.5
+    jitter: float = 0.1
+    error_interval: float = 10.0
+    expected_runtime: Optional[float] = None
+    phases: Optional[List[PollingPhase]] = field(default=None)
+
+    @classmethod
+    def fixed(cls, interval, error_interval=10.0):
+        """
+        Policy with a constant interval and no jitter
+        """
+        return cls(min_interval=interval, max_interval=interval, multiplier=1.0, jitter=0.0, error_interval=error_interval)
+
+    def with_expected_runtime(self, expected_runtime):
+        """
+        Copy of the policy using the given expected runtime in seconds
+        """
+        return replace(self, expected_runtime=expected_runtime)
+
+    @property
+    def is_adaptive(self):
+        """
+        Whether the phases are derived from the expected runtime
+        """
+        return not self.phases and self.min_interval < self.max_interval
+
+    def get_phases(self):
+        if self.phases:
+            return sorted(self.phases, key=lambda p: p.start)
+        if not self.expected_runtime or self.min_interval >= self.max_interval:
+            return [PollingPhase(0, self.min_interval, self.max_interval)]
+        expected = self.expected_runtime
+        far_interval = min(self.max_interval, max(self.min_interval, expected / 10))
+        near_interval = min(far_interval, self.min_interval * 2)
+        return [
+            # far from the expected completion
+            PollingPhase(0, self.min_interval, far_interval),
+            # around the expected completion, keep the detection latency low
+            PollingPhase(expected * 0.9, self.min_interval, near_interval),
+            # the job overruns, back off up to max_interval
+            PollingPhase(expected * 1.2, self.min_interval, self.max_interval),
+        ]
+
+    def start(self, job_started_at=None):
+        """
+        Start polling
+        :param job_started_at: unix time the job started, e.g. see get_run_started_at,
+            the phases are offset by the time the job ran before polling started
+        :return: PollingState
+        """
+        return PollingState(self, job_started_at)
+
+
+class PollingState:
+    def __init__(self, policy: PollingPolicy, job_started_at=None):
+        self.policy = policy
+        self.phases = policy.get_phases()
+        self.started_at = time.monotonic()
+        # seconds the job ran before polling started
+        self._job_offset = 0.0
+        self._phase_index = -1
+        self._attempt = 0
+        if job_started_at is not None:
+            self.set_job_started_at(job_started_at)
+
+    @property
+    def elapsed(self):
+        """
+        Seconds since polling started
+        """
+        return time.monotonic() - self.started_at
+
+    @property
+    def job_elapsed(self):
+        """
+        Seconds since the job started, the phases are relative to it
+        """
+        return self.elapsed + self._job_offset
+
+    def set_job_started_at(self, job_started_at):
+        """
+        Offset the phases by the start time of the job, may be called again, e.g. when the watched job changes
+        :param job_started_at: unix time
+        """
+        self._job_offset = max(0.0, time.time() - job_started_at - self.elapsed)
+
+    def _current_phase(self, elapsed):
+        index = 0
+        for i, phase in enumerate(self.phases):
+            if phase.start <= elapsed:
+                index = i
+        if index != self._phase_index:
+            # restart the backoff in a new phase
+            self._phase_index = index
+            self._attempt = 0
+        return index
+
+    def next_interval(self):
+        """
+        Interval before the next poll after a poll that did not complete
+        :return: seconds
+        """
+        elapsed = self.job_elapsed
+        index = self._current_phase(elapsed)
+        phase = self.phases[index]
+        interval = min(phase.max_interval, phase.min_interval * (self.policy.multiplier ** self._attempt))
+        self._attempt += 1
+        if self.policy.jitter:
+            interval *= random.uniform(1 - self.policy.jitter, 1 + self.policy.jitter)
+        # do not sleep past the start of the next phase
+        if index + 1 < len(self.phases):
+            interval = min(interval, max(self.phases[index + 1].start - elapsed, phase.min_interval))
+        return max(interval, 0.0)
+
+    def error_interval(self):
+        """
+        Interval before the next poll after a failed request
+        :return: seconds
+        """
+        return self.policy.error_interval
+
+    def sleep(self, error=False):
+        interval = self.error_interval() if error else self.next_interval()
+        time.sleep(interval)
+        return interval
+
+
+def parse_flow_time(value):
+    """
+    Parse a timestamp returned by flow, e.g. 2023-12-18 21:36:15+00:00 or 2023-12-18T21:36:14.862233
+    :return: datetime or None
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def get_run_started_at(run):
+    """
+    Start time of an algo run object returned by algo_runs/check or algo_runs/list
+    :return: unix time or None
+    """
+    run_job_status = run.get("run_job_status") or {}
+    started_at = parse_flow_time(run_job_status.get("created_at") or run.get("created_at"))
+    if started_at is None:
+        return None
+    if started_at.tzinfo is None:
+        # flow returns utc times
+        started_at = started_at.replace(tzinfo=timezone.utc)
+    return started_at.timestamp()
+
+
+def median_run_duration(runs):
+    """
+    Median duration in seconds of the finished runs returned by algo_runs/list
+    :param runs: algo run objects
+    :return: seconds or None if no run has finished
+    """
+    durations = []
+    for run in runs:
+        run_job_status = run.get("run_job_status") or {}
+        if run_job_status.get("status") != "Succeeded":
+            continue
+        created_at = parse_flow_time(run_job_status.get("created_at"))
+        finished_at = parse_flow_time(run_job_status.get("finished_at"))
+        if created_at is None or finished_at is None:
+            continue
+        durations.append((finished_at - created_at).total_seconds())
+    if not durations:
+        return None
+    return statistics.median(durations)
@@ -0,0 +1,136 @@
+import json
+import math
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+# stages of FlowApp.regression_test, in order
+REGRESSION_STAGES = [
+    "connection",
+    "doc_link",
+    "template_download",
+    "upload",
+    "readiness",
+    "solve",
+    "output_download",
+    "clone",
+]
+REPORT_PERCENTILES = [50, 90, 95, 99]
+
+
+class StageTimer:
+    """
+    Records the duration of consecutive stages in a timings dict, starting a stage ends the previous one.
+    A stage that raises is not recorded, so the first missing stage is the failed one.
+    """
+
+    def __init__(self, timings=None):
+        """
+        :param timings: dict filled in place with stage -> seconds, nothing is recorded if None
+        """
+        self.timings = timings
+        self._stage = None
+        self._started_at = None
+
+    def start(self, stage):
+        self.stop()
+        self._stage = stage
+        self._started_at = time.perf_counter()
+
+    def stop(self):
+        if self._stage is not None and self.timings is not None:
+            self.timings[self._stage] = time.perf_counter() - self._started_at
+        self._stage = None
+
+
+def percentile(values, q):
+    """
+    Percentile with linear interpolation between the closest ranks
+    :param values: list of numbers
+    :param q: percentile between 0 and 100
+    :return: value or None if values is empty
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def get_failed_stage(timings):
+    for stage in REGRESSION_STAGES:
+        if stage not in timings:
+            return stage
+    return None
+
+
+def build_report(results):
+    """
+    Build the regression report of a run
+    :param results: list of dicts with app_id, passed, error, duration and timings (stage -> seconds)
+    :return: report dict
+    """
+    stages = {}
+    for stage in REGRESSION_STAGES:
+        values = [result["timings"][stage] for result in results if stage in result["timings"]]
+        summary = {"count": len(values)}
+        for q in REPORT_PERCENTILES:
+            summary[f"p{q}"] = percentile(values, q)
+        summary["max"] = max(values) if values else None
+        summary["mean"] = sum(values) / len(values) if values else None
+        stages[stage] = summary
+    passed = sum(1 for result in results if result["passed"])
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "summary": {
+            "total": len(results),
+            "passed": passed,
+            "failed": len(results) - passed,
+            "duration": sum(result["duration"] for result in results),
+        },
+        "stages": stages,
+        "apps": results,
+    }
+
+
+def write_json_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def write_junit_xml(report, path):
+    """
+    Write the report as JUnit XML, one testcase per app, the stage timings are in the testcase properties
+    and the stage percentiles in the testsuite properties
+    """
+    summary = report["summary"]
+    suite = ET.Element(
+        "testsuite",
+        name="flow-regression-test",
+        tests=str(summary["total"]),
+        failures=str(summary["failed"]),
+        errors="0",
+        time=f"{summary['duration']:.3f}",
+        timestamp=report["generated_at"],
+    )
+    properties = ET.SubElement(suite, "properties")
+    for stage, stage_summary in report["stages"].items():
+        for key, value in stage_summary.items():
+            if key == "count" or value is None:
+                continue
+            ET.SubElement(properties, "property", name=f"{stage}.{key}", value=f"{value:.3f}")
+    for result in report["apps"]:
+        case = ET.SubElement(
+            suite, "testcase", classname="regression_test", name=result["app_id"], time=f"{result['duration']:.3f}"
+        )
+        case_properties = ET.SubElement(case, "properties")
+        for stage, value in result["timings"].items():
+            ET.SubElement(case_properties, "property", name=stage, value=f"{value:.3f}")
+        if not result["passed"]:
+            failure = ET.SubElement(
+                case, "failure", message=f"failed at stage {result['failed_stage']}", type="RegressionTestFailure"
+            )
+            failure.text = result["error"]
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
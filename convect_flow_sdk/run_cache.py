@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from . import instrumentation
+
+RUN_CACHE_DB_NAME = "algo-runs.sqlite3"
+# run hash prefix of the entries imported from older versions, they are only found by run id
+LEGACY_RUN_HASH_PREFIX = "legacy-md5:"
+
+
+class RunCache:
+    """
+    Indexed local cache of submitted algo runs, stored in SQLite (WAL mode).
+    Runs can be looked up by run hash and by run id in constant time.
+    Entries expire after ttl seconds, and the least recently used entries are evicted above max_entries.
+    The algo-run-{hash}.json files written by older versions are imported on first use, see _migrate_json_files.
+    """
+
+    def __init__(self, cache_dir, ttl=None, max_entries=None):
+        """
+        :param cache_dir: local cache dir
+        :param ttl: seconds an entry stays valid after it is created, None for no expiry
+        :param max_entries: max number of entries, None for no limit
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = os.path.join(cache_dir, RUN_CACHE_DB_NAME)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS algo_runs ("
+                "run_hash TEXT PRIMARY KEY, "
+                "run_id TEXT NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS algo_runs_run_id ON algo_runs (run_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS algo_runs_last_used_at ON algo_runs (last_used_at)")
+            self._conn = conn
+            self._migrate_json_files()
+        return self._conn
+
+    def _migrate_json_files(self):
+        """
+        Import the algo-run-{hash}.json files of older versions and delete them.
+        Older run hashes were computed from the md5 of the input archive, which cannot be recomputed from the
+        file (it holds the submit response only), so the imported runs are kept for run id lookups only:
+        they are stored under LEGACY_RUN_HASH_PREFIX and never match the run hash of a new submit.
+        :return:
+        """
+        for file in os.listdir(self.cache_dir):
+            if not (file.startswith("algo-run-") and file.endswith(".json")):
+                continue
+            _file_path = os.path.join(self.cache_dir, file)
+            try:
+                with open(_file_path, "r") as f:
+                    payload = json.load(f)
+                run_hash = LEGACY_RUN_HASH_PREFIX + file[len("algo-run-") : -len(".json")]
+                created_at = os.path.getmtime(_file_path)
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO algo_runs VALUES (?, ?, ?, ?, ?)",
+                    (run_hash, payload["run_id"], json.dumps(payload), created_at, created_at),
+                )
+                os.remove(_file_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Failed to migrate local algo cache file {_file_path}: {e}")
+
+    def get(self, run_hash):
+        """
+        Get a cached run
+        :param run_hash: run hash
+        :return: submit response of the run or None
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, created_at FROM algo_runs WHERE run_hash = ?", (run_hash,)
+            ).fetchone()
+            if row is None:
+                instrumentation.emit_cache("run_cache", False)
+                return None
+            payload, created_at = row
+            now = time.time()
+            if self.ttl is not None and created_at + self.ttl < now:
+                conn.execute("DELETE FROM algo_runs WHERE run_hash = ?", (run_hash,))
+                instrumentation.emit_cache("run_cache", False, expired=True)
+                return None
+            conn.execute("UPDATE algo_runs SET last_used_at = ? WHERE run_hash = ?", (now, run_hash))
+            instrumentation.emit_cache("run_cache", True)
+            return json.loads(payload)
+
+    def get_run_id(self, run_hash):
+        payload = self.get(run_hash)
+        if payload is None:
+            return None
+        return payload["run_id"]
+
+    def put(self, run_hash, payload):
+        """
+        Cache a submitted run
+        :param run_hash: run hash
+        :param payload: submit response of the run, it must contain run_id
+        :return:
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO algo_runs VALUES (?, ?, ?, ?, ?)",
+                (run_hash, payload["run_id"], json.dumps(payload), now, now),
+            )
+            self._evict(conn, now)
+
+    def find_run_hash(self, run_id):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT run_hash FROM algo_runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def remove_run(self, run_id):
+        """
+        Remove all entries of a run id
+        :return: number of removed entries
+        """
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM algo_runs WHERE run_id = ?", (run_id,))
+        return cursor.rowcount
+
+    def evict(self):
+        with self._lock:
+            self._evict(self._connect(), time.time())
+
+    def _evict(self, conn, now):
+        if self.ttl is not None:
+            conn.execute("DELETE FROM algo_runs WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries is not None:
+            conn.execute(
+                "DELETE FROM algo_runs WHERE run_hash IN ("
+                "SELECT run_hash FROM algo_runs ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM algo_runs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,186 @@
+import queue
+import threading
+import uuid
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_MAX_PENDING_CHUNKS = 8
+
+_END = object()
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+class QueueWriter:
+    """
+    Write-only file object that cuts the written bytes into fixed size chunks and puts them in a bounded queue.
+    The writer blocks when the queue is full, so the producer can never run ahead of the consumer
+    by more than max_pending chunks.
+    """
+
+    def __init__(self, chunk_size=STREAM_CHUNK_SIZE, max_pending=STREAM_MAX_PENDING_CHUNKS):
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.cancelled = threading.Event()
+        self._buffer = bytearray()
+        self.closed = False
+
+    def _put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise StreamCancelled()
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed QueueWriter")
+        self._buffer += data
+        while len(self._buffer) >= self.chunk_size:
+            self._put(bytes(self._buffer[: self.chunk_size]))
+            del self._buffer[: self.chunk_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self, error=None):
+        """
+        Flush the remaining bytes and mark the end of the stream
+        :param error: exception raised by the producer, it is re-raised in the consumer
+        :return:
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if error is None and self._buffer:
+                self._put(bytes(self._buffer))
+            self._buffer = bytearray()
+            self._put(error if error is not None else _END)
+        except StreamCancelled:
+            pass
+
+    def __iter__(self):
+        """
+        Iterate the chunks in the consumer thread, stopping the iteration cancels the producer
+        """
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.cancelled.set()
+
+
+def produce_in_thread(target, chunk_size=STREAM_CHUNK_SIZE, max_pending=STREAM_MAX_PENDING_CHUNKS):
+    """
+    Run target(fileobj) in a background thread and iterate the bytes it writes in the current thread
+    :param target: function writing to the given file object, its return value is stored in result["value"]
+    :return: (chunk iterator, result dict)
+    """
+    writer = QueueWriter(chunk_size, max_pending)
+    result = {}
+
+    def _run():
+        try:
+            result["value"] = target(writer)
+        except StreamCancelled:
+            return
+        except BaseException as e:
+            writer.close(e)
+            return
+        writer.close()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return iter(writer), result
+
+
+def iter_multipart(fields, file_field, file_name, file_chunks, content_type="application/octet-stream", boundary=None):
+    """
+    Build a multipart/form-data body as a generator, so a file part of any size can be sent with chunked encoding
+    :param fields: dict of form fields
+    :param file_field: form field name of the file
+    :param file_name: file name of the file part
+    :param file_chunks: iterable of bytes of the file content
+    :param content_type: content type of the file part
+    :param boundary: multipart boundary, a random one is generated if not set
+    :return: (content type header value, body generator)
+    """
+    if boundary is None:
+        boundary = uuid.uuid4().hex
+
+    def _body():
+        for name, value in fields.items():
+            yield (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        for chunk in file_chunks:
+            yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    return f"multipart/form-data; boundary={boundary}", _body()
+
+
+class IterReader:
+    """
+    Read-only, non-seekable file object over an iterable of bytes chunks
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size):
+        available = len(self._buffer) - self._pos
+        if self._eof or (0 <= size <= available):
+            return
+        parts = [self._buffer[self._pos:]]
+        while not self._eof and (size < 0 or available < size):
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                break
+            parts.append(chunk)
+            available += len(chunk)
+        self._buffer = b"".join(parts)
+        self._pos = 0
+
+    def peek(self, size):
+        self._fill(size)
+        return self._buffer[self._pos : self._pos + size]
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0:
+            size = len(self._buffer) - self._pos
+        data = self._buffer[self._pos : self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
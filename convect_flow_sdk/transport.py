@@ -0,0 +1,144 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import instrumentation
+
+DEFAULT_POOL_SIZE = 10
+
+_default_transports = {}
+_default_transports_lock = threading.Lock()
+
+
+class BaseTransport:
+    """
+    Base class of the http transport used by FlowAlgo, FlowApp and list_app.
+    A custom backend only needs to implement `request` and return a requests-like response
+    (status_code, headers, content, json(), raise_for_status(), iter_content(), close()).
+    A backend sending the api token itself sets flow_api_token, the clients check it is their token.
+    """
+
+    flow_api_token = None
+
+    def request(self, method, url, **kwargs):
+        raise NotImplementedError
+
+    def set_flow_api_token(self, flow_api_token):
+        """
+        Send the given api token with every request, called by the clients when the transport has no token
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support setting the api token")
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        pass
+
+
+class FlowTransport(BaseTransport):
+    """
+    Keep-alive http transport with a shared connection pool.
+    The connection pool is shared by all threads, each thread gets its own requests.Session
+    (sessions keep mutable state such as cookies) mounted on the shared pool.
+    The CAuthorization header is set once when the session is created.
+    """
+
+    def __init__(self, flow_api_token=None, pool_size=DEFAULT_POOL_SIZE, max_retries=0, headers=None):
+        """
+        :param flow_api_token: flow api token, set as CAuthorization header for every request
+        :param pool_size: max number of keep-alive connections kept per host
+        :param max_retries: number of retries on connection errors, passed to urllib3
+        :param headers: extra headers sent with every request
+        """
+        self.flow_api_token = flow_api_token
+        self.pool_size = pool_size
+        self._headers = dict(headers or {})
+        if flow_api_token is not None:
+            self._headers["CAuthorization"] = f"bearer {flow_api_token}"
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries
+        )
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        Get the requests.Session of the current thread
+        :return:
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self._headers)
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def set_flow_api_token(self, flow_api_token):
+        """
+        Set the CAuthorization header of the transport and of the sessions already created
+        :param flow_api_token: flow api token
+        """
+        with self._lock:
+            self.flow_api_token = flow_api_token
+            self._headers["CAuthorization"] = f"bearer {flow_api_token}"
+            for session in self._sessions:
+                session.headers["CAuthorization"] = self._headers["CAuthorization"]
+
+    def request(self, method, url, **kwargs):
+        if instrumentation.has_hooks():
+            return instrumentation.instrumented_request(self.session.request, method, url, **kwargs)
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """
+        Close all sessions and the pooled connections
+        :return:
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+        self._adapter.close()
+
+
+def get_default_transport(flow_api_token, pool_size=DEFAULT_POOL_SIZE):
+    """
+    Get the process wide transport for the given api token and pool size, so that all FlowAlgo and FlowApp
+    objects using the same token and pool size share one connection pool
+    :param flow_api_token: flow api token
+    :param pool_size: max number of keep-alive connections kept per host
+    :return: FlowTransport
+    """
+    key = (flow_api_token, pool_size)
+    with _default_transports_lock:
+        transport = _default_transports.get(key)
+        if transport is None:
+            transport = FlowTransport(flow_api_token, pool_size=pool_size)
+            _default_transports[key] = transport
+        return transport
+
+
+def bind_transport_token(transport, flow_api_token):
+    """
+    Make sure a transport passed to a client sends the api token of the client:
+    the token is set on a transport without token, a transport with another token is rejected
+    :param transport: transport passed to the client
+    :param flow_api_token: api token of the client
+    """
+    transport_token = getattr(transport, "flow_api_token", None)
+    if transport_token is None:
+        transport.set_flow_api_token(flow_api_token)
+    elif transport_token != flow_api_token:
+        raise ValueError("The transport uses another api token than the client, create the transport with the same token")
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrumentation
+from .downloads import is_retryable_error
+from .hashing import hash_file
+
+# Resumable chunked uploads.
+#
+# Protocol, relative to the flowopt-server api url:
+# - POST uploads/init with {"file_name", "file_size", "chunk_size", "checksum", "checksum_algorithm"} -> {"upload_id"}
+# - GET uploads/{upload_id} -> {"received_chunks": [chunk indexes]}, 404 if the upload expired
+# - PUT uploads/{upload_id}/chunks/{index} with the chunk bytes and the X-Chunk-Checksum header
+# - POST uploads/{upload_id}/complete -> {"upload_id", "path"}, the server checks the whole file checksum
+#
+# The upload id and the acknowledged chunks are kept in a state file, so an interrupted upload of the same file
+# restarts from the first missing chunk, also in a new process.
+
+UPLOAD_MODE_MULTIPART = "multipart"
+UPLOAD_MODE_CHUNKED = "chunked"
+UPLOAD_MODES = [UPLOAD_MODE_MULTIPART, UPLOAD_MODE_CHUNKED]
+
+DEFAULT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_CHUNK_RETRIES = 5
+UPLOAD_CHECKSUM_ALGORITHM = "sha256"
+
+
+def check_upload_mode(upload_mode):
+    if upload_mode not in UPLOAD_MODES:
+        raise ValueError(f"Unsupported upload mode {upload_mode}, supported modes: {UPLOAD_MODES}")
+
+
+class ChunkedUploader:
+    """
+    Uploads a file in fixed size chunks on a thread pool, every chunk is sent with its sha256 checksum,
+    every request of the protocol is retried with a backoff on transient failures, the progress is stored in state_dir
+    """
+
+    def __init__(
+        self,
+        transport,
+        api_url,
+        state_dir,
+        chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE,
+        workers=DEFAULT_UPLOAD_WORKERS,
+        max_retries=DEFAULT_CHUNK_RETRIES,
+        retry_interval=1.0,
+    ):
+        """
+        :param transport: transport of the client
+        :param api_url: flowopt-server api url
+        :param state_dir: folder of the upload state files
+        :param chunk_size: chunk size in bytes
+        :param workers: number of chunks uploaded in parallel
+        :param max_retries: max number of retries of one request
+        :param retry_interval: interval before the first retry, doubled on every retry
+        """
+        self.transport = transport
+        self.api_url = api_url
+        self.state_dir = state_dir
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+
+    def _state_path(self, checksum, file_size):
+        key = hashlib.sha256(f"{self.api_url}|{checksum}|{file_size}|{self.chunk_size}".encode("utf-8")).hexdigest()
+        return os.path.join(self.state_dir, f"upload-{key}.json")
+
+    def _load_state(self, state_path):
+        try:
+            with open(state_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state_path, state):
+        os.makedirs(self.state_dir, exist_ok=True)
+        temp_path = f"{state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, state_path)
+
+    def _request(self, method, url, description, expected_statuses=(), **kwargs):
+        """
+        Send a request of the upload protocol, retried on connection errors, timeouts, 5xx and 429 responses
+        :param description: description of the request in the retry messages
+        :param expected_statuses: error statuses returned to the caller instead of retried
+        :return: response
+        """
+        interval = self.retry_interval
+        for attempt in range(self.max_retries + 1):
+            try:
+                with instrumentation.retry_attempt(attempt):
+                    r = self.transport.request(method, url, **kwargs)
+                if r.status_code not in expected_statuses:
+                    r.raise_for_status()
+                return r
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                print(f"Failed to {description}: {e}, retrying in {interval:.1f} seconds")
+                time.sleep(interval)
+                interval *= 2
+
+    def _init_upload(self, file_name, file_size, checksum):
+        r = self._request(
+            "POST",
+            f"{self.api_url}uploads/init",
+            f"init the upload of {file_name}",
+            json={
+                "file_name": file_name,
+                "file_size": file_size,
+                "chunk_size": self.chunk_size,
+                "checksum": checksum,
+                "checksum_algorithm": UPLOAD_CHECKSUM_ALGORITHM,
+            },
+        )
+        return r.json()["upload_id"]
+
+    def _get_received_chunks(self, upload_id):
+        """
+        :return: set of the chunk indexes received by the server or None if the upload is unknown
+        """
+        r = self._request(
+            "GET", f"{self.api_url}uploads/{upload_id}", f"get the status of upload {upload_id}", expected_statuses=(404,)
+        )
+        if r.status_code == 404:
+            return None
+        return set(r.json().get("received_chunks", []))
+
+    def _upload_chunk(self, upload_id, file_path, index, file_size):
+        offset = index * self.chunk_size
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(min(self.chunk_size, file_size - offset))
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "X-Chunk-Checksum": f"{UPLOAD_CHECKSUM_ALGORITHM}={hashlib.sha256(data).hexdigest()}",
+        }
+        if data:
+            headers["Content-Range"] = f"bytes {offset}-{offset + len(data) - 1}/{file_size}"
+        self._request(
+            "PUT",
+            f"{self.api_url}uploads/{upload_id}/chunks/{index}",
+            f"upload chunk {index} of upload {upload_id}",
+            data=data,
+            headers=headers,
+        )
+
+    def upload(self, file_path, file_name=None):
+        """
+        Upload a file, or resume the upload of the same file
+        :param file_path: file path
+        :param file_name: file name sent to the server, default to the base name of file_path
+        :return: response of uploads/complete
+        """
+        started_at = instrumentation.start_timer()
+        file_name = file_name or os.path.basename(file_path)
+        file_size = os.path.getsize(file_path)
+        checksum = hash_file(file_path, UPLOAD_CHECKSUM_ALGORITHM)
+        state_path = self._state_path(checksum, file_size)
+        state = self._load_state(state_path)
+        received = None
+        if state is not None:
+            received = self._get_received_chunks(state["upload_id"])
+        if received is None:
+            state = {"upload_id": self._init_upload(file_name, file_size, checksum), "file_name": file_name}
+            received = set()
+        upload_id = state["upload_id"]
+        state["received_chunks"] = sorted(received)
+        self._save_state(state_path, state)
+        chunk_count = max(1, -(-file_size // self.chunk_size))
+        missing = [i for i in range(chunk_count) if i not in received]
+        if received:
+            print(f"Resuming upload {upload_id} of {file_name}, {len(received)}/{chunk_count} chunks already uploaded")
+        lock = threading.Lock()
+
+        def _upload(index):
+            self._upload_chunk(upload_id, file_path, index, file_size)
+            with lock:
+                received.add(index)
+                state["received_chunks"] = sorted(received)
+                self._save_state(state_path, state)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(_upload, i) for i in missing]:
+                future.result()
+        r = self._request("POST", f"{self.api_url}uploads/{upload_id}/complete", f"complete upload {upload_id}")
+        os.remove(state_path)
+        if started_at is not None:
+            instrumentation.emit_operation(
+                "chunked_upload", started_at, bytes_in=file_size, chunks=len(missing), resumed=bool(received - set(missing))
+            )
+        return r.json()
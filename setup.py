@@ -34,6 +34,8 @@ setup(
     },
     extras_require={
         "tests": TEST_REQUIREMENTS,
+        "async": ["aiohttp>=3.8"],
+        "zstd": ["zstandard"],
     },
 
     python_requires=">=3.9",
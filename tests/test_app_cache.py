@@ -0,0 +1,37 @@
+import pytest
+
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.flow_app import FlowApp
+from convect_flow_sdk.pagination import MAX_PAGE_SIZE
+
+ALL_APPS = "workspace/workspace/all_apps"
+
+
+def make_flow_app(server, app_id, tmp_path):
+    return FlowApp(server.url, "token", "workspace", app_id, local_cache_dir=str(tmp_path / "cache"))
+
+
+def test_apps_beyond_the_first_page_are_cached(tmp_path):
+    with FakeFlowServer(app_count=150, max_page_size=MAX_PAGE_SIZE) as server:
+        app = make_flow_app(server, "app-120", tmp_path).get_app_data()
+        assert app["id"] == "app-120"
+        assert server.requests[ALL_APPS] == 2
+        assert make_flow_app(server, "app-140", tmp_path).get_app_data()["id"] == "app-140"
+        assert server.requests[ALL_APPS] == 2
+
+
+def test_missing_app_is_cached_until_the_list_expires(tmp_path):
+    with FakeFlowServer() as server:
+        flow_app = make_flow_app(server, "app-missing", tmp_path)
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                flow_app.get_app_data()
+        assert server.requests[ALL_APPS] == 1
+        # another missing app reloads the list once
+        with pytest.raises(ValueError):
+            make_flow_app(server, "app-other", tmp_path).get_app_data()
+        assert server.requests[ALL_APPS] == 2
+        flow_app.invalidate_app_manifest()
+        with pytest.raises(ValueError):
+            flow_app.get_app_data()
+        assert server.requests[ALL_APPS] == 3
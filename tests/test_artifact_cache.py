@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from convect_flow_sdk import FlowAlgo
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.compression import COMPRESSION_GZIP, COMPRESSION_NONE, COMPRESSION_PARALLEL_GZIP
+from convect_flow_sdk.flow_algo import compress_to_tar_gz
+
+
+@pytest.fixture
+def input_folder(tmp_path):
+    folder = tmp_path / "input"
+    (folder / "b").mkdir(parents=True)
+    (folder / "a.csv").write_text("a,b\n1,2\n" * 1000)
+    (folder / "b" / "c.csv").write_text("c\n3\n" * 1000)
+    return folder
+
+
+@pytest.mark.parametrize("engine", [COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP, COMPRESSION_NONE])
+def test_archives_are_reproducible(tmp_path, input_folder, engine):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    compress_to_tar_gz(str(input_folder), str(first), engine=engine)
+    # new mtimes and another creation order do not change the archive
+    later = time.time() + 100
+    for path in (input_folder / "a.csv", input_folder / "b" / "c.csv"):
+        os.utime(path, (later, later))
+    (input_folder / "a.csv").rename(input_folder / "a.tmp")
+    (input_folder / "a.tmp").rename(input_folder / "a.csv")
+    compress_to_tar_gz(str(input_folder), str(second), engine=engine)
+    assert first.read_bytes() == second.read_bytes()
+
+
+@pytest.mark.parametrize("upload_mode", ["multipart", "chunked"])
+def test_submit_rebuilds_an_archive_evicted_after_the_lookup(tmp_path, input_folder, upload_mode):
+    with FakeFlowServer() as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"))
+        flow_algo.submit("algo-0", "run", {"i": 0}, str(input_folder), upload_mode=upload_mode)
+        (archive_name,) = os.listdir(flow_algo.artifact_cache.cache_dir)
+        archive_path = os.path.join(flow_algo.artifact_cache.cache_dir, archive_name)
+        archive = open(archive_path, "rb").read()
+        cache_get = flow_algo.artifact_cache.get
+
+        def get_then_evict(key, engine):
+            path = cache_get(key, engine)
+            if path is not None:
+                os.remove(path)
+            return path
+
+        flow_algo.artifact_cache.get = get_then_evict
+        server.reset_stats()
+        assert flow_algo.submit("algo-0", "run", {"i": 1}, str(input_folder), upload_mode=upload_mode)
+        assert server.bytes_received > 0
+        flow_algo.artifact_cache.get = cache_get
+        assert open(archive_path, "rb").read() == archive
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
+
+
+def test_submit_many_rebuilds_an_archive_evicted_after_the_lookup(tmp_path, input_folder):
+    with FakeFlowServer() as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"))
+        flow_algo.submit("algo-0", "run", {"i": 0}, str(input_folder))
+        cache_get = flow_algo.artifact_cache.get
+
+        def get_then_evict(key, engine):
+            path = cache_get(key, engine)
+            if path is not None:
+                os.remove(path)
+            return path
+
+        flow_algo.artifact_cache.get = get_then_evict
+        results = flow_algo.submit_many("algo-0", "run", [{"i": 1}, {"i": 2}], str(input_folder))
+        assert all(result.run_id is not None and result.error is None for result in results)
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
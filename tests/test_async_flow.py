@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import pytest
+
+from convect_flow_sdk import FlowAlgo
+from convect_flow_sdk.async_flow import AsyncFlowAlgo, AsyncFlowTransport
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.compression import (
+    COMPRESSION_GZIP,
+    COMPRESSION_PARALLEL_GZIP,
+    get_archive_content_type,
+    get_archive_file_name,
+)
+
+
+class RecordingAsyncTransport(AsyncFlowTransport):
+    """
+    Async transport recording the multipart file parts posted
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.files = []
+
+    async def post(self, url, **kwargs):
+        form = kwargs.get("data")
+        if form is not None and hasattr(form, "_fields"):
+            for options, headers, value in form._fields:
+                if "filename" in options:
+                    self.files.append((options["filename"], headers.get("Content-Type"), value))
+        return await super().post(url, **kwargs)
+
+
+@pytest.fixture
+def input_folder(tmp_path):
+    folder = tmp_path / "input"
+    folder.mkdir()
+    (folder / "data.csv").write_text("a,b\n1,2\n" * 1000)
+    return folder
+
+
+def read_files(folder):
+    return {
+        str(path.relative_to(folder)): path.read_bytes() for path in sorted(folder.rglob("*")) if path.is_file()
+    }
+
+
+@pytest.mark.parametrize("engine", [COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP])
+def test_submit_sends_the_archive_of_flow_algo(tmp_path, input_folder, engine):
+    with FakeFlowServer() as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "sync"))
+        flow_algo.submit("algo-0", "run", {}, str(input_folder), compression=engine)
+        (sync_archive,) = os.listdir(flow_algo.artifact_cache.cache_dir)
+        sync_bytes = open(os.path.join(flow_algo.artifact_cache.cache_dir, sync_archive), "rb").read()
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
+
+        async def submit():
+            transport = RecordingAsyncTransport("token")
+            async with AsyncFlowAlgo(
+                server.url, "token", "workspace", local_cache_dir=str(tmp_path / "async"), transport=transport
+            ) as async_algo:
+                await async_algo.submit("algo-0", "run", {"i": 0}, str(input_folder), compression=engine)
+                await async_algo.submit("algo-0", "run", {"i": 1}, str(input_folder), compression=engine)
+                return transport.files, os.listdir(async_algo.artifact_cache.cache_dir)
+
+        files, archives = asyncio.run(submit())
+        assert archives == [sync_archive]
+        assert [(name, content_type) for name, content_type, _ in files] == [
+            (get_archive_file_name(engine), get_archive_content_type(engine))
+        ] * 2
+        assert all(value == sync_bytes for _, _, value in files)
+
+
+def test_gather_places_outputs_from_the_output_store(tmp_path, input_folder):
+    with FakeFlowServer(output_file_count=3) as server:
+
+        async def submit_and_gather():
+            async with AsyncFlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache")) as algo:
+                run_id = await algo.submit("algo-0", "run", {}, str(input_folder))
+                await algo.gather(run_id, str(tmp_path / "first"))
+                server.reset_stats()
+                await algo.gather(run_id, str(tmp_path / "second"))
+                await algo.gather(run_id, str(tmp_path / "filtered"), include=["missing-*"])
+
+        asyncio.run(submit_and_gather())
+        assert server.requests["algo_runs/download"] == 0
+        assert read_files(tmp_path / "first") == read_files(tmp_path / "second")
+        assert len(read_files(tmp_path / "first")) == 3
+        assert read_files(tmp_path / "filtered") == {}
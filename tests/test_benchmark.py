@@ -0,0 +1,78 @@
+import json
+import time
+
+import requests
+
+from convect_flow_sdk.benchmark import FakeFlowServer, run_benchmarks, runner
+
+API = "/flowopt-server/api/"
+
+
+def post_statuses(server, count):
+    statuses = []
+    with requests.Session() as session:
+        for _ in range(count):
+            try:
+                statuses.append(session.post(f"{server.url}{API}algos/list", json={}).status_code)
+            except requests.ConnectionError:
+                statuses.append(None)
+    return statuses
+
+
+def test_injected_failures_are_reproducible_with_a_seed():
+    runs = []
+    for _ in range(2):
+        with FakeFlowServer(failure_rate=0.3, drop_rate=0.2, seed=7) as server:
+            runs.append(post_statuses(server, 40))
+    assert runs[0] == runs[1]
+    assert {200, 503, None} == set(runs[0])
+    # only answered requests are counted by route
+    assert server.requests["algos/list"] == sum(1 for status in runs[1] if status == 200)
+
+
+def test_requests_are_counted_by_route_without_ids():
+    with FakeFlowServer() as server:
+        with requests.Session() as session:
+            session.post(f"{server.url}{API}algo_runs/check", json={"run_id": "missing"})
+            session.get(f"{server.url}{API}run_instances/get/0b7d2f6e-8c7e-4a59-9d57-0f4c3a1b2c3d")
+            session.get(f"{server.url}{API}run_instances/get/5c1f0e7a-1b2c-4d3e-8f9a-0b1c2d3e4f5a")
+        assert server.requests == {"algo_runs/check": 1, "run_instances/get": 2}
+
+
+def test_downloads_support_range_and_if_range():
+    with FakeFlowServer() as server:
+        url = f"{server.url}/app-endpoint-0/api/data/output"
+        archive = server.output_archive
+        r = requests.get(url, headers={"Range": "bytes=100-199", "If-Range": server.output_etag})
+        assert r.status_code == 206
+        assert r.headers["Content-Range"] == f"bytes 100-199/{len(archive)}"
+        assert r.content == archive[100:200]
+        # a stale validator gets the whole file
+        r = requests.get(url, headers={"Range": "bytes=100-", "If-Range": '"stale"'})
+        assert r.status_code == 200 and r.content == archive
+        assert r.headers["ETag"] == server.output_etag
+
+
+def test_latency_is_added_to_every_response():
+    with FakeFlowServer(latency=0.1) as server:
+        started_at = time.perf_counter()
+        post_statuses(server, 3)
+        assert time.perf_counter() - started_at >= 0.3
+
+
+def test_quick_benchmarks_write_the_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "QUICK_INPUT_SHAPES", [(256 * 1024, 4)])
+    output_path = tmp_path / "benchmark.json"
+    results = run_benchmarks(str(output_path), quick=True, work_dir=str(tmp_path))
+    assert json.loads(output_path.read_text()) == json.loads(json.dumps(results))
+    assert sorted(results["benchmarks"]) == ["compress", "gather", "polling", "submit"]
+    # the generated inputs and outputs are removed
+    assert [p.name for p in tmp_path.iterdir()] == ["benchmark.json"]
+    compress = results["benchmarks"]["compress"]["results"]
+    assert {r["engine"] for r in compress} == set(runner._available_engines())
+    assert all(r["ratio"] > 0 for r in compress)
+    gather = {r["name"]: r for r in results["benchmarks"]["gather"]["results"]}
+    assert {"gather", "gather_store_miss", "gather_store_hit", "extract_archive"} <= set(gather)
+    polling = {r["method"]: r for r in results["benchmarks"]["polling"]["results"]}
+    assert sorted(polling) == ["check_status", "wait_all"]
+    assert all(r["runs"] == 4 and r["requests"] > 0 for r in polling.values())
@@ -0,0 +1,95 @@
+import gzip
+import io
+import os
+import tarfile
+import zlib
+
+import pytest
+
+from convect_flow_sdk.compression import (
+    COMPRESSION_GZIP,
+    COMPRESSION_NONE,
+    COMPRESSION_PARALLEL_GZIP,
+    COMPRESSION_ZSTD,
+    PARALLEL_GZIP_BLOCK_SIZE,
+    ParallelGzipWriter,
+    open_compressor,
+)
+from convect_flow_sdk.flow_algo import compress_to_tar_gz
+
+BLOCK_SIZE = 64 * 1024
+
+
+def make_data(size):
+    # half random and half repeated bytes, so blocks both compress and reference the previous block
+    random_part = os.urandom(size // 2)
+    return random_part + (b"a,b,c\n1,2,3\n" * (size // 12 + 1))[: size - len(random_part)]
+
+
+def decompress(engine, data):
+    if engine in (COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP):
+        return gzip.decompress(data)
+    if engine == COMPRESSION_ZSTD:
+        zstandard = pytest.importorskip("zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    return data
+
+
+def compress(engine, data, chunk_size=10_000, **kwargs):
+    fileobj = io.BytesIO()
+    with open_compressor(fileobj, engine, **kwargs) as writer:
+        for i in range(0, len(data), chunk_size):
+            writer.write(data[i : i + chunk_size])
+    return fileobj.getvalue()
+
+
+@pytest.mark.parametrize("engine", [COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP, COMPRESSION_ZSTD, COMPRESSION_NONE])
+@pytest.mark.parametrize("size", [0, 1, 100_000, 3 * PARALLEL_GZIP_BLOCK_SIZE + 7])
+def test_engines_round_trip(engine, size):
+    if engine == COMPRESSION_ZSTD:
+        pytest.importorskip("zstandard")
+    data = make_data(size)
+    assert decompress(engine, compress(engine, data)) == data
+
+
+@pytest.mark.parametrize("size", [0, 1, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 2 * BLOCK_SIZE, 5 * BLOCK_SIZE])
+def test_parallel_gzip_block_boundaries(size):
+    data = make_data(size)
+    fileobj = io.BytesIO()
+    with ParallelGzipWriter(fileobj, workers=3, block_size=BLOCK_SIZE, mtime=0) as writer:
+        writer.write(data)
+    compressed = fileobj.getvalue()
+    assert gzip.decompress(compressed) == data
+    # a single gzip member that zlib reads without the multi-member support of gzip.decompress
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(compressed) + decompressor.flush() == data
+    assert decompressor.eof and decompressor.unused_data == b""
+
+
+@pytest.mark.parametrize("level", [1, 6, 9])
+def test_parallel_gzip_levels(level):
+    data = make_data(3 * BLOCK_SIZE)
+    fileobj = io.BytesIO()
+    with ParallelGzipWriter(fileobj, level=level, workers=2, block_size=BLOCK_SIZE, mtime=0) as writer:
+        writer.write(data)
+    assert gzip.decompress(fileobj.getvalue()) == data
+
+
+@pytest.mark.parametrize("engine", [COMPRESSION_GZIP, COMPRESSION_PARALLEL_GZIP, COMPRESSION_ZSTD, COMPRESSION_NONE])
+def test_archives_extract_with_tarfile(tmp_path, engine):
+    if engine == COMPRESSION_ZSTD:
+        pytest.importorskip("zstandard")
+    folder = tmp_path / "input"
+    (folder / "b").mkdir(parents=True)
+    (folder / "a.csv").write_bytes(make_data(50_000))
+    (folder / "b" / "c.csv").write_bytes(b"")
+    archive = tmp_path / "archive"
+    compress_to_tar_gz(str(folder), str(archive), engine=engine)
+    with tarfile.open(fileobj=io.BytesIO(decompress(engine, archive.read_bytes())), mode="r:") as tar:
+        files = {m.name: tar.extractfile(m).read() for m in tar.getmembers() if m.isfile()}
+    assert files == {"a.csv": (folder / "a.csv").read_bytes(), "b/c.csv": b""}
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        open_compressor(io.BytesIO(), "lzma")
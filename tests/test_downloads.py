@@ -0,0 +1,132 @@
+import hashlib
+import os
+
+import pytest
+import requests
+
+from convect_flow_sdk import FlowAlgo, downloads
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.downloads import DownloadError, ResumableDownload
+from convect_flow_sdk.transport import FlowTransport
+
+
+class FlakyTransport:
+    """
+    Transport recording the request headers, it can cut the body of the next response after cut_after bytes
+    or flip its bytes
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.headers = []
+        self.cut_after = None
+        self.corrupt = False
+
+    def request(self, method, url, **kwargs):
+        self.headers.append(kwargs.get("headers", {}))
+        r = self.transport.request(method, url, **kwargs)
+        cut_after, self.cut_after = self.cut_after, None
+        corrupt, self.corrupt = self.corrupt, False
+        iter_content = r.iter_content
+
+        def _iter_content(chunk_size=1, decode_unicode=False):
+            sent = 0
+            for chunk in iter_content(min(chunk_size, 4096)):
+                if cut_after is not None and sent + len(chunk) > cut_after:
+                    yield chunk[: cut_after - sent]
+                    raise requests.exceptions.ChunkedEncodingError("connection broken")
+                sent += len(chunk)
+                yield bytes(b ^ 0xFF for b in chunk) if corrupt else chunk
+
+        r.iter_content = _iter_content
+        return r
+
+
+@pytest.fixture
+def server():
+    with FakeFlowServer(output_size=200_000, output_file_count=2) as server:
+        yield server
+
+
+@pytest.fixture
+def transport():
+    transport = FlakyTransport(FlowTransport("token"))
+    yield transport
+    transport.transport.close()
+
+
+def make_download(transport, server, out_path, **kwargs):
+    return ResumableDownload(
+        transport, "GET", f"{server.url}/app/api/data/output", str(out_path), retry_interval=0.0, **kwargs
+    )
+
+
+def test_interrupted_download_resumes_with_a_range_request(tmp_path, server, transport):
+    out_path = tmp_path / "output.tar.gz"
+    transport.cut_after = 50_000
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        make_download(transport, server, out_path, max_retries=0).run()
+    assert not out_path.exists()
+    assert os.path.getsize(f"{out_path}.part") == 50_000
+    # a new download, e.g. in a new process, continues from the .part file
+    server.reset_stats()
+    assert make_download(transport, server, out_path).run() == str(out_path)
+    assert transport.headers[-1] == {"Range": "bytes=50000-", "If-Range": server.output_etag}
+    assert server.bytes_sent == len(server.output_archive) - 50_000
+    assert out_path.read_bytes() == server.output_archive
+    assert sorted(os.listdir(tmp_path)) == ["output.tar.gz"]
+
+
+def test_interrupted_download_is_retried(tmp_path, server, transport):
+    out_path = tmp_path / "output.tar.gz"
+    transport.cut_after = 10_000
+    make_download(transport, server, out_path).run()
+    assert len(transport.headers) == 2
+    assert transport.headers[1]["Range"] == "bytes=10000-"
+    assert out_path.read_bytes() == server.output_archive
+
+
+def test_changed_file_is_downloaded_again(tmp_path, server, transport):
+    out_path = tmp_path / "output.tar.gz"
+    transport.cut_after = 50_000
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        make_download(transport, server, out_path, max_retries=0).run()
+    server.output_archive = server.output_archive[::-1]
+    server.output_etag = f'"{hashlib.md5(server.output_archive).hexdigest()}"'
+    make_download(transport, server, out_path).run()
+    # the server answered the If-Range request with the whole new file
+    assert out_path.read_bytes() == server.output_archive
+
+
+def test_checksum_mismatch_discards_the_download(tmp_path, server, transport):
+    out_path = tmp_path / "output.tar.gz"
+    transport.corrupt = True
+    with pytest.raises(DownloadError, match="Checksum mismatch"):
+        make_download(transport, server, out_path).run()
+    assert os.listdir(tmp_path) == []
+
+
+def test_large_files_are_downloaded_in_range_segments(tmp_path, server, transport, monkeypatch):
+    monkeypatch.setattr(downloads, "PARALLEL_DOWNLOAD_THRESHOLD", 50_000)
+    monkeypatch.setattr(downloads, "DOWNLOAD_SEGMENT_SIZE", 20_000)
+    out_path = tmp_path / "output.tar.gz"
+    make_download(transport, server, out_path, workers=3).run()
+    ranges = sorted(h["Range"] for h in transport.headers if "Range" in h)
+    size = len(server.output_archive)
+    assert len(ranges) == -(-size // 20_000)
+    assert all(h["If-Range"] == server.output_etag for h in transport.headers if "Range" in h)
+    assert out_path.read_bytes() == server.output_archive
+
+
+def test_resumable_gather(tmp_path, server):
+    flow_algo = FlowAlgo(
+        server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"), use_output_store=False
+    )
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    (input_folder / "data.csv").write_text("a,b\n1,2\n")
+    run_id = flow_algo.submit("algo-0", "run", {}, str(input_folder))
+    flow_algo.gather(run_id, str(tmp_path / "output"), resumable=True)
+    assert sorted(os.listdir(tmp_path / "output")) == ["output_0.csv", "output_1.csv"]
+    assert os.listdir(tmp_path / "cache" / "downloads") == []
+    flow_algo.run_cache.close()
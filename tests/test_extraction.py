@@ -0,0 +1,127 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from convect_flow_sdk.extraction import MemberFilter, extract_tar_members, extract_zip_members, safe_member_path
+
+MEMBERS = {
+    "output/result.csv": b"a,b\n1,2\n",
+    "output/summary.json": b"{}",
+    "output/logs/solve.log": b"solve done\n",
+    "report.txt": b"report\n",
+}
+
+
+def make_tar(path, members=MEMBERS, symlinks=None):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        for name, target in (symlinks or {}).items():
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return str(path)
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, data in members.items():
+            zip_ref.writestr(name, data)
+    return str(path)
+
+
+def read_files(folder):
+    return {
+        path.relative_to(folder).as_posix(): path.read_bytes() for path in sorted(folder.rglob("*")) if path.is_file()
+    }
+
+
+@pytest.mark.parametrize("name", ["../escape.txt", "output/../../escape.txt", "/etc/passwd"])
+def test_unsafe_member_names_are_rejected(tmp_path, name):
+    with pytest.raises(ValueError):
+        safe_member_path(str(tmp_path / "target"), name)
+
+
+def test_member_paths_through_a_symlink_out_of_the_target_are_rejected(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    (tmp_path / "outside").mkdir()
+    os.symlink(tmp_path / "outside", target / "link")
+    with pytest.raises(ValueError):
+        safe_member_path(str(target), "link/escape.txt")
+    assert safe_member_path(str(target), "output/result.csv") == os.path.join(
+        os.path.realpath(target), "output", "result.csv"
+    )
+
+
+@pytest.mark.parametrize("linkname", ["../../outside", "/etc"])
+def test_tar_symlinks_out_of_the_target_are_rejected(tmp_path, linkname):
+    archive = make_tar(tmp_path / "output.tar.gz", members={}, symlinks={"output/link": linkname})
+    with tarfile.open(archive, "r:gz") as tar, pytest.raises(ValueError):
+        extract_tar_members(tar, str(tmp_path / "target"), MemberFilter())
+    assert not os.path.lexists(tmp_path / "target" / "output" / "link")
+
+
+def test_tar_member_escaping_with_dotdot_is_rejected(tmp_path):
+    archive = make_tar(tmp_path / "output.tar.gz", members={"../escape.txt": b"x"})
+    with tarfile.open(archive, "r:gz") as tar, pytest.raises(ValueError):
+        extract_tar_members(tar, str(tmp_path / "target"), MemberFilter())
+    assert not (tmp_path / "escape.txt").exists()
+
+
+@pytest.mark.parametrize(
+    "include, exclude, expected",
+    [
+        (None, None, sorted(MEMBERS)),
+        (["output/*.csv"], None, ["output/result.csv"]),
+        (["output/*"], ["output/logs/*"], ["output/result.csv", "output/summary.json"]),
+        (None, ["output/*"], ["report.txt"]),
+        (["./report.txt"], None, ["report.txt"]),
+    ],
+)
+def test_globs_select_members(tmp_path, include, exclude, expected):
+    archive = make_tar(tmp_path / "output.tar.gz")
+    with tarfile.open(archive, "r|gz") as tar:
+        extracted = extract_tar_members(tar, str(tmp_path / "tar"), MemberFilter(include, exclude))
+    assert sorted(extracted) == expected
+    assert read_files(tmp_path / "tar") == {name: MEMBERS[name] for name in expected}
+    archive = make_zip(tmp_path / "output.zip", MEMBERS)
+    extracted = extract_zip_members(archive, str(tmp_path / "zip"), MemberFilter(include, exclude))
+    assert sorted(extracted) == expected
+    assert read_files(tmp_path / "zip") == {name: MEMBERS[name] for name in expected}
+
+
+def test_literal_includes_stop_at_the_last_match(tmp_path):
+    archive = make_tar(tmp_path / "output.tar.gz")
+    member_filter = MemberFilter(["output/result.csv"])
+    with tarfile.open(archive, "r|gz") as tar:
+        assert extract_tar_members(tar, str(tmp_path / "target"), member_filter) == ["output/result.csv"]
+    assert member_filter.done
+
+
+def test_parallel_zip_extraction_writes_identical_files(tmp_path):
+    members = {f"output/part-{i}.csv": os.urandom(1000 * (i + 1)) for i in range(20)}
+    members["output/empty.csv"] = b""
+    members["output/nested/dir/"] = b""
+    archive = make_zip(tmp_path / "output.zip", members)
+    serial = extract_zip_members(archive, str(tmp_path / "serial"), MemberFilter(), workers=1)
+    parallel = extract_zip_members(archive, str(tmp_path / "parallel"), MemberFilter(), workers=4)
+    assert sorted(serial) == sorted(parallel) == sorted(members)
+    files = read_files(tmp_path / "serial")
+    assert files == read_files(tmp_path / "parallel")
+    assert files == {name: data for name, data in members.items() if not name.endswith("/")}
+    assert (tmp_path / "parallel" / "output" / "nested" / "dir").is_dir()
+
+
+def test_unsafe_zip_members_are_rejected_before_writing(tmp_path):
+    archive = make_zip(tmp_path / "output.zip", {"output/result.csv": b"a", "../escape.txt": b"x"})
+    with pytest.raises(ValueError):
+        extract_zip_members(archive, str(tmp_path / "target"), MemberFilter())
+    assert not (tmp_path / "escape.txt").exists()
+    assert not (tmp_path / "target" / "output" / "result.csv").exists()
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from convect_flow_sdk import FlowAlgo, RunStatus
+from convect_flow_sdk import flow_algo as flow_algo_module
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.polling import PollingPolicy
+
+
+@pytest.fixture
+def server():
+    with FakeFlowServer() as server:
+        yield server
+
+
+@pytest.fixture
+def flow_algo(server, tmp_path):
+    flow_algo = FlowAlgo(
+        server.url,
+        "token",
+        "workspace",
+        local_cache_dir=str(tmp_path / "cache"),
+        polling_policy=PollingPolicy(min_interval=0.05, max_interval=0.2, jitter=0.0, error_interval=0.1),
+    )
+    yield flow_algo
+    flow_algo.run_cache.close()
+    flow_algo.output_store.close()
+
+
+def test_tail_log_of_an_unknown_run_times_out(flow_algo):
+    started_at = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(flow_algo.tail_log("missing", timeout=0.5))
+    assert time.monotonic() - started_at < 5
+
+
+def test_tail_log_of_a_completed_run(flow_algo, server, tmp_path):
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    (input_folder / "data.csv").write_text("a,b\n1,2\n")
+    run_id = flow_algo.submit("algo-0", "run", {}, str(input_folder))
+    lines = list(flow_algo.tail_log(run_id, timeout=5))
+    assert "\n".join(lines) == server.log.rstrip("\n")
+
+
+def test_cached_run_is_found_before_compressing(flow_algo, server, tmp_path, monkeypatch):
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    (input_folder / "data.csv").write_text("a,b\n1,2\n")
+    run_id = flow_algo.submit("algo-0", "run", {"a": 1}, str(input_folder))
+
+    def fail_to_compress(*args, **kwargs):
+        raise AssertionError("the input is compressed")
+
+    monkeypatch.setattr(flow_algo_module, "write_tar_gz", fail_to_compress)
+    server.reset_stats()
+    assert flow_algo.submit("algo-0", "run", {"a": 1}, str(input_folder)) == run_id
+    assert sum(server.requests.values()) == 0
+    # a changed input is a new run
+    (input_folder / "data.csv").write_text("a,b\n1,3\n")
+    with pytest.raises(AssertionError):
+        flow_algo.submit("algo-0", "run", {"a": 1}, str(input_folder))
+
+
+def submit_runs(flow_algo, tmp_path, count):
+    input_folder = tmp_path / "input"
+    input_folder.mkdir(exist_ok=True)
+    (input_folder / "data.csv").write_text("a,b\n1,2\n")
+    return [flow_algo.submit("algo-0", "run", {"i": i}, str(input_folder)) for i in range(count)]
+
+
+def test_watch_lists_pages_instead_of_checking_each_run(tmp_path):
+    with FakeFlowServer(run_duration=0.3) as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"))
+        run_ids = submit_runs(flow_algo, tmp_path, 12)
+        server.reset_stats()
+        events = []
+        watcher = flow_algo.watch(run_ids, "algo-0", timeout=10, interval=0.05, page_size=5)
+        while True:
+            try:
+                events.append(next(watcher))
+            except StopIteration as e:
+                statuses = e.value
+                break
+        assert sorted(run_id for run_id, _ in events) == sorted(run_ids)
+        assert statuses == dict.fromkeys(run_ids, RunStatus.SUCCEEDED)
+        assert server.requests["algo_runs/check"] == 0
+        # 3 pages per refresh, whatever the number of runs
+        ticks = server.requests["algo_runs/list"] / 3
+        assert ticks == int(ticks) and ticks < 20
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
+
+
+def test_wait_all_returns_running_runs_on_timeout(tmp_path):
+    with FakeFlowServer(run_duration=60) as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"))
+        run_ids = submit_runs(flow_algo, tmp_path, 3)
+        started_at = time.monotonic()
+        assert flow_algo.wait_all(run_ids, "algo-0", timeout=0.5, interval=0.1) == dict.fromkeys(
+            run_ids, RunStatus.RUNNING
+        )
+        assert time.monotonic() - started_at < 5
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
+
+
+def test_submit_many_compresses_once_and_reports_each_config(flow_algo, server, tmp_path, monkeypatch):
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    (input_folder / "data.csv").write_text("a,b\n1,2\n")
+    cached_run_id = flow_algo.submit("algo-0", "run", {"i": 0}, str(input_folder))
+    # the archive is built again once, not once per config
+    flow_algo.artifact_cache = None
+    write_tar_gz = flow_algo_module.write_tar_gz
+    compressed = []
+
+    def counting_write_tar_gz(*args, **kwargs):
+        compressed.append(args[0])
+        return write_tar_gz(*args, **kwargs)
+
+    monkeypatch.setattr(flow_algo_module, "write_tar_gz", counting_write_tar_gz)
+    server.reset_stats()
+    configs = [{"i": 0}, {"i": 1}, '{"i": 2}', {"i": 1}, "{not json", {"i": 3}]
+    results = flow_algo.submit_many("algo-0", "run", configs, str(input_folder), max_workers=3)
+    assert len(compressed) == 1
+    assert server.requests["algo_runs/submit"] == 3
+    assert [r.config for r in results[:4]] == [{"i": 0}, {"i": 1}, {"i": 2}, {"i": 1}]
+    assert results[0].run_id == cached_run_id and results[0].cached
+    assert results[1].run_id == results[3].run_id
+    assert len({r.run_id for r in results if r.run_id is not None}) == 4
+    assert results[4].run_id is None and results[4].error is not None
+    assert all(r.error is None for i, r in enumerate(results) if i != 4)
+    assert all(not r.cached for r in results[1:])
@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from convect_flow_sdk import RunStatus
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.flow_app import FlowApp
+from convect_flow_sdk.polling import PollingPolicy
+
+
+def test_wait_for_solves_of_instances_leaving_the_folder(tmp_path):
+    with FakeFlowServer(solve_duration=0.5) as server:
+        moved, deleted, kept = (server._new_instance("folder", name) for name in ("moved", "deleted", "kept"))
+        flow_app = FlowApp(
+            server.url, "token", "workspace", "app-0", local_cache_dir=str(tmp_path / "cache"),
+            polling_policy=PollingPolicy.fixed(0.05),
+        )
+
+        def _leave_folder():
+            time.sleep(0.2)
+            server.instances[moved]["session_id"] = "other-folder"
+            del server.instances[deleted]
+
+        thread = threading.Thread(target=_leave_folder)
+        thread.start()
+        results = flow_app.solve_all_instances("folder", wait=True, timeout=None)
+        thread.join()
+        assert results[kept].status == RunStatus.SUCCEEDED
+        assert results[moved].status == RunStatus.SUCCEEDED
+        assert results[deleted].error is not None
+        assert not results[deleted].ok
+
+
+def test_tail_logs_of_an_unknown_process_times_out(tmp_path):
+    with FakeFlowServer() as server:
+        flow_app = FlowApp(server.url, "token", "workspace", "app-0", local_cache_dir=str(tmp_path / "cache"))
+        started_at = time.monotonic()
+        with pytest.raises(TimeoutError):
+            list(flow_app.tail_logs("missing", timeout=0.5, polling_policy=PollingPolicy(error_interval=0.1)))
+        assert time.monotonic() - started_at < 5
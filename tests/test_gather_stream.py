@@ -0,0 +1,96 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from convect_flow_sdk import FlowAlgo
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.benchmark.fake_server import make_csv_bytes, make_output_archive
+from convect_flow_sdk.flow_algo import extract_archive, extract_archive_stream
+from convect_flow_sdk.streaming import IterReader
+
+CHUNK_SIZE = 16 * 1024
+
+
+def iter_chunks(data, consumed=None):
+    for i in range(0, len(data), CHUNK_SIZE):
+        if consumed is not None:
+            consumed.append(i)
+        yield data[i : i + CHUNK_SIZE]
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, data in members.items():
+            zip_ref.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def read_files(folder):
+    return {
+        path.relative_to(folder).as_posix(): path.read_bytes() for path in sorted(folder.rglob("*")) if path.is_file()
+    }
+
+
+@pytest.mark.parametrize("archive_type", ["tar.gz", "tar", "zip"])
+def test_stream_extraction_matches_file_extraction(tmp_path, archive_type):
+    members = {f"output/part_{i}.csv": make_csv_bytes(50_000, seed=i) for i in range(4)}
+    if archive_type == "tar.gz":
+        archive = make_output_archive(200_000)
+    elif archive_type == "tar":
+        archive = make_tar(members)
+    else:
+        archive = make_zip(members)
+    archive_path = tmp_path / "archive"
+    archive_path.write_bytes(archive)
+    expected = extract_archive(str(archive_path), str(tmp_path / "file"), verbose=False)
+    reader = IterReader(iter_chunks(archive))
+    names = extract_archive_stream(reader, str(tmp_path / "stream"), verbose=False)
+    assert sorted(names) == sorted(expected)
+    assert read_files(tmp_path / "stream") == read_files(tmp_path / "file")
+
+
+def test_literal_include_stops_reading_the_stream(tmp_path):
+    archive = make_tar({f"output_{i}.csv": make_csv_bytes(100_000, seed=i) for i in range(10)})
+    consumed = []
+    reader = IterReader(iter_chunks(archive, consumed))
+    assert extract_archive_stream(reader, str(tmp_path), include=["output_0.csv"], verbose=False) == ["output_0.csv"]
+    reader.close()
+    assert len(consumed) < len(archive) // CHUNK_SIZE // 2
+    assert [p.name for p in tmp_path.iterdir()] == ["output_0.csv"]
+
+
+def test_stream_of_an_unsupported_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        extract_archive_stream(IterReader(iter([b"not an archive" * 100])), str(tmp_path), verbose=False)
+
+
+@pytest.mark.parametrize("include", [None, ["output_1.csv"]])
+def test_gather_extracts_the_download_stream(tmp_path, include):
+    with FakeFlowServer(output_size=1_000_000, output_file_count=4) as server:
+        flow_algo = FlowAlgo(
+            server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"), use_output_store=False
+        )
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        (input_folder / "data.csv").write_text("a,b\n1,2\n")
+        run_id = flow_algo.submit("algo-0", "run", {}, str(input_folder))
+        flow_algo.gather(run_id, str(tmp_path / "output"), include=include)
+        (tmp_path / "archive.tar.gz").write_bytes(server.output_archive)
+        extract_archive(str(tmp_path / "archive.tar.gz"), str(tmp_path / "expected"), include=include, verbose=False)
+        files = read_files(tmp_path / "output")
+        assert files == read_files(tmp_path / "expected")
+        assert len(files) == (4 if include is None else 1)
+        flow_algo.run_cache.close()
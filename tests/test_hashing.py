@@ -0,0 +1,136 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+import pytest
+
+from convect_flow_sdk import hashing
+from convect_flow_sdk.flow_algo import compress_to_tar_gz, write_tar_gz
+from convect_flow_sdk.hashing import HASH_CHUNK_SIZE, HashingReader, InputManifest, fingerprint_folder, new_hasher
+
+
+def test_concurrent_manifest_saves_do_not_collide(tmp_path):
+    manifest_dir = str(tmp_path / "manifests")
+    source_folder = str(tmp_path / "input")
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def save(i):
+        manifest = InputManifest(manifest_dir, source_folder)
+        manifest.entries = {f"file-{i}.csv": [i, i, i, "0" * 32]}
+        barrier.wait()
+        try:
+            for _ in range(50):
+                manifest.save()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    manifest = InputManifest(manifest_dir, source_folder)
+    with open(manifest.path) as f:
+        assert len(json.load(f)["entries"]) == 1
+    assert [p.name for p in (tmp_path / "manifests").iterdir()] == [os.path.basename(manifest.path)]
+
+
+@pytest.mark.parametrize("hash_name", ["md5", "sha256", "blake2b"])
+def test_archive_hash_is_computed_while_the_archive_is_written(tmp_path, hash_name):
+    folder = tmp_path / "input"
+    (folder / "b").mkdir(parents=True)
+    files = {"a.csv": os.urandom(3 * HASH_CHUNK_SIZE + 5), "b/c.csv": b"c\n3\n", "b/empty.csv": b""}
+    for name, data in files.items():
+        (folder / name).write_bytes(data)
+    digests = sorted(hashlib.new(hash_name, data).hexdigest() for data in files.values())
+    expected = hashlib.new(hash_name, json.dumps(digests).encode()).hexdigest()
+    archive = io.BytesIO()
+    assert write_tar_gz(str(folder), archive, hash_name) == expected
+    with tarfile.open(fileobj=io.BytesIO(archive.getvalue()), mode="r:gz") as tar:
+        assert {m.name: tar.extractfile(m).read() for m in tar.getmembers()} == files
+
+
+def test_input_files_are_read_once(tmp_path, monkeypatch):
+    folder = tmp_path / "input"
+    folder.mkdir()
+    for i in range(3):
+        (folder / f"{i}.csv").write_bytes(os.urandom(2 * HASH_CHUNK_SIZE))
+    reads = []
+    original_open = open
+
+    def counting_open(path, *args, **kwargs):
+        f = original_open(path, *args, **kwargs)
+        if str(path).startswith(str(folder) + os.sep):
+            reads.append(os.path.basename(path))
+        return f
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    compress_to_tar_gz(str(folder), str(tmp_path / "input.tar.gz"))
+    assert sorted(reads) == ["0.csv", "1.csv", "2.csv"]
+
+
+def test_hashing_reader_hashes_what_is_read():
+    data = os.urandom(10_000)
+    reader = HashingReader(io.BytesIO(data), new_hasher("sha256"))
+    assert reader.read(3000) + reader.read(-1) == data
+    assert reader.read(10) == b""
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def make_input_folder(folder):
+    (folder / "b").mkdir(parents=True)
+    (folder / "a.csv").write_text("a,b\n1,2\n")
+    (folder / "b" / "c.csv").write_text("c\n3\n")
+    # out of the racy window, the manifest trusts the stat data of these files
+    past = time.time() - 100
+    for path in (folder / "a.csv", folder / "b" / "c.csv"):
+        os.utime(path, (past, past))
+    return folder
+
+
+def test_fingerprint_depends_on_paths_and_contents_only(tmp_path):
+    folder = make_input_folder(tmp_path / "input")
+    fingerprint = fingerprint_folder(str(folder))
+    later = time.time() - 50
+    os.utime(folder / "a.csv", (later, later))
+    (folder / "a.csv").rename(folder / "a.tmp")
+    (folder / "a.tmp").rename(folder / "a.csv")
+    assert fingerprint_folder(str(folder)) == fingerprint
+    assert fingerprint_folder(str(folder), manifest_dir=str(tmp_path / "manifests")) == fingerprint
+    (folder / "b" / "c.csv").rename(folder / "c.csv")
+    assert fingerprint_folder(str(folder)) != fingerprint
+    (folder / "c.csv").rename(folder / "b" / "c.csv")
+    (folder / "a.csv").write_text("a,b\n1,3\n")
+    assert fingerprint_folder(str(folder)) != fingerprint
+
+
+def test_manifest_only_hashes_changed_files(tmp_path, monkeypatch):
+    folder = make_input_folder(tmp_path / "input")
+    manifest_dir = str(tmp_path / "manifests")
+    hashed = []
+    original_hash_file = hashing.hash_file
+
+    def counting_hash_file(path, *args, **kwargs):
+        hashed.append(os.path.relpath(path, folder))
+        return original_hash_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(hashing, "hash_file", counting_hash_file)
+    fingerprint = fingerprint_folder(str(folder), manifest_dir=manifest_dir)
+    assert sorted(hashed) == ["a.csv", os.path.join("b", "c.csv")]
+    hashed.clear()
+    assert fingerprint_folder(str(folder), manifest_dir=manifest_dir) == fingerprint
+    assert hashed == []
+    # same size, new content and mtime
+    (folder / "a.csv").write_text("a,b\n1,3\n")
+    changed = fingerprint_folder(str(folder), manifest_dir=manifest_dir)
+    assert hashed == ["a.csv"]
+    assert changed == fingerprint_folder(str(folder))
+    hashed.clear()
+    assert fingerprint_folder(str(folder), manifest_dir=manifest_dir, strict=True) == changed
+    assert len(hashed) == 2
@@ -0,0 +1,152 @@
+import os
+import threading
+
+import pytest
+
+from convect_flow_sdk import FlowAlgo, MetricsAggregator, add_hook, instrumentation, remove_hook
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.instrumentation import CacheEvent, OperationEvent, RequestEvent, get_endpoint
+from convect_flow_sdk.transport import FlowTransport
+from convect_flow_sdk.uploads import ChunkedUploader
+
+
+@pytest.fixture
+def metrics():
+    metrics = add_hook(MetricsAggregator(buckets=(0.1, 1.0)))
+    yield metrics
+    remove_hook(metrics)
+
+
+def parse_prometheus(text):
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples
+
+
+def test_nothing_is_measured_without_hooks():
+    assert not instrumentation.has_hooks()
+    assert instrumentation.start_timer() is None
+    events = []
+    hook = add_hook(events.append)
+    try:
+        assert instrumentation.start_timer() is not None
+        instrumentation.emit_cache("run_cache", True)
+    finally:
+        remove_hook(hook)
+    instrumentation.emit_cache("run_cache", True)
+    assert events == [CacheEvent("run_cache", True)]
+
+
+def test_a_broken_hook_does_not_break_the_call(metrics):
+    def broken(event):
+        raise RuntimeError("broken hook")
+
+    add_hook(broken)
+    try:
+        instrumentation.emit_cache("run_cache", False)
+    finally:
+        remove_hook(broken)
+    assert metrics.get_counter("flow_sdk_cache_lookups_total", cache="run_cache", result="miss") == 1
+
+
+def test_ids_are_not_endpoint_labels():
+    assert get_endpoint("http://flow/flowopt-server/api/algo_runs/submit") == "algo_runs/submit"
+    assert (
+        get_endpoint("http://flow/flowopt-server/api/uploads/0123456789abcdef0123/chunks/12")
+        == "uploads/{id}/chunks/{id}"
+    )
+    assert (
+        get_endpoint("http://flow/flowopt-server/api/run_instances/get/0b7d2f6e-8c7e-4a59-9d57-0f4c3a1b2c3d")
+        == "run_instances/get/{id}"
+    )
+
+
+def test_prometheus_exposition(metrics, tmp_path):
+    for latency in (0.05, 0.5, 5.0):
+        metrics(RequestEvent("POST", "algo_runs/submit", "url", status=200, latency=latency, bytes_sent=10))
+    metrics(RequestEvent("GET", 'odd"endpoint', "url", error="ConnectionError"))
+    metrics(OperationEvent("compress", 0.2, bytes_in=100, bytes_out=40))
+    text = metrics.to_prometheus()
+    assert "# TYPE flow_sdk_request_duration_seconds histogram" in text
+    samples = parse_prometheus(text)
+    labels = 'method="POST",endpoint="algo_runs/submit"'
+    assert samples[f'flow_sdk_requests_total{{{labels},status="200"}}'] == 3
+    assert samples[f'flow_sdk_request_duration_seconds_bucket{{{labels},le="0.1"}}'] == 1
+    assert samples[f'flow_sdk_request_duration_seconds_bucket{{{labels},le="1"}}'] == 2
+    assert samples[f'flow_sdk_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 3
+    assert samples[f"flow_sdk_request_duration_seconds_count{{{labels}}}"] == 3
+    assert samples[f"flow_sdk_request_duration_seconds_sum{{{labels}}}"] == pytest.approx(5.55)
+    assert samples[f"flow_sdk_request_sent_bytes_total{{{labels}}}"] == 30
+    assert samples['flow_sdk_requests_total{method="GET",endpoint="odd\\"endpoint",status="error"}'] == 1
+    assert samples['flow_sdk_operation_output_bytes_total{operation="compress"}'] == 40
+    metrics.write_prometheus(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == text
+    metrics.reset()
+    assert metrics.to_prometheus() == ""
+
+
+def test_concurrent_prometheus_writes(metrics, tmp_path):
+    metrics.inc("flow_sdk_requests_total", (("method", "GET"),))
+    path = str(tmp_path / "metrics.prom")
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                metrics.write_prometheus(path)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["metrics.prom"]
+
+
+def test_sdk_calls_are_measured(metrics, tmp_path):
+    with FakeFlowServer() as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"))
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        (input_folder / "data.csv").write_text("a,b\n1,2\n" * 1000)
+        run_id = flow_algo.submit("algo-0", "run", {}, str(input_folder))
+        assert flow_algo.submit("algo-0", "run", {}, str(input_folder)) == run_id
+        flow_algo.gather(run_id, str(tmp_path / "output"))
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
+    assert metrics.get_counter("flow_sdk_requests_total", endpoint="algo_runs/submit", status="200") == 1
+    assert metrics.get_counter("flow_sdk_request_sent_bytes_total", endpoint="algo_runs/submit") > 0
+    assert metrics.get_counter("flow_sdk_request_received_bytes_total", endpoint="algo_runs/download") > 0
+    assert metrics.get_counter("flow_sdk_cache_lookups_total", cache="run_cache", result="miss") == 1
+    assert metrics.get_counter("flow_sdk_cache_lookups_total", cache="run_cache", result="hit") == 1
+    for operation in ("fingerprint", "compress", "extract"):
+        assert metrics.get_counter("flow_sdk_operations_total", operation=operation) >= 1
+    assert metrics.get_counter("flow_sdk_operation_input_bytes_total", operation="compress") == 8000
+
+
+def test_retries_are_counted(metrics, tmp_path):
+    input_file = tmp_path / "input.tar.gz"
+    input_file.write_bytes(os.urandom(64 * 1024))
+    with FakeFlowServer(failure_rate=0.3, seed=2) as server:
+        transport = FlowTransport("token")
+        uploader = ChunkedUploader(
+            transport,
+            f"{server.url}/flowopt-server/api/",
+            str(tmp_path / "uploads"),
+            chunk_size=4096,
+            workers=1,
+            max_retries=20,
+            retry_interval=0.0,
+        )
+        uploader.upload(str(input_file))
+        transport.close()
+    failed = metrics.get_counter("flow_sdk_requests_total", status="503")
+    assert failed > 0
+    assert metrics.get_counter("flow_sdk_request_retries_total") >= failed
@@ -0,0 +1,53 @@
+import io
+import time
+
+from convect_flow_sdk.log_errors import iter_error_records
+
+INFO_LINE = "2023-12-18 21:36:15,123 INFO step done\n"
+ERROR_LINES = "2023-12-18 21:36:16,456 ERROR solve failed\n  detail line\n"
+TRACEBACK_LINES = (
+    "2023-12-18 21:36:17,789 INFO running\n"
+    "Traceback (most recent call last):\n"
+    '  File "run.py", line 1, in <module>\n'
+    "ValueError: bad input\n"
+)
+
+
+def make_log(records, info_per_error=20, traceback_every=None):
+    parts = []
+    for i in range(records):
+        parts.append(INFO_LINE * info_per_error)
+        parts.append(ERROR_LINES)
+        if traceback_every is not None and i % traceback_every == 0:
+            parts.append(TRACEBACK_LINES)
+    return "".join(parts)
+
+
+def records_as_tuples(records):
+    return [(r.timestamp, r.level, r.message, r.traceback) for r in records]
+
+
+def test_string_fast_path_matches_line_by_line():
+    log = make_log(200, traceback_every=7)
+    from_string = records_as_tuples(iter_error_records(log))
+    from_lines = records_as_tuples(iter_error_records(io.StringIO(log)))
+    assert from_string == from_lines
+    assert sum(1 for _, level, _, _ in from_string if level == "ERROR") == 200
+    assert sum(1 for _, _, message, _ in from_string if message == "ValueError: bad input") == 29
+
+
+def test_rare_marker_is_linear():
+    # many ERROR records and no traceback, the traceback marker must not rescan the rest of the log per record
+    small = make_log(5_000, info_per_error=2)
+    large = make_log(40_000, info_per_error=2)
+
+    def timed(log):
+        started_at = time.perf_counter()
+        count = sum(1 for _ in iter_error_records(log))
+        return time.perf_counter() - started_at, count
+
+    small_seconds, small_count = timed(small)
+    large_seconds, large_count = timed(large)
+    assert (small_count, large_count) == (5_000, 40_000)
+    # 8 times the records, a quadratic scan takes 64 times longer
+    assert large_seconds < max(small_seconds, 0.01) * 20
@@ -0,0 +1,43 @@
+from convect_flow_sdk.log_tail import LogTail
+
+
+def test_only_new_complete_lines_are_returned():
+    tail = LogTail()
+    assert tail.feed("main", "line 1\nline") == ["line 1"]
+    assert tail.feed("main", "line 1\nline") == []
+    assert tail.feed("main", "line 1\nline 2\r\nline 3\n") == ["line 2", "line 3"]
+    assert tail.feed("main", "line 1\nline 2\r\nline 3\nline 4", final=True) == ["line 4"]
+
+
+def test_offsets_are_kept_per_node():
+    tail = LogTail()
+    assert tail.feed("import", "a\n") == ["a"]
+    assert tail.feed("solve", "x\ny") == ["x"]
+    assert tail.feed("import", "a\nb\n") == ["b"]
+    assert tail.feed("solve", "x\nyz\n") == ["yz"]
+
+
+def test_missing_log_keeps_the_offset():
+    tail = LogTail()
+    assert tail.feed("main", "line 1\nline") == ["line 1"]
+    assert tail.feed("main", None) == []
+    assert tail.feed("main", "line 1\nline 2\n") == ["line 2"]
+    assert tail.feed("main", "line 1\nline 2\nline 3") == []
+    assert tail.feed("main", None, final=True) == ["line 3"]
+
+
+def test_truncated_log_starts_over():
+    tail = LogTail()
+    assert tail.feed("main", "old 1\nold 2\npartial") == ["old 1", "old 2"]
+    # e.g. a restarted pod, the log is shorter than the offset
+    assert tail.feed("main", "new 1\n") == ["new 1"]
+    assert tail.feed("main", "new 1\nnew 2\n") == ["new 2"]
+
+
+def test_flush_returns_the_unterminated_lines():
+    tail = LogTail()
+    tail.feed("import", "a\nb")
+    tail.feed("solve", "x\n")
+    assert tail.flush() == [("import", "b")]
+    assert tail.flush() == []
+    assert tail.feed("import", "a\nbc\n") == ["c"]
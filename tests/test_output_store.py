@@ -0,0 +1,94 @@
+import os
+import sqlite3
+
+from convect_flow_sdk import FlowAlgo
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.output_store import OutputStore
+
+
+def add_run(store, tmp_path, run_key, files):
+    staging_folder = store.make_staging_dir()
+    for name, data in files.items():
+        with open(os.path.join(staging_folder, name), "wb") as f:
+            f.write(data)
+    store.add_run(run_key, staging_folder)
+
+
+def test_placed_files_are_writable_copies(tmp_path):
+    store = OutputStore(str(tmp_path / "store"))
+    add_run(store, tmp_path, "run-1", {"result.csv": b"a,b\n1,2\n"})
+    output_path = tmp_path / "output"
+    assert store.place_run("run-1", str(output_path)) == ["result.csv"]
+    with open(output_path / "result.csv", "r+b") as f:
+        f.write(b"x")
+    assert store.place_run("run-1", str(tmp_path / "output-2")) == ["result.csv"]
+    assert (tmp_path / "output-2" / "result.csv").read_bytes() == b"a,b\n1,2\n"
+    store.close()
+
+
+def test_same_size_edit_of_an_object_is_a_miss(tmp_path):
+    store = OutputStore(str(tmp_path / "store"), hardlinks=True)
+    add_run(store, tmp_path, "run-1", {"result.csv": b"a,b\n1,2\n"})
+    output_path = tmp_path / "output"
+    store.place_run("run-1", str(output_path))
+    placed = output_path / "result.csv"
+    # an in place edit through the hardlink, e.g. as root, with the same size and a later mtime
+    os.chmod(placed, 0o644)
+    stat = os.stat(placed)
+    placed.write_bytes(b"a,b\n9,9\n")
+    os.utime(placed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.place_run("run-1", str(tmp_path / "output-2")) is None
+    assert not store.has_run("run-1")
+    # the next download replaces the changed object
+    add_run(store, tmp_path, "run-1", {"result.csv": b"a,b\n1,2\n"})
+    assert store.place_run("run-1", str(tmp_path / "output-3")) == ["result.csv"]
+    assert (tmp_path / "output-3" / "result.csv").read_bytes() == b"a,b\n1,2\n"
+    store.close()
+
+
+def test_objects_of_an_older_store_are_downloaded_again(tmp_path):
+    store_dir = tmp_path / "store"
+    store = OutputStore(str(store_dir))
+    add_run(store, tmp_path, "run-1", {"result.csv": b"a,b\n1,2\n"})
+    store.close()
+    conn = sqlite3.connect(str(store_dir / "outputs.sqlite3"))
+    conn.execute("UPDATE output_objects SET mtime_ns = NULL")
+    conn.commit()
+    conn.close()
+    store = OutputStore(str(store_dir))
+    assert store.place_run("run-1", str(tmp_path / "output")) is None
+    store.close()
+
+
+def test_gather_downloads_a_run_evicted_while_it_is_placed(tmp_path):
+    with FakeFlowServer() as server:
+        flow_algo = FlowAlgo(server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"))
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        (input_folder / "data.csv").write_text("a,b\n1,2\n")
+        run_id = flow_algo.submit("algo-0", "run", {}, str(input_folder))
+        flow_algo.gather(run_id, str(tmp_path / "first"))
+        store = flow_algo.output_store
+        place_file = store.place_file
+        evicted = []
+
+        def evict_then_place(source, target):
+            # another process evicts the object after place_run checked it
+            if not evicted:
+                evicted.append(source)
+                os.remove(source)
+            return place_file(source, target)
+
+        store.place_file = evict_then_place
+        server.reset_stats()
+        flow_algo.gather(run_id, str(tmp_path / "second"))
+        store.place_file = place_file
+        assert evicted
+        assert server.requests["algo_runs/download"] == 1
+        first = sorted(p.relative_to(tmp_path / "first") for p in (tmp_path / "first").rglob("*") if p.is_file())
+        second = sorted(p.relative_to(tmp_path / "second") for p in (tmp_path / "second").rglob("*") if p.is_file())
+        assert first == second
+        for path in first:
+            assert (tmp_path / "first" / path).read_bytes() == (tmp_path / "second" / path).read_bytes()
+        flow_algo.run_cache.close()
+        store.close()
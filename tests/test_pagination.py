@@ -0,0 +1,37 @@
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.flow_app import FlowApp, iter_apps
+from convect_flow_sdk.pagination import MAX_PAGE_SIZE, iter_pages
+
+
+def make_capped_endpoint(items, max_page_size):
+    requested = []
+
+    def fetch_page(page, page_size):
+        requested.append((page, page_size))
+        page_size = min(page_size, max_page_size)
+        return items[(page - 1) * page_size : page * page_size]
+
+    return fetch_page, requested
+
+
+def test_iter_pages_gets_every_item_of_a_capped_endpoint():
+    items = list(range(250))
+    for prefetch in (False, True):
+        fetch_page, requested = make_capped_endpoint(items, MAX_PAGE_SIZE)
+        assert list(iter_pages(fetch_page, page_size=500, prefetch=prefetch)) == items
+        assert [page_size for _, page_size in requested] == [MAX_PAGE_SIZE] * 3
+
+
+def test_iter_pages_stops_after_a_short_page():
+    fetch_page, requested = make_capped_endpoint(list(range(10)), MAX_PAGE_SIZE)
+    assert list(iter_pages(fetch_page, prefetch=False)) == list(range(10))
+    assert requested == [(1, MAX_PAGE_SIZE)]
+
+
+def test_list_endpoints_of_a_capped_server(tmp_path):
+    with FakeFlowServer(app_count=150, max_page_size=MAX_PAGE_SIZE) as server:
+        assert len(list(iter_apps(server.url, "token"))) == 150
+        for i in range(120):
+            server._new_instance("folder", f"instance-{i}")
+        flow_app = FlowApp(server.url, "token", "workspace", "app-0", local_cache_dir=str(tmp_path / "cache"))
+        assert len(list(flow_app.iter_instances("folder"))) == 120
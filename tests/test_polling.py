@@ -0,0 +1,47 @@
+import time
+
+from convect_flow_sdk import FlowAlgo, RunStatus
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.polling import PollingPolicy, get_run_started_at
+
+
+def test_phases_are_offset_by_the_job_start():
+    policy = PollingPolicy(min_interval=1.0, max_interval=30.0, jitter=0.0, expected_runtime=100.0)
+    # polling starts 95 seconds after the run started, around its expected completion
+    polling = policy.start(time.time() - 95)
+    assert 94 < polling.job_elapsed < 96
+    assert polling.elapsed < 1
+    assert polling.next_interval() == 1.0
+    assert polling.next_interval() == 1.5
+    assert polling.next_interval() == 2.0
+    # without the start time the run is far from done, the interval may grow up to expected_runtime / 10
+    polling = policy.start()
+    intervals = [polling.next_interval() for _ in range(10)]
+    assert max(intervals) == 10.0
+
+
+def test_get_run_started_at():
+    assert get_run_started_at({"run_job_status": {"created_at": "2023-12-18 21:36:15+00:00"}}) == 1702935375.0
+    # naive times are utc
+    assert get_run_started_at({"created_at": "2023-12-18T21:36:15", "run_job_status": {}}) == 1702935375.0
+    assert get_run_started_at({"run_job_status": {"created_at": None}}) is None
+
+
+def test_check_status_estimates_the_runtime_once_per_algo(tmp_path):
+    policy = PollingPolicy(min_interval=0.05, max_interval=0.5, jitter=0.0)
+    with FakeFlowServer(run_duration=0.3) as server:
+        flow_algo = FlowAlgo(
+            server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"), polling_policy=policy
+        )
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        (input_folder / "data.csv").write_text("a,b\n1,2\n")
+        run_ids = [flow_algo.submit("algo-0", "run", {"i": i}, str(input_folder)) for i in range(3)]
+        server.reset_stats()
+        for run_id in run_ids:
+            assert flow_algo.check_status(run_id) == RunStatus.SUCCEEDED
+        assert server.requests["algo_runs/list"] == 1
+        assert "algo-0" in flow_algo._expected_runtimes
+        assert flow_algo.wait_all(run_ids, "algo-0", expected_runtime=0.3) == dict.fromkeys(run_ids, RunStatus.SUCCEEDED)
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
@@ -0,0 +1,115 @@
+import json
+import time
+import xml.etree.ElementTree as ET
+
+import pytest
+from click.testing import CliRunner
+
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.cli import regression_test
+from convect_flow_sdk.regression_report import (
+    REGRESSION_STAGES,
+    StageTimer,
+    build_report,
+    get_failed_stage,
+    percentile,
+    write_json_report,
+    write_junit_xml,
+)
+
+
+def make_result(app_id, seconds, failed_at=None):
+    timings = {}
+    for stage in REGRESSION_STAGES:
+        if stage == failed_at:
+            break
+        timings[stage] = seconds
+    return {
+        "app_id": app_id,
+        "passed": failed_at is None,
+        "error": None if failed_at is None else f"{failed_at} failed",
+        "failed_stage": failed_at,
+        "timings": timings,
+        "duration": seconds * len(timings),
+    }
+
+
+def test_stage_timer_does_not_record_a_failed_stage():
+    timings = {}
+    timer = StageTimer(timings)
+    with pytest.raises(ValueError):
+        timer.start("connection")
+        time.sleep(0.01)
+        timer.start("doc_link")
+        raise ValueError("doc link is not valid")
+    assert list(timings) == ["connection"]
+    assert timings["connection"] >= 0.01
+    assert get_failed_stage(timings) == "doc_link"
+    timings = {}
+    timer = StageTimer(timings)
+    timer.start("connection")
+    timer.stop()
+    timer.stop()
+    assert list(timings) == ["connection"]
+    # without a timings dict nothing is recorded
+    StageTimer().start("connection")
+
+
+def test_percentile_interpolates_between_ranks():
+    assert percentile([], 50) is None
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile(list(range(101)), 90) == 90
+    assert percentile([1, 2], 100) == 2
+
+
+def test_report_summarizes_stage_latencies(tmp_path):
+    results = [make_result(f"app-{i}", float(i + 1)) for i in range(4)]
+    results.append(make_result("app-failed", 10.0, failed_at="solve"))
+    report = build_report(results)
+    assert report["summary"] == {"total": 5, "passed": 4, "failed": 1, "duration": 8 * (1 + 2 + 3 + 4) + 5 * 10.0}
+    assert report["stages"]["connection"]["count"] == 5
+    assert report["stages"]["connection"]["p50"] == 3.0
+    assert report["stages"]["connection"]["max"] == 10.0
+    assert report["stages"]["solve"]["count"] == 4
+    assert report["stages"]["solve"]["mean"] == 2.5
+
+    write_json_report(report, str(tmp_path / "report.json"))
+    assert json.loads((tmp_path / "report.json").read_text()) == report
+
+    write_junit_xml(report, str(tmp_path / "report.xml"))
+    suite = ET.parse(str(tmp_path / "report.xml")).getroot()
+    assert suite.tag == "testsuite"
+    assert (suite.get("tests"), suite.get("failures")) == ("5", "1")
+    suite_properties = {p.get("name"): p.get("value") for p in suite.find("properties")}
+    assert suite_properties["connection.p50"] == "3.000"
+    assert "connection.count" not in suite_properties
+    cases = suite.findall("testcase")
+    assert [case.get("name") for case in cases] == [r["app_id"] for r in results]
+    failure = cases[-1].find("failure")
+    assert failure.get("message") == "failed at stage solve"
+    assert failure.text == "solve failed"
+    assert all(case.find("failure") is None for case in cases[:-1])
+    assert {p.get("name") for p in cases[-1].find("properties")} == set(REGRESSION_STAGES[:5])
+
+
+def test_regression_test_cli_writes_the_reports(tmp_path):
+    with FakeFlowServer(app_count=2, ready_delay=0.1, solve_duration=0.1) as server:
+        result = CliRunner().invoke(
+            regression_test,
+            [
+                "--flow_host_url", server.url,
+                "--flow_api_token", "token",
+                "--workspace_id", "workspace",
+                "--parallel", "2",
+                "--report_json", str(tmp_path / "report.json"),
+                "--junit_xml", str(tmp_path / "report.xml"),
+            ],
+        )
+    assert result.exit_code == 0, result.output
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["summary"]["total"] == report["summary"]["passed"] == 2
+    assert sorted(app["app_id"] for app in report["apps"]) == ["app-0", "app-1"]
+    assert all(report["stages"][stage]["count"] == 2 for stage in REGRESSION_STAGES)
+    suite = ET.parse(str(tmp_path / "report.xml")).getroot()
+    assert len(suite.findall("testcase")) == 2
@@ -0,0 +1,64 @@
+import json
+import time
+
+from convect_flow_sdk.run_cache import LEGACY_RUN_HASH_PREFIX, RunCache
+
+
+def test_json_files_are_migrated_for_run_id_lookups_only(tmp_path):
+    old_hash = "0" * 64
+    (tmp_path / f"algo-run-{old_hash}.json").write_text(json.dumps({"run_id": "run-1"}))
+    cache = RunCache(str(tmp_path))
+    # the old hash was computed from the input archive md5, a new submit never looks it up
+    assert cache.get(old_hash) is None
+    assert cache.find_run_hash("run-1") == LEGACY_RUN_HASH_PREFIX + old_hash
+    assert not (tmp_path / f"algo-run-{old_hash}.json").exists()
+    assert cache.remove_run("run-1") == 1
+    cache.close()
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = RunCache(str(tmp_path), ttl=60)
+    cache.put("hash-1", {"run_id": "run-1"})
+    now[0] += 30
+    assert cache.get_run_id("hash-1") == "run-1"
+    # the ttl counts from the creation, a lookup does not extend it
+    now[0] += 31
+    assert cache.get_run_id("hash-1") is None
+    assert len(cache) == 0
+    cache.put("hash-2", {"run_id": "run-2"})
+    now[0] += 61
+    cache.evict()
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = RunCache(str(tmp_path), max_entries=3)
+    for i in range(3):
+        now[0] += 1
+        cache.put(f"hash-{i}", {"run_id": f"run-{i}"})
+    now[0] += 1
+    assert cache.get_run_id("hash-0") == "run-0"
+    now[0] += 1
+    cache.put("hash-3", {"run_id": "run-3"})
+    assert len(cache) == 3
+    assert cache.get_run_id("hash-1") is None
+    assert [cache.get_run_id(f"hash-{i}") for i in (0, 2, 3)] == ["run-0", "run-2", "run-3"]
+    cache.close()
+
+
+def test_entries_persist_and_are_found_by_run_id(tmp_path):
+    cache = RunCache(str(tmp_path))
+    cache.put("hash-1", {"run_id": "run-1", "extra": 1})
+    cache.put("hash-2", {"run_id": "run-1"})
+    cache.close()
+    cache = RunCache(str(tmp_path))
+    assert cache.get("hash-1") == {"run_id": "run-1", "extra": 1}
+    assert cache.find_run_hash("run-1") in ("hash-1", "hash-2")
+    assert cache.remove_run("run-1") == 2
+    assert cache.get("hash-1") is None
+    cache.close()
@@ -0,0 +1,133 @@
+import email.parser
+import email.policy
+import threading
+import time
+
+import pytest
+
+from convect_flow_sdk import FlowAlgo
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.flow_algo import compress_to_tar_gz
+from convect_flow_sdk.streaming import QueueWriter, iter_multipart, produce_in_thread
+from convect_flow_sdk.transport import FlowTransport
+
+
+class RecordingTransport(FlowTransport):
+    """
+    Transport recording the bodies of the requests sent as a generator, i.e. with chunked encoding
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bodies = []
+
+    def request(self, method, url, **kwargs):
+        data = kwargs.get("data")
+        if data is not None and hasattr(data, "__next__"):
+            chunks = []
+            self.bodies.append((kwargs["headers"]["Content-Type"], chunks))
+
+            def _record(body):
+                for chunk in body:
+                    chunks.append(chunk)
+                    yield chunk
+
+            kwargs["data"] = _record(data)
+        return super().request(method, url, **kwargs)
+
+
+def parse_multipart(content_type, body):
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body
+    )
+    return {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+
+
+def test_multipart_body_is_parsed_by_a_standard_parser():
+    content_type, body = iter_multipart(
+        {"algo_id": "algo-0", "config": '{"a": 1}'},
+        "file",
+        "input.tar.gz",
+        iter([b"\x1f\x8b", b"\r\n--not-a-boundary\r\n", b"end"]),
+        "application/gzip",
+    )
+    parts = parse_multipart(content_type, b"".join(body))
+    assert parts["algo_id"].get_content() == "algo-0"
+    assert parts["config"].get_content() == '{"a": 1}'
+    assert parts["file"].get_filename() == "input.tar.gz"
+    assert parts["file"].get_content_type() == "application/gzip"
+    assert parts["file"].get_payload(decode=True) == b"\x1f\x8b\r\n--not-a-boundary\r\nend"
+
+
+def test_producer_errors_are_raised_in_the_consumer():
+    def produce(f):
+        f.write(b"x" * 10)
+        raise OSError("disk error")
+
+    chunks, _ = produce_in_thread(produce, chunk_size=4)
+    with pytest.raises(OSError, match="disk error"):
+        list(chunks)
+
+
+def test_producer_is_bounded_and_cancelled_when_the_consumer_stops():
+    written = []
+    stopped = threading.Event()
+
+    def produce(f):
+        try:
+            for _ in range(1000):
+                f.write(b"x" * 4)
+                written.append(4)
+        finally:
+            stopped.set()
+
+    chunks, result = produce_in_thread(produce, chunk_size=4, max_pending=2)
+    assert next(chunks) == b"xxxx"
+    time.sleep(0.2)
+    # the producer waits for the consumer, at most max_pending chunks are queued
+    assert len(written) <= 4
+    chunks.close()
+    assert stopped.wait(5)
+    assert "value" not in result
+
+
+def test_queue_writer_cuts_fixed_size_chunks():
+    writer = QueueWriter(chunk_size=4, max_pending=10)
+    writer.write(b"abcdef")
+    writer.write(b"ghij")
+    writer.close()
+    assert list(writer) == [b"abcd", b"efgh", b"ij"]
+
+
+def test_stream_submit_sends_the_archive_while_it_is_compressed(tmp_path):
+    input_folder = tmp_path / "input"
+    (input_folder / "b").mkdir(parents=True)
+    (input_folder / "a.csv").write_text("a,b\n1,2\n" * 200_000)
+    (input_folder / "b" / "c.csv").write_text("c\n3\n")
+    with FakeFlowServer() as server:
+        transport = RecordingTransport("token")
+        flow_algo = FlowAlgo(
+            server.url,
+            "token",
+            "workspace",
+            local_cache_dir=str(tmp_path / "cache"),
+            transport=transport,
+            use_artifact_cache=False,
+        )
+        run_id = flow_algo.submit("algo-0", "run", {"i": 0}, str(input_folder), stream=True)
+        assert run_id in server.runs
+        ((content_type, chunks),) = transport.bodies
+        # the body is sent in several chunks rather than as one buffer
+        assert len(chunks) > 3
+        parts = parse_multipart(content_type, b"".join(chunks))
+        assert parts["algo_id"].get_content() == "algo-0"
+        compress_to_tar_gz(str(input_folder), str(tmp_path / "input.tar.gz"))
+        assert parts["file"].get_payload(decode=True) == (tmp_path / "input.tar.gz").read_bytes()
+        # the same run is found in the local run cache
+        assert flow_algo.submit("algo-0", "run", {"i": 0}, str(input_folder), stream=True) == run_id
+        assert len(transport.bodies) == 1
+        with pytest.raises(ValueError):
+            flow_algo.submit("algo-0", "run", {"i": 1}, str(input_folder), stream=True, upload_mode="chunked")
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()
+        transport.close()
@@ -0,0 +1,29 @@
+import pytest
+
+from convect_flow_sdk import FlowAlgo, FlowTransport
+from convect_flow_sdk.flow_app import FlowApp
+from convect_flow_sdk.transport import get_default_transport
+
+
+def test_injected_transport_sends_the_client_token():
+    transport = FlowTransport(pool_size=2)
+    # a session created before the transport is passed to the client
+    session = transport.session
+    FlowAlgo("http://localhost", "token", "workspace", transport=transport, use_local_algo_cache=False)
+    assert transport.flow_api_token == "token"
+    assert session.headers["CAuthorization"] == "bearer token"
+    FlowApp("http://localhost", "token", "workspace", "app", transport=transport)
+    transport.close()
+
+
+def test_injected_transport_with_another_token_is_rejected():
+    transport = FlowTransport("token")
+    with pytest.raises(ValueError):
+        FlowAlgo("http://localhost", "other-token", "workspace", transport=transport, use_local_algo_cache=False)
+    transport.close()
+
+
+def test_default_transport_is_shared_per_token_and_pool_size():
+    assert get_default_transport("token", 4) is get_default_transport("token", 4)
+    assert get_default_transport("token", 4) is not get_default_transport("token", 8)
+    assert get_default_transport("token", 8).pool_size == 8
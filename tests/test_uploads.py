@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from convect_flow_sdk import FlowAlgo
+from convect_flow_sdk.benchmark import FakeFlowServer
+from convect_flow_sdk.transport import FlowTransport
+from convect_flow_sdk.uploads import ChunkedUploader
+
+CHUNK_SIZE = 4096
+CHUNK_COUNT = 16
+
+
+class RecordingTransport:
+    """
+    Transport recording the chunk indexes sent, fails every chunk after fail_after chunks if set
+    """
+
+    def __init__(self, transport, fail_after=None):
+        self.transport = transport
+        self.fail_after = fail_after
+        self.chunks = []
+
+    def request(self, method, url, **kwargs):
+        if "/chunks/" in url:
+            if self.fail_after is not None and len(self.chunks) >= self.fail_after:
+                raise ConnectionError("connection lost")
+            self.chunks.append(int(url.rsplit("/", 1)[1]))
+        return self.transport.request(method, url, **kwargs)
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "input.tar.gz"
+    path.write_bytes(os.urandom(CHUNK_SIZE * CHUNK_COUNT - 100))
+    return str(path)
+
+
+def make_uploader(transport, server, state_dir, max_retries):
+    return ChunkedUploader(
+        transport,
+        f"{server.url}/flowopt-server/api/",
+        state_dir,
+        chunk_size=CHUNK_SIZE,
+        workers=1,
+        max_retries=max_retries,
+        retry_interval=0.0,
+    )
+
+
+def test_interrupted_upload_resumes_from_acknowledged_chunks(tmp_path, input_file):
+    state_dir = str(tmp_path / "uploads")
+    with FakeFlowServer(seed=1) as server:
+        transport = FlowTransport("token")
+        interrupted = RecordingTransport(transport, fail_after=6)
+        with pytest.raises(ConnectionError):
+            make_uploader(interrupted, server, state_dir, max_retries=0).upload(input_file)
+        assert interrupted.chunks == list(range(6))
+        (upload_id,) = server.uploads
+        assert sorted(server.uploads[upload_id]["chunks"]) == list(range(6))
+
+        # a new uploader, e.g. in a new process, on a server dropping connections of every request type
+        server.drop_rate = 0.3
+        resumed = RecordingTransport(transport)
+        result = make_uploader(resumed, server, state_dir, max_retries=20).upload(input_file)
+        assert result["upload_id"] == upload_id
+        assert set(resumed.chunks) == set(range(6, CHUNK_COUNT))
+        assert len(resumed.chunks) > CHUNK_COUNT - 6
+        assert sorted(server.uploads[upload_id]["chunks"]) == list(range(CHUNK_COUNT))
+        assert os.listdir(state_dir) == []
+        transport.close()
+
+
+def test_upload_fails_after_max_retries(tmp_path, input_file):
+    with FakeFlowServer(drop_rate=1.0) as server:
+        transport = FlowTransport("token")
+        with pytest.raises(Exception):
+            make_uploader(transport, server, str(tmp_path / "uploads"), max_retries=2).upload(input_file)
+        transport.close()
+
+
+def test_client_errors_are_not_retried(tmp_path, input_file):
+    with FakeFlowServer() as server:
+        transport = FlowTransport("token")
+        uploader = ChunkedUploader(
+            transport, f"{server.url}/flowopt-server/api/missing/", str(tmp_path / "uploads"), retry_interval=1.0
+        )
+        started_at = time.monotonic()
+        with pytest.raises(requests.HTTPError) as e:
+            uploader.upload(input_file)
+        assert e.value.response.status_code == 404
+        assert server.requests["missing/uploads/init"] == 1
+        assert time.monotonic() - started_at < 1.0
+        transport.close()
+
+
+def test_server_errors_are_retried(tmp_path, input_file):
+    with FakeFlowServer(failure_rate=0.3, seed=2) as server:
+        transport = FlowTransport("token")
+        result = make_uploader(transport, server, str(tmp_path / "uploads"), max_retries=20).upload(input_file)
+        assert sorted(server.uploads[result["upload_id"]]["chunks"]) == list(range(CHUNK_COUNT))
+        transport.close()
+
+
+def test_concurrent_chunked_submits_of_the_same_run(tmp_path):
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    (input_folder / "data.csv").write_bytes(os.urandom(256 * 1024))
+    with FakeFlowServer() as server:
+        flow_algo = FlowAlgo(
+            server.url, "token", "workspace", local_cache_dir=str(tmp_path / "cache"), use_artifact_cache=False
+        )
+        barrier = threading.Barrier(4)
+        results = []
+
+        def submit():
+            barrier.wait()
+            try:
+                results.append(flow_algo.submit("algo-0", "run", {}, str(input_folder), upload_mode="chunked"))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(isinstance(result, str) for result in results), results
+        # the first submit is returned to the other threads
+        assert len(set(results)) == 1
+        assert server.requests["uploads/init"] == 1
+        flow_algo.run_cache.close()
+        flow_algo.output_store.close()